@@ -1,3 +1,32 @@
-from django.test import TestCase
+from django.core import mail
+from django.urls import reverse
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from email_api.models import ContactRecipient
+from gallery_shared.testing import QueryBudgetMixin
+
+
+class ApiQueryBudgetTests(QueryBudgetMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        for number in range(3):
+            ContactRecipient.objects.create(email=f'{number}@example.com')
+
+    def test_create_contact_enquiry(self):
+
+        # Saving the enquiry and reading the recipients
+        with self.assertQueryBudget(3):
+            response = self.client.post(
+                reverse('contactenquiry-list'),
+                {
+                    'name': 'Name',
+                    'email': 'name@example.com',
+                    'subject': 'Subject',
+                    'body': 'Body',
+                }
+            )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(mail.outbox), 1)
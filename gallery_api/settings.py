@@ -43,6 +43,10 @@ def get_env_var_list(key: str):
     return get_env_var(key).split()
 
 
+def get_optional_env_var(key: str, default: str):
+    return os.environ.get(key, default)
+
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 
 BASE_DIR = os.path.dirname(
@@ -164,6 +168,49 @@ USE_L10N = True
 USE_TZ = True
 
 
+# API responses are cached in the 'api' cache, which the web and rendition
+# worker processes must share, so that the worker's changes invalidate it. By
+# default it's a database table, made by the createcachetable command. Stale
+# responses can only be served while the database is unreachable from a cache
+# kept elsewhere, so set API_CACHE_BACKEND and API_CACHE_LOCATION to one such
+# as django.core.cache.backends.memcached.PyLibMCCache in production. The
+# deploy checks warn while the database is used
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'api': {
+        'BACKEND': get_optional_env_var(
+            'API_CACHE_BACKEND',
+            'django.core.cache.backends.db.DatabaseCache'
+        ),
+        'LOCATION': get_optional_env_var(
+            'API_CACHE_LOCATION',
+            'api_response_cache'
+        ),
+        # Responses stay valid until the content changes
+        'TIMEOUT': 24 * 60 * 60,
+        'OPTIONS': {
+            # Room for a response and a stale copy of each page of results
+            # across a few content versions. Older content versions' entries
+            # are culled once it's full
+            'MAX_ENTRIES': int(
+                get_optional_env_var('API_CACHE_MAX_ENTRIES', '5000')
+            ),
+        },
+    },
+}
+API_CACHE_ALIAS: str = 'api'
+
+# The last good response for each URL is kept this long, to be served while the
+# response is rebuilt or if the database is unreachable
+API_CACHE_STALE_TIMEOUT_SECONDS: int = 7 * 24 * 60 * 60
+
+# Only one request rebuilds each response at a time. Requests with no stale
+# response to serve wait this long for it before rebuilding it themselves
+API_CACHE_LOCK_TIMEOUT_SECONDS: int = 30
+API_CACHE_LOCK_WAIT_SECONDS: float = 5
+
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPaginatio'
                                 'n',
@@ -201,6 +248,100 @@ AWS_S3_REGION_NAME = get_env_var('AWS_S3_REGION_NAME')
 AWS_S3_USE_SSL = get_env_var_bool('AWS_S3_USE_SSL')
 
 
+# Renditions. Each size is the target size of the largest image dimension, and
+# every size is generated in every format
+RENDITION_SIZES_PX = (300, 600, 1000, 2000)
+RENDITION_FORMATS = ('JPEG', 'WEBP')
+
+# The encoder profile for each rendition format. Options are passed to Pillow's
+# Image.save(). Metadata is never copied to renditions, and colours are
+# converted to sRGB unless keep_icc_profile is set
+RENDITION_ENCODER_PROFILES = {
+    'JPEG': {
+        'save_options': {
+            'quality': 85,
+            'progressive': True,
+            'optimize': True,
+            'subsampling': '4:2:0',
+        },
+        'keep_icc_profile': False,
+    },
+    'WEBP': {
+        'save_options': {
+            'quality': 80,
+            'method': 6,
+        },
+        'keep_icc_profile': False,
+    },
+}
+
+# Originals with more pixels than this are rejected without being decoded, as a
+# guard against decompression bombs
+IMAGE_MAX_PIXELS: int = 250 * 1000 * 1000
+
+# The most memory an original may take once decoded for generating renditions.
+# JPEGs are decoded at a reduced scale, so only other formats (at 4 bytes per
+# pixel for colour images) are likely to reach it. Uploads over the limit are
+# rejected
+IMAGE_DECODE_MEMORY_LIMIT_MB: int = 256
+
+# Renditions are encoded and uploaded concurrently by this many threads
+RENDITION_THREAD_POOL_SIZE: int = 4
+
+# Requested on-demand rendition sizes are rounded up to the nearest of these
+RENDITION_ON_DEMAND_SIZES_PX = (160, 320, 480, 640, 800, 1000, 1280, 1600, 2000)
+
+# Only one request generates each on-demand rendition at a time. The others
+# wait this long for it, then redirect to the nearest existing rendition
+RENDITION_ON_DEMAND_LOCK_TIMEOUT_SECONDS: int = 60
+RENDITION_ON_DEMAND_WAIT_SECONDS: float = 5
+
+
+# Originals larger than this in either dimension also get a Deep Zoom (DZI)
+# tile pyramid, for zoomable detail views. The tiles use the JPEG encoder
+# profile
+DEEP_ZOOM_ENABLED: bool = True
+DEEP_ZOOM_MIN_SIZE_PX: int = 4000
+DEEP_ZOOM_TILE_SIZE_PX: int = 256
+DEEP_ZOOM_TILE_OVERLAP_PX: int = 1
+
+
+# Rendition jobs
+RENDITION_JOB_MAX_ATTEMPTS: int = 5
+RENDITION_JOB_RETRY_DELAY_SECONDS: int = 30
+
+# Jobs still running after this long are assumed to belong to a dead worker
+RENDITION_JOB_LEASE_SECONDS: int = 600
+
+# The regenerate_renditions command only works on as many items at once as fit
+# in this much memory, estimated from their decoded original image sizes. A
+# standard dyno has 512MB in total
+RENDITION_REGENERATE_MEMORY_LIMIT_MB: int = 256
+
+
+# Static catalogue. The export_catalogue command writes the API's content to
+# storage under this prefix, for serving from a CDN
+CATALOGUE_PREFIX: str = 'catalogue'
+
+# The origin of the API, which the exported representations link to
+CATALOGUE_API_ORIGIN: str = get_optional_env_var(
+    'CATALOGUE_API_ORIGIN',
+    'http://localhost:8000'
+)
+
+# Exported documents are never changed, only replaced by a new version, which
+# the manifest points at
+CATALOGUE_CACHE_CONTROL: str = 'public, max-age=31536000, immutable'
+CATALOGUE_MANIFEST_CACHE_CONTROL: str = 'public, max-age=60'
+
+# Also export the catalogue whenever its content is saved or deleted, or the
+# import_gallery command imports items. The rendition worker runs the exports
+CATALOGUE_EXPORT_ON_SAVE: bool = get_optional_env_var(
+    'CATALOGUE_EXPORT_ON_SAVE',
+    'FALSE'
+).upper() == 'TRUE'
+
+
 # Admin site
 SITE_NAME = get_env_var('SITE_NAME')
 DJANGO_ADMIN_SITE_HEADER = f'{SITE_NAME} admin'
@@ -29,6 +29,7 @@ from email_api.views import CreateContactEnquiryViewSet
 from image_api.views import (
     ItemTagViewSet,
     GalleryViewSet,
+    ImageRenditionViewSet,
 )
 from links_api.views import SocialMediaLinksViewSet
 
@@ -36,6 +37,11 @@ from links_api.views import SocialMediaLinksViewSet
 api_router: DefaultRouter = DefaultRouter()
 api_router.register(r'image-tags', ItemTagViewSet)
 api_router.register(r'gallery-items', GalleryViewSet)
+api_router.register(
+    r'images',
+    ImageRenditionViewSet,
+    basename='image-rendition'
+)
 api_router.register(r'contact', CreateContactEnquiryViewSet)
 api_router.register(r'social-media-links', SocialMediaLinksViewSet)
 
@@ -0,0 +1,98 @@
+from collections import OrderedDict
+from typing import (
+    List,
+    Optional,
+    Tuple,
+)
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+
+FIELDS_PARAM: str = 'fields'
+EXPAND_PARAM: str = 'expand'
+
+
+class SparseFieldsetSerializerMixin(object):
+    """Serializes only the fields named by the serializer context's
+    field_names, or every field when the context doesn't name any.
+
+    The serializer's Meta can name the compact_fields which list responses
+    default to, and the expandable_fields (its relations) which can be added
+    to a response with the expand query parameter
+    """
+
+    def get_fields(self) -> OrderedDict:
+
+        fields: OrderedDict = super(
+            SparseFieldsetSerializerMixin,
+            self
+        ).get_fields()
+
+        field_names: Optional[Tuple[str, ...]] = self.context.get(
+            'field_names'
+        )
+
+        if field_names is None:
+            return fields
+
+        return OrderedDict(
+            (name, field) for name, field in fields.items()
+            if name in field_names
+        )
+
+
+def get_requested_field_names(
+    request: Request,
+    serializer_class,
+    compact: bool = False
+) -> Tuple[str, ...]:
+    """The serializer's fields named by the fields query parameter, or its
+    default fields, plus any relations named by the expand query parameter.
+    Both parameters are comma separated lists of field names
+    """
+
+    meta = serializer_class.Meta
+    all_field_names: Tuple[str, ...] = tuple(meta.fields)
+
+    field_names: List[str] = get_field_names_param(
+        request,
+        FIELDS_PARAM,
+        all_field_names
+    ) or list(
+        getattr(meta, 'compact_fields', all_field_names) if compact
+        else all_field_names
+    )
+
+    field_names += get_field_names_param(
+        request,
+        EXPAND_PARAM,
+        tuple(getattr(meta, 'expandable_fields', ()))
+    )
+
+    # In the serializer's field order, so responses are shaped consistently
+    return tuple(name for name in all_field_names if name in field_names)
+
+
+def get_field_names_param(
+    request: Request,
+    param: str,
+    allowed_field_names: Tuple[str, ...]
+) -> List[str]:
+
+    field_names: List[str] = [
+        name.strip()
+        for value in request.query_params.getlist(param)
+        for name in value.split(',')
+        if name.strip()
+    ]
+
+    unknown_field_names: List[str] = [
+        name for name in field_names if name not in allowed_field_names
+    ]
+
+    if unknown_field_names:
+        raise ValidationError({
+            param: f'Unknown fields "{", ".join(unknown_field_names)}"'
+        })
+
+    return field_names
@@ -0,0 +1,40 @@
+from contextlib import contextmanager
+from typing import (
+    Dict,
+    Iterator,
+    List,
+)
+
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    connections,
+)
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin(object):
+    """Test case mixin asserting that code runs no more than a budgeted
+    number of database queries. Test data should have several rows of
+    everything the code reads, so that an N+1 query exceeds the budget
+    """
+
+    @contextmanager
+    def assertQueryBudget(
+        self,
+        budget: int,
+        using: str = DEFAULT_DB_ALIAS
+    ) -> Iterator[CaptureQueriesContext]:
+
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+
+        queries: List[Dict[str, str]] = context.captured_queries
+
+        if len(queries) > budget:
+            self.fail(
+                f'{len(queries)} queries executed, over the budget of '
+                f'{budget}:\n' + '\n'.join(
+                    f'{number}. {query["sql"]}'
+                    for number, query in enumerate(queries, start=1)
+                )
+            )
@@ -0,0 +1,174 @@
+from hashlib import sha1
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Optional,
+    Tuple,
+)
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError
+from django.db.models import (
+    Count,
+    Max,
+    QuerySet,
+)
+from django.http import (
+    Http404,
+    HttpResponse,
+)
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+)
+from django.utils.http import (
+    http_date,
+    quote_etag,
+)
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from gallery_shared.serializers import get_requested_field_names
+
+
+class ConditionalGetMixin(object):
+    """Answers list and retrieve requests with 304 Not Modified when the
+    client already has the current response, without serializing anything.
+
+    The ETag and Last-Modified headers come from one aggregate query over the
+    objects' updated_time fields, so the model must have one, updated
+    whenever anything in the object's response changes. Deleting an object
+    doesn't change the others' updated times, so list responses only have
+    an ETag, which also changes with the number of objects
+    """
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        return self.conditional_response(
+            self.filter_queryset(self.get_queryset()),
+            super(ConditionalGetMixin, self).list,
+            request,
+            *args,
+            **kwargs
+        )
+
+    def retrieve(self, request: Request, *args, **kwargs) -> Response:
+
+        lookup_url_kwarg: str = self.lookup_url_kwarg or self.lookup_field
+
+        queryset: QuerySet = self.filter_queryset(self.get_queryset())
+        opts = queryset.model._meta
+
+        # Malformed lookups are not found, as in get_object(). The query
+        # would only reject them once it runs
+        try:
+            lookup_value: Any = (
+                opts.pk if self.lookup_field == 'pk'
+                else opts.get_field(self.lookup_field)
+            ).to_python(kwargs[lookup_url_kwarg])
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+
+        return self.conditional_response(
+            queryset.filter(**{self.lookup_field: lookup_value}),
+            super(ConditionalGetMixin, self).retrieve,
+            request,
+            *args,
+            **kwargs
+        )
+
+    def conditional_response(
+        self,
+        queryset: QuerySet,
+        view: Callable[..., Response],
+        request: Request,
+        *args,
+        **kwargs
+    ) -> HttpResponse:
+
+        try:
+            # Ordering would only slow the aggregate down
+            state: Dict[str, Any] = queryset.order_by().aggregate(
+                last_modified=Max('updated_time'),
+                count=Count('pk')
+            )
+        except DatabaseError:
+            # The view may still be able to respond, e.g. from a cache
+            return view(request, *args, **kwargs)
+
+        last_modified: Optional[int] = None
+
+        if state['last_modified'] is not None and self.action != 'list':
+            last_modified = int(state['last_modified'].timestamp())
+
+        # The count changes when an object is deleted, and the URL and format
+        # pick which objects the response has and how it's rendered
+        etag: str = quote_etag(sha1(
+            '{}:{}:{}:{}'.format(
+                request.build_absolute_uri(),
+                request.accepted_renderer.format,
+                state['count'],
+                state['last_modified'],
+            ).encode()
+        ).hexdigest())
+
+        response: Optional[HttpResponse] = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified
+        )
+
+        if response is None:
+            response = view(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+
+            # A stale response's content is older than the current state, so
+            # clients mustn't be able to revalidate it as the current state
+            if not is_stale(response):
+
+                response['ETag'] = etag
+
+                if last_modified is not None:
+                    response['Last-Modified'] = http_date(last_modified)
+
+            # Clients may keep the response, but must check it's current
+            patch_cache_control(response, no_cache=True)
+
+        return response
+
+
+def is_stale(response: HttpResponse) -> bool:
+    """Whether the response is marked stale by a Warning header"""
+
+    return response.get('Warning', '').startswith('110 ')
+
+
+class SparseFieldsetMixin(object):
+    """Passes the fields requested with the fields and expand query
+    parameters to a serializer with SparseFieldsetSerializerMixin. List
+    responses default to the serializer's compact fields.
+
+    get_queryset() can use get_field_names() to load only what's serialized
+    """
+
+    def get_field_names(self) -> Tuple[str, ...]:
+
+        if not hasattr(self, '_field_names'):
+            self._field_names: Tuple[str, ...] = get_requested_field_names(
+                self.request,
+                self.get_serializer_class(),
+                compact=self.action == 'list'
+            )
+
+        return self._field_names
+
+    def get_serializer_context(self) -> Dict[str, Any]:
+
+        context: Dict[str, Any] = super(
+            SparseFieldsetMixin,
+            self
+        ).get_serializer_context()
+        context['field_names'] = self.get_field_names()
+
+        return context
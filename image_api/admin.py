@@ -2,16 +2,24 @@ from django.contrib.admin import (
     ModelAdmin,
     site,
 )
-from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
 from django.db import transaction
 from django.forms import ModelForm
-from django.forms.fields import ImageField
+from django.forms.fields import (
+    FileField,
+    ImageField,
+)
 
 
 from image_api.models import (
     GalleryItem,
     ItemTag,
+    RenditionJob,
 )
+from image_api.renditions import DECODE_BUDGET
+from image_api.utils.decode_budget import ImageTooLargeError
+from image_api.utils.image_ingest import ImageIngest
 
 
 GALLERY_ITEM_EDITABLE_FIELDS = (
@@ -26,8 +34,42 @@ GALLERY_ITEM_EDITABLE_FIELDS = (
 )
 
 
+class IngestImageField(ImageField):
+    """An image field which validates the upload with a single read, keeping
+    what it learns about the image for saving the gallery item
+    """
+
+    def to_python(self, data):
+
+        # Skip the image validation in ImageField, which opens the file again
+        f: UploadedFile = FileField.to_python(self, data)
+
+        if f is None:
+            return None
+
+        try:
+            f.ingest = ImageIngest(
+                f,
+                DECODE_BUDGET,
+                GalleryItem.MAX_RENDITION_SIZE_PX
+            )
+        except ImageTooLargeError as exc:
+            # Rejected now rather than failing in the rendition worker
+            raise ValidationError(
+                str(exc),
+                code='image_too_large',
+            ) from exc
+        except Exception as exc:
+            raise ValidationError(
+                self.error_messages['invalid_image'],
+                code='invalid_image',
+            ) from exc
+
+        return f
+
+
 class GalleryItemAdminForm(ModelForm):
-    image_file = ImageField()
+    image_file = IngestImageField()
 
     class Meta:
         model = GalleryItem
@@ -47,17 +89,18 @@ class GalleryItemAdmin(ModelAdmin):
     _original_image_id.short_description = 'Original image UUID'
 
     def _large_image_id(self, obj: GalleryItem):
-        return obj.large_image.id
+        return obj.large_image.id if obj.large_image else None
 
     _large_image_id.short_description = 'Large image UUID'
 
     def _thumbnail_image_id(self, obj: GalleryItem):
-        return obj.thumbnail_image.id
+        return obj.thumbnail_image.id if obj.thumbnail_image else None
 
     _thumbnail_image_id.short_description = 'Thumbnail image UUID'
 
     readonly_fields = (
         'id',
+        'renditions_status',
         '_original_image_id',
         '_large_image_id',
         '_thumbnail_image_id',
@@ -102,8 +145,10 @@ class GalleryItemAdmin(ModelAdmin):
 
         with transaction.atomic():
 
-            image_file: TemporaryUploadedFile = form.cleaned_data['image_file']
-            instance.save_image(image_file)
+            # Editing only the item's details leaves the image untouched
+            if 'image_file' in form.changed_data:
+                image_file: UploadedFile = form.cleaned_data['image_file']
+                instance.save_image(image_file.ingest)
 
             super(GalleryItemAdmin, self).save_model(
                 request,
@@ -113,5 +158,27 @@ class GalleryItemAdmin(ModelAdmin):
             )
 
 
+class RenditionJobAdmin(ModelAdmin):
+
+    def has_change_permission(self, *args, **kwargs):
+        return False  # Jobs are only updated by the rendition worker
+
+    def has_add_permission(self, *args, **kwargs):
+        return False  # Jobs are created by saving a gallery item
+
+    list_display = (
+        '__str__',
+        'status',
+        'attempts',
+        'run_after',
+    )
+
+    list_filter = (
+        'kind',
+        'status',
+    )
+
+
 site.register(ItemTag)
 site.register(GalleryItem, GalleryItemAdmin)
+site.register(RenditionJob, RenditionJobAdmin)
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ImageAPIConfig(AppConfig):
     name = 'image_api'
     verbose_name = 'Gallery'
+
+    def ready(self):
+
+        # Connects the signal receivers and registers the checks
+        import image_api.checks  # noqa: F401
+        import image_api.signals  # noqa: F401
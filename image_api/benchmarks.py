@@ -0,0 +1,213 @@
+"""Benchmarks for the rendition pipeline, run by the benchmark_images
+management command. Everything here runs in a fresh process per benchmark
+case, so it avoids importing Django and measures peak memory in isolation
+"""
+
+from io import BytesIO
+from math import sqrt
+from time import perf_counter
+from typing import (
+    Any,
+    Dict,
+    List,
+    NamedTuple,
+    Sequence,
+    Tuple,
+)
+
+import numpy
+from PIL import Image
+
+from image_api.utils.image_encoder import (
+    EncoderProfile,
+    encode_image,
+)
+from image_api.utils.image_resizer import ImageResizer
+from image_api.utils.memory import peak_rss_mb
+
+
+# The synthetic sources are trusted, but can be larger than Pillow's
+# decompression bomb limit
+Image.MAX_IMAGE_PIXELS = None
+
+# The (mode, format) combinations synthetic source images are saved as
+SOURCE_TYPES: Tuple[Tuple[str, str], ...] = (
+    ('RGB', 'JPEG'),
+    ('RGB', 'PNG'),
+    ('RGBA', 'PNG'),
+    ('CMYK', 'JPEG'),
+    ('L', 'JPEG'),
+    ('I;16', 'TIFF'),
+)
+
+SOURCE_ASPECT_RATIO: float = 3 / 2
+
+# The calibration workload is repeated this many times, keeping the fastest
+CALIBRATION_RUNS: int = 5
+
+
+class BenchmarkCase(NamedTuple):
+
+    megapixels: int
+    mode: str
+    format: str
+
+    @property
+    def name(self) -> str:
+        return f'{self.mode}-{self.format}-{self.megapixels}MP'
+
+    @property
+    def size(self) -> Tuple[int, int]:
+
+        width: int = round(sqrt(self.megapixels * 1e6 * SOURCE_ASPECT_RATIO))
+
+        return width, round(width / SOURCE_ASPECT_RATIO)
+
+
+def write_source_image(case: BenchmarkCase, path: str) -> None:
+
+    width, height = case.size
+
+    # A gradient with noise on top, so that neither the encoders nor the
+    # resampling can take shortcuts over flat areas
+    base: Image = Image.blend(
+        Image.linear_gradient('L').resize(case.size),
+        Image.effect_noise(case.size, 48),
+        0.3
+    )
+
+    # Alpha channels are usually smooth, e.g. a cut out shape
+    bands: List[Image] = [
+        base,
+        base.transpose(Image.FLIP_LEFT_RIGHT),
+        base.transpose(Image.FLIP_TOP_BOTTOM),
+        Image.radial_gradient('L').resize(case.size),
+    ]
+
+    if case.mode == 'I;16':
+        image: Image = Image.fromarray(
+            numpy.asarray(base, dtype=numpy.uint16) * 257
+        )
+    elif case.mode == 'L':
+        image: Image = base
+    else:
+        image: Image = Image.merge(case.mode, bands[:len(case.mode)])
+
+    image.save(path, format=case.format)
+
+
+def run_calibration() -> float:
+    """Times a fixed resize and encode, made with Pillow directly rather
+    than through the rendition pipeline. Wall times are compared relative to
+    this, so that a baseline recorded on one machine applies to others, and
+    changes to the pipeline don't change the calibration
+    """
+
+    size: Tuple[int, int] = (3000, 2000)
+
+    image: Image = Image.merge('RGB', [
+        Image.effect_noise(size, 48),
+        Image.linear_gradient('L').resize(size),
+        Image.radial_gradient('L').resize(size),
+    ])
+
+    timings: List[float] = []
+
+    for _run in range(CALIBRATION_RUNS):
+
+        start_time: float = perf_counter()
+
+        image.resize((1500, 1000), Image.BICUBIC).save(
+            BytesIO(),
+            format='JPEG',
+            quality=85
+        )
+
+        timings.append(perf_counter() - start_time)
+
+    return round(min(timings), 4)
+
+
+def run_case(
+    case: BenchmarkCase,
+    path: str,
+    sizes: Sequence[int],
+    profiles: Sequence[EncoderProfile]
+) -> Dict[str, Any]:
+    """Generates every rendition of the source image, in the same way as
+    gallery items do, and returns the timings, peak memory and sizes
+    """
+
+    renditions: List[Dict[str, Any]] = []
+
+    start_time: float = perf_counter()
+
+    with open(path, 'rb') as fin, ImageResizer(fin) as resizer:
+
+        resize_start_time: float = perf_counter()
+
+        for new_size, image in resizer.iter_box_sizes(sizes):
+
+            # The source is decoded lazily, so decoding is counted in the
+            # first resize, or the first encode if no resize was needed
+            resize_seconds: float = perf_counter() - resize_start_time
+
+            for profile in profiles:
+
+                encode_start_time: float = perf_counter()
+
+                buffer: BytesIO = BytesIO()
+                encode_image(image, buffer, profile)
+
+                renditions.append(dict(
+                    size=new_size,
+                    format=profile.format,
+                    width=image.width,
+                    height=image.height,
+                    bytes=buffer.tell(),
+                    resize_seconds=round(resize_seconds, 4),
+                    encode_seconds=round(perf_counter() - encode_start_time, 4),
+                ))
+
+            resize_start_time = perf_counter()
+
+    return dict(
+        wall_seconds=round(perf_counter() - start_time, 4),
+        peak_rss_mb=round(peak_rss_mb(), 1),
+        output_bytes=sum(rendition['bytes'] for rendition in renditions),
+        renditions=renditions,
+    )
+
+
+def find_regressions(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    tolerances: Dict[str, float],
+    time_scale: float = 1
+) -> List[str]:
+    """Returns a description of each metric which is worse than the
+    baseline by more than its tolerance, as a fraction of the baseline.
+    Baseline wall times are multiplied by the time scale, the ratio of this
+    machine's calibration time to the baseline's
+    """
+
+    regressions: List[str] = []
+
+    for name, result in results.items():
+
+        if name not in baseline:
+            continue
+
+        for metric, tolerance in tolerances.items():
+
+            expected: float = baseline[name][metric] * (
+                time_scale if metric == 'wall_seconds' else 1
+            )
+
+            if result[metric] > expected * (1 + tolerance):
+                regressions.append(
+                    f'{name}: {metric} {result[metric]} exceeds the baseline '
+                    f'{round(expected, 4)} by more than {tolerance:.0%}'
+                )
+
+    return regressions
@@ -0,0 +1,272 @@
+"""Exports the public API's content as static JSON documents in storage, so
+that it can be served by a CDN without the API. The documents have the same
+representations as the API responses, pre-rendered and pre-gzipped.
+
+Each export is written under a version derived from its content, and a
+manifest names the current version and the URLs of its documents. The
+versioned documents never change, so they're cached for a long time, while
+the manifest is only cached briefly
+"""
+
+import json
+from collections import OrderedDict
+from gzip import GzipFile
+from hashlib import sha256
+from io import BytesIO
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+)
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import (
+    Storage,
+    get_storage_class,
+)
+from django.db.models import QuerySet
+from django.test import RequestFactory
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from image_api.models import (
+    GalleryItem,
+    ItemTag,
+    RenditionJob,
+)
+from image_api.pagination import (
+    GalleryItemCursorPagination,
+    Position,
+    get_position,
+    items_after,
+)
+from image_api.serializers import (
+    GalleryItemListSerializer,
+    GalleryItemSerializer,
+    ItemTagSerializer,
+)
+from links_api.models import SocialMediaLinks
+from links_api.serializers import SocialMediaLinksSerializer
+
+
+MANIFEST_NAME: str = 'manifest.json'
+
+# The versions are long enough not to collide, and short enough for keys
+VERSION_LENGTH: int = 16
+
+
+def catalogue_storage(cache_control: str) -> Storage:
+    """The default storage, set to serve what it saves with the cache
+    control header if it supports per-object parameters, as S3 does.
+
+    Documents saved as .json.gz are served as gzip encoded JSON by S3
+    """
+
+    storage: Storage = get_storage_class()()
+
+    if hasattr(storage, 'object_parameters'):
+        storage.object_parameters = {
+            **storage.object_parameters,
+            'CacheControl': cache_control,
+        }
+
+    return storage
+
+
+def catalogue_request() -> Request:
+    """A request for the API's public origin, for the absolute links in the
+    representations
+    """
+
+    origin = urlsplit(settings.CATALOGUE_API_ORIGIN)
+
+    return Request(RequestFactory().get(
+        reverse('api-root'),
+        secure=origin.scheme == 'https',
+        HTTP_HOST=origin.netloc
+    ))
+
+
+def export_catalogue(force: bool = False) -> Dict[str, Any]:
+    """Writes the catalogue to storage unless the manifest names its current
+    version already, and returns the manifest
+    """
+
+    request: Request = catalogue_request()
+
+    # An empty gallery still has a first page, as the API's list does
+    pages: List[List[OrderedDict]] = (
+        list(iter_gallery_item_pages(request)) or [[]]
+    )
+    tags: List[OrderedDict] = ItemTagSerializer(
+        ItemTag.objects.all(),
+        many=True,
+        context={'request': request}
+    ).data
+
+    try:
+        links: Optional[OrderedDict] = SocialMediaLinksSerializer(
+            SocialMediaLinks.objects.get(),
+            context={'request': request}
+        ).data
+    except SocialMediaLinks.DoesNotExist:
+        links = None
+
+    version: str = content_version(pages, tags, links)
+
+    storage: Storage = catalogue_storage(settings.CATALOGUE_CACHE_CONTROL)
+    manifest_name: str = f'{settings.CATALOGUE_PREFIX}/{MANIFEST_NAME}'
+
+    if not force:
+        manifest: Optional[Dict[str, Any]] = read_manifest(
+            storage,
+            manifest_name
+        )
+
+        if manifest is not None and manifest['version'] == version:
+            return manifest
+
+    page_names: List[str] = [
+        document_name(version, f'gallery-items/{number}')
+        for number in range(1, len(pages) + 1)
+    ]
+    page_urls: List[str] = [storage.url(name) for name in page_names]
+
+    for number, (name, results) in enumerate(zip(page_names, pages)):
+        save_document(storage, name, OrderedDict((
+            (
+                'next',
+                page_urls[number + 1] if number + 1 < len(pages) else None
+            ),
+            ('results', results),
+        )))
+
+    # In the shape of the first page of the API's response, with every tag
+    tags_name: str = document_name(version, 'image-tags')
+    save_document(storage, tags_name, OrderedDict((
+        ('count', len(tags)),
+        ('next', None),
+        ('previous', None),
+        ('results', tags),
+    )))
+
+    links_name: Optional[str] = None
+
+    if links is not None:
+        links_name = document_name(version, 'social-media-links')
+        save_document(storage, links_name, links)
+
+    manifest: Dict[str, Any] = OrderedDict((
+        ('version', version),
+        ('gallery_items', page_urls),
+        ('image_tags', storage.url(tags_name)),
+        (
+            'social_media_links',
+            storage.url(links_name) if links_name is not None else None
+        ),
+    ))
+
+    # Written last, so that it only ever names complete versions
+    manifest_storage: Storage = catalogue_storage(
+        settings.CATALOGUE_MANIFEST_CACHE_CONTROL
+    )
+
+    replace_file(
+        manifest_storage,
+        manifest_name,
+        JSONRenderer().render(manifest)
+    )
+
+    return manifest
+
+
+def queue_catalogue_export() -> None:
+    """Queues an export for the rendition worker if the catalogue is
+    exported on save. It runs once the current transaction (if any) commits,
+    and is retried if it fails
+    """
+
+    if settings.CATALOGUE_EXPORT_ON_SAVE:
+        RenditionJob.objects.enqueue_catalogue_export()
+
+
+def iter_gallery_item_pages(request: Request) -> Iterator[List[OrderedDict]]:
+    """The gallery item list's pages, with every field of the items"""
+
+    serializer: GalleryItemListSerializer = GalleryItemSerializer(
+        many=True,
+        context={'request': request}
+    )
+
+    queryset: QuerySet = GalleryItem.objects.order_by(
+        *GalleryItemCursorPagination.ordering
+    ).values(*OrderedDict.fromkeys((
+        'created_date',
+        'title',
+        *GalleryItemListSerializer.get_values_fields(
+            GalleryItemSerializer.Meta.fields
+        ),
+    )))
+
+    position: Optional[Position] = None
+
+    while True:
+
+        rows: List[Dict[str, Any]] = items_after(
+            queryset,
+            position,
+            GalleryItemCursorPagination.page_size
+        )
+
+        if not rows:
+            return
+
+        yield serializer.to_representation(rows)
+
+        position = get_position(rows[-1])
+
+
+def content_version(*representations) -> str:
+
+    return sha256(
+        JSONRenderer().render(representations)
+    ).hexdigest()[:VERSION_LENGTH]
+
+
+def document_name(version: str, name: str) -> str:
+    return f'{settings.CATALOGUE_PREFIX}/{version}/{name}.json.gz'
+
+
+def save_document(storage: Storage, name: str, data: Any) -> None:
+
+    buffer: BytesIO = BytesIO()
+
+    # Without a timestamp, the same document always compresses the same way
+    with GzipFile(fileobj=buffer, mode='wb', mtime=0) as gzip_file:
+        gzip_file.write(JSONRenderer().render(data))
+
+    replace_file(storage, name, buffer.getvalue())
+
+
+def replace_file(storage: Storage, name: str, content: bytes) -> None:
+
+    # Storages which don't overwrite would save the file under another name.
+    # S3 overwrites it in place, so the manifest is never missing meanwhile
+    if not getattr(storage, 'file_overwrite', False) and storage.exists(name):
+        storage.delete(name)
+
+    storage.save(name, ContentFile(content))
+
+
+def read_manifest(storage: Storage, name: str) -> Optional[Dict[str, Any]]:
+
+    if not storage.exists(name):
+        return None
+
+    with storage.open(name) as manifest_file:
+        return json.loads(manifest_file.read().decode())
@@ -0,0 +1,70 @@
+from typing import List
+
+from django.conf import settings
+from django.core.checks import (
+    Error,
+    Warning,
+    register,
+)
+
+
+# Caches which each process keeps to itself
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+# Caches kept in the database, which are unreachable when it is
+DATABASE_CACHE_BACKENDS = (
+    'django.core.cache.backends.db.DatabaseCache',
+)
+
+
+@register()
+def check_api_cache_shared(app_configs, **kwargs) -> List[Error]:
+    """Content is also changed by other processes than the web server, e.g.
+    the rendition worker, whose invalidations a process local cache would
+    never see. The web server would then serve stale responses
+    """
+
+    backend: str = settings.CACHES[settings.API_CACHE_ALIAS]['BACKEND']
+
+    if backend not in PROCESS_LOCAL_CACHE_BACKENDS:
+        return []
+
+    return [
+        Error(
+            'The API response cache is local to each process, so the '
+            "rendition worker's changes wouldn't invalidate the web "
+            "server's cached responses",
+            hint=(
+                'Set API_CACHE_BACKEND to a cache shared between processes, '
+                'e.g. django.core.cache.backends.db.DatabaseCache'
+            ),
+            id='image_api.E001',
+        )
+    ]
+
+
+@register(deploy=True)
+def check_api_cache_outside_database(app_configs, **kwargs) -> List[Warning]:
+    """Stale responses are served while the database is unreachable, but
+    only if they're cached somewhere else
+    """
+
+    backend: str = settings.CACHES[settings.API_CACHE_ALIAS]['BACKEND']
+
+    if backend not in DATABASE_CACHE_BACKENDS:
+        return []
+
+    return [
+        Warning(
+            'The API response cache is kept in the database, so no stale '
+            'responses can be served while the database is unreachable',
+            hint=(
+                'Set API_CACHE_BACKEND and API_CACHE_LOCATION to a shared '
+                'cache outside the database, e.g. '
+                'django.core.cache.backends.memcached.PyLibMCCache'
+            ),
+            id='image_api.W001',
+        )
+    ]
@@ -0,0 +1,187 @@
+from datetime import date
+from typing import (
+    List,
+    Optional,
+)
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+)
+from django.db import connections
+from django.db.models import (
+    F,
+    Q,
+    QuerySet,
+)
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.request import Request
+
+from image_api.models import GalleryItem
+from image_api.pagination import GalleryItemCursorPagination
+
+
+TAG_MATCH_ANY: str = 'any'
+TAG_MATCH_ALL: str = 'all'
+
+SEARCH_PARAM: str = 'search'
+
+# Must match the configuration of the search vector trigger
+SEARCH_CONFIG: str = 'english'
+
+# Searched by the fallback used on databases other than Postgres
+SEARCH_FIELDS = (
+    'title',
+    'artist_name',
+    'media_description',
+    'description',
+)
+
+
+class GalleryItemFilter(BaseFilterBackend):
+    """Filters gallery items by query parameters:
+
+    tag: a tag name, which can be repeated. Items with any of the tags are
+        included, or with all of them if tag_match=all
+    artist_name: the exact artist name
+    created_date_after, created_date_before: an inclusive YYYY-MM-DD range.
+        Undated items are excluded from ranges
+
+    Each filter is served by an index; the tags by the through table's index
+    on the tag
+    """
+
+    def filter_queryset(
+        self,
+        request: Request,
+        queryset: QuerySet,
+        view
+    ) -> QuerySet:
+
+        params = request.query_params
+
+        tags: List[str] = params.getlist('tag')
+
+        if tags:
+            queryset = filter_by_tags(
+                queryset,
+                tags,
+                params.get('tag_match', TAG_MATCH_ANY)
+            )
+
+        artist_name: Optional[str] = params.get('artist_name')
+
+        if artist_name:
+            queryset = queryset.filter(artist_name=artist_name)
+
+        created_date_after: Optional[date] = get_date_param(
+            request,
+            'created_date_after'
+        )
+
+        if created_date_after is not None:
+            queryset = queryset.filter(created_date__gte=created_date_after)
+
+        created_date_before: Optional[date] = get_date_param(
+            request,
+            'created_date_before'
+        )
+
+        if created_date_before is not None:
+            queryset = queryset.filter(created_date__lte=created_date_before)
+
+        return queryset
+
+
+class GalleryItemSearchFilter(BaseFilterBackend):
+    """Searches gallery items' titles, artists and descriptions with the
+    search query parameter. Results are ordered by relevance.
+
+    Postgres uses the full text search vector and its GIN index. Other
+    databases match items with every word somewhere in the searched fields
+    """
+
+    def filter_queryset(
+        self,
+        request: Request,
+        queryset: QuerySet,
+        view
+    ) -> QuerySet:
+
+        terms: str = get_search_terms(request)
+
+        if not terms:
+            return queryset
+
+        if connections[queryset.db].vendor == 'postgresql':
+
+            query: SearchQuery = SearchQuery(terms, config=SEARCH_CONFIG)
+
+            return queryset.filter(search_vector=query).annotate(
+                search_rank=SearchRank(F('search_vector'), query)
+            ).order_by(
+                '-search_rank',
+                *GalleryItemCursorPagination.ordering
+            )
+
+        for word in terms.split():
+
+            matches_word: Q = Q()
+
+            for field_name in SEARCH_FIELDS:
+                matches_word |= Q(**{f'{field_name}__icontains': word})
+
+            queryset = queryset.filter(matches_word)
+
+        return queryset.order_by(*GalleryItemCursorPagination.ordering)
+
+
+def get_search_terms(request: Request) -> str:
+    return request.query_params.get(SEARCH_PARAM, '').strip()
+
+
+def filter_by_tags(queryset: QuerySet, tags: List[str], match: str) -> QuerySet:
+
+    through: QuerySet = GalleryItem.tags.through.objects
+
+    # Subqueries on the through table rather than joins, so that matching
+    # several tags doesn't return an item once per tag
+    if match == TAG_MATCH_ANY:
+        return queryset.filter(id__in=through.filter(
+            itemtag_id__in=tags
+        ).values('galleryitem_id'))
+
+    if match == TAG_MATCH_ALL:
+
+        for tag in set(tags):
+            queryset = queryset.filter(id__in=through.filter(
+                itemtag_id=tag
+            ).values('galleryitem_id'))
+
+        return queryset
+
+    raise ValidationError({
+        'tag_match': f'Must be "{TAG_MATCH_ANY}" or "{TAG_MATCH_ALL}"'
+    })
+
+
+def get_date_param(request: Request, name: str) -> Optional[date]:
+
+    value: Optional[str] = request.query_params.get(name)
+
+    if not value:
+        return None
+
+    try:
+        parsed: Optional[date] = parse_date(value)
+    except ValueError:
+        parsed: Optional[date] = None
+
+    if parsed is None:
+        raise ValidationError({
+            name: 'A date in the format YYYY-MM-DD is required'
+        })
+
+    return parsed
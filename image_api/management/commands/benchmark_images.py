@@ -0,0 +1,280 @@
+import json
+from multiprocessing import get_context
+from os import path
+from tempfile import TemporaryDirectory
+from typing import (
+    Any,
+    Dict,
+    List,
+)
+
+import PIL
+from django.conf import settings
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+
+from image_api.benchmarks import (
+    BenchmarkCase,
+    SOURCE_TYPES,
+    find_regressions,
+    run_calibration,
+    run_case,
+    write_source_image,
+)
+from image_api.renditions import (
+    ENCODER_PROFILES,
+    format_supported,
+)
+from image_api.utils.image_encoder import EncoderProfile
+
+
+BASELINE_PATH: str = path.join(
+    path.dirname(path.dirname(path.dirname(path.abspath(__file__)))),
+    'benchmark_baseline.json'
+)
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Benchmarks generating renditions from synthetic images, failing if '
+        'the memory use or output size is worse than the stored baseline. '
+        'Wall times are compared relative to a calibration workload timed on '
+        'each run, and only fail the run with --strict-time'
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--megapixels',
+            type=int,
+            nargs='+',
+            default=[1, 12, 60, 100],
+            help='Source image sizes, in megapixels (up to 100)'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.25,
+            help=(
+                'Allowed slowdown, relative to the calibration, or memory '
+                'growth, as a fraction'
+            )
+        )
+        parser.add_argument(
+            '--bytes-tolerance',
+            type=float,
+            default=0.02,
+            help='Allowed growth of the encoded output, as a fraction'
+        )
+        parser.add_argument(
+            '--strict-time',
+            action='store_true',
+            help=(
+                'Fail on slowdowns too, rather than only warning. Timings '
+                'are only reliable on an otherwise idle machine'
+            )
+        )
+        parser.add_argument(
+            '--baseline',
+            default=BASELINE_PATH,
+            help='The baseline results file'
+        )
+        parser.add_argument(
+            '--save-baseline',
+            action='store_true',
+            help='Store the results as the new baseline instead of comparing'
+        )
+        parser.add_argument(
+            '--output',
+            help='Also write the full results, per rendition, to this file'
+        )
+
+    def handle(self, *args, **options):
+
+        profiles: List[EncoderProfile] = [
+            profile
+            for save_format, profile in ENCODER_PROFILES.items()
+            if save_format in settings.RENDITION_FORMATS
+            and format_supported(save_format)
+        ]
+
+        cases: List[BenchmarkCase] = [
+            BenchmarkCase(megapixels, mode, source_format)
+            for megapixels in options['megapixels']
+            for mode, source_format in SOURCE_TYPES
+        ]
+
+        results: Dict[str, Dict[str, Any]] = {}
+
+        # Each case runs in a new process so its peak memory isn't
+        # inflated by the cases before it
+        context = get_context('spawn')
+
+        calibration_timings: List[float] = []
+
+        with context.Pool(processes=1, maxtasksperchild=1) as pool:
+            calibration_timings.append(pool.apply(run_calibration))
+
+        with TemporaryDirectory() as temp_dir:
+
+            for case in cases:
+
+                source_path: str = path.join(
+                    temp_dir,
+                    f'{case.name}.{case.format.lower()}'
+                )
+
+                with context.Pool(processes=1, maxtasksperchild=1) as pool:
+                    pool.apply(write_source_image, (case, source_path))
+
+                with context.Pool(processes=1, maxtasksperchild=1) as pool:
+                    results[case.name] = pool.apply(
+                        run_case,
+                        (
+                            case,
+                            source_path,
+                            settings.RENDITION_SIZES_PX,
+                            profiles,
+                        )
+                    )
+
+                self._write_result(case, results[case.name])
+
+        # Timed again afterwards, in case the machine's load changed
+        with context.Pool(processes=1, maxtasksperchild=1) as pool:
+            calibration_timings.append(pool.apply(run_calibration))
+
+        calibration_seconds: float = min(calibration_timings)
+
+        self.stdout.write(f'Calibration {calibration_seconds:.3f}s')
+
+        if options['output']:
+            with open(options['output'], 'w') as fout:
+                json.dump(results, fout, indent=2)
+
+        if options['save_baseline']:
+            self._save_baseline(
+                options['baseline'],
+                results,
+                calibration_seconds
+            )
+        else:
+            self._compare_with_baseline(options, results, calibration_seconds)
+
+    def _write_result(
+        self,
+        case: BenchmarkCase,
+        result: Dict[str, Any]
+    ) -> None:
+
+        self.stdout.write(
+            f'{case.name:<20} {result["wall_seconds"]:>8.3f}s '
+            f'{result["peak_rss_mb"]:>8.1f}MB '
+            f'{result["output_bytes"]:>10} bytes'
+        )
+
+        for rendition in result['renditions']:
+            self.stdout.write(
+                f'    {rendition["size"]:>5}px {rendition["format"]:<5} '
+                f'{rendition["width"]}x{rendition["height"]} '
+                f'resize {rendition["resize_seconds"]:.3f}s '
+                f'encode {rendition["encode_seconds"]:.3f}s '
+                f'{rendition["bytes"]} bytes'
+            )
+
+    def _save_baseline(
+        self,
+        baseline_path: str,
+        results: Dict[str, Dict[str, Any]],
+        calibration_seconds: float
+    ) -> None:
+
+        baseline: Dict[str, Any] = dict(
+            pillow_version=PIL.__version__,
+            calibration_seconds=calibration_seconds,
+            cases={
+                name: {
+                    metric: result[metric]
+                    for metric in (
+                        'wall_seconds',
+                        'peak_rss_mb',
+                        'output_bytes',
+                    )
+                }
+                for name, result in results.items()
+            }
+        )
+
+        with open(baseline_path, 'w') as fout:
+            json.dump(baseline, fout, indent=2, sort_keys=True)
+            fout.write('\n')
+
+        self.stdout.write(f'Saved the baseline to {baseline_path}')
+
+    def _compare_with_baseline(
+        self,
+        options: Dict[str, Any],
+        results: Dict[str, Dict[str, Any]],
+        calibration_seconds: float
+    ) -> None:
+
+        try:
+            with open(options['baseline']) as fin:
+                baseline: Dict[str, Any] = json.load(fin)
+        except FileNotFoundError:
+            raise CommandError(
+                f'No baseline at {options["baseline"]}, run with '
+                f'--save-baseline to create one'
+            )
+
+        if 'calibration_seconds' not in baseline:
+            raise CommandError(
+                f'The baseline at {options["baseline"]} has no calibration '
+                f'time, run with --save-baseline to record it again'
+            )
+
+        if baseline['pillow_version'] != PIL.__version__:
+            self.stderr.write(
+                f'The baseline was recorded with Pillow '
+                f'{baseline["pillow_version"]}, not {PIL.__version__}'
+            )
+
+        # How much slower this machine is than the baseline's
+        time_scale: float = (
+            calibration_seconds / baseline['calibration_seconds']
+        )
+
+        self.stdout.write(f'Baseline wall times scaled by {time_scale:.2f}')
+
+        regressions: List[str] = find_regressions(
+            results,
+            baseline['cases'],
+            {
+                'peak_rss_mb': options['tolerance'],
+                'output_bytes': options['bytes_tolerance'],
+            }
+        )
+        slowdowns: List[str] = find_regressions(
+            results,
+            baseline['cases'],
+            {'wall_seconds': options['tolerance']},
+            time_scale
+        )
+
+        if options['strict_time']:
+            regressions += slowdowns
+        elif slowdowns:
+            self.stderr.write(
+                'Slower than the baseline, which may only be noise:\n' +
+                '\n'.join(slowdowns)
+            )
+
+        if regressions:
+            raise CommandError(
+                'Performance regressions:\n' + '\n'.join(regressions)
+            )
+
+        self.stdout.write('No regressions against the baseline')
@@ -0,0 +1,41 @@
+from time import perf_counter
+from typing import (
+    Any,
+    Dict,
+)
+
+from django.core.management.base import BaseCommand
+
+from image_api.catalogue import export_catalogue
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Exports the gallery items, tags and social media links as static, "
+        "gzipped JSON documents in storage, under a version derived from "
+        "their content, and points the catalogue's manifest at that version"
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help=(
+                'Write the documents even if the manifest points at their '
+                'version already'
+            )
+        )
+
+    def handle(self, *args, **options):
+
+        start: float = perf_counter()
+
+        manifest: Dict[str, Any] = export_catalogue(force=options['force'])
+
+        self.stdout.write(
+            f"Catalogue version {manifest['version']}, with "
+            f"{len(manifest['gallery_items'])} gallery item pages, in "
+            f'{perf_counter() - start:.2f}s'
+        )
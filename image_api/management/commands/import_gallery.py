@@ -0,0 +1,515 @@
+import csv
+import json
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from datetime import (
+    date,
+    datetime,
+)
+from os import (
+    cpu_count,
+    listdir,
+    path,
+)
+from time import perf_counter
+from typing import (
+    Any,
+    Dict,
+    FrozenSet,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files import File
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+from django.db import (
+    connections,
+    transaction,
+)
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from PIL import Image
+
+from image_api.catalogue import queue_catalogue_export
+from image_api.models import (
+    GalleryItem,
+    ImageFile,
+    ItemTag,
+    Rendition,
+    RenditionStatus,
+)
+from image_api.renditions import (
+    EncodedRendition,
+    render_renditions,
+)
+from image_api.response_cache import bump_content_version
+from image_api.utils.content_hash import content_hash
+from image_api.utils.memory import peak_rss_mb
+from image_api.utils.placeholder import Placeholder
+
+
+IMAGE_EXTENSIONS: Tuple[str, ...] = (
+    '.gif',
+    '.jpeg',
+    '.jpg',
+    '.png',
+    '.tif',
+    '.tiff',
+    '.webp',
+)
+
+# Separates the tags in a CSV manifest's tags column
+CSV_TAG_SEPARATOR: str = ';'
+
+
+class ManifestEntry(NamedTuple):
+
+    file_path: str
+    title: str
+    artist_name: str
+    tags: Tuple[str, ...] = ()
+    created_date: Optional[date] = None
+    description: str = ''
+    media_description: str = ''
+    size_description: str = ''
+
+
+class ProcessedImage(NamedTuple):
+
+    entry: ManifestEntry
+    content_hash: str
+    width: int
+    height: int
+    renditions: List[EncodedRendition]
+    placeholder: Placeholder
+    seconds: float
+
+    # The worker process's peak memory use so far
+    peak_rss_mb: float
+
+
+# The content hashes of every original image imported already, set in each
+# worker process so that files imported before a crash can be skipped cheaply
+_imported_hashes: FrozenSet[str] = frozenset()
+
+
+def _init_worker(imported_hashes: FrozenSet[str]) -> None:
+
+    global _imported_hashes
+    _imported_hashes = imported_hashes
+
+
+def process_image(entry: ManifestEntry) -> Optional[ProcessedImage]:
+    """Decodes and resizes one image, in a worker process. Returns None if
+    the image was imported already
+    """
+
+    start_time: float = perf_counter()
+
+    with open(entry.file_path, 'rb') as fin:
+
+        file_hash: str = content_hash(File(fin))
+
+        if file_hash in _imported_hashes:
+            return None
+
+        fin.seek(0)
+
+        renditions, placeholder = render_renditions(
+            fin,
+            GalleryItem.RENDITION_SPECS
+        )
+
+        fin.seek(0)
+
+        # Only the header is read for the dimensions
+        with Image.open(fin) as image:
+            width, height = image.size
+
+    return ProcessedImage(
+        entry=entry,
+        content_hash=file_hash,
+        width=width,
+        height=height,
+        renditions=renditions,
+        placeholder=placeholder,
+        seconds=perf_counter() - start_time,
+        peak_rss_mb=peak_rss_mb()
+    )
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Imports gallery items from a directory of images, or from a CSV or '
+        'JSON manifest. Images imported already are skipped, so an '
+        'interrupted import can be run again to resume it'
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            'source',
+            help=(
+                'A directory of images, or a .csv/.json manifest with file, '
+                'title, artist_name, tags, created_date, description, '
+                'media_description and size_description fields. File paths '
+                'are relative to the manifest'
+            )
+        )
+        parser.add_argument(
+            '--artist-name',
+            default='',
+            help='The artist of images without one in the manifest'
+        )
+        parser.add_argument(
+            '--tag',
+            action='append',
+            default=[],
+            dest='tags',
+            help='A tag to add to every imported item. Can be repeated'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=cpu_count(),
+            help='Number of processes decoding and resizing images'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Number of items written to the database per transaction'
+        )
+
+    def handle(self, *args, **options):
+
+        entries: List[ManifestEntry] = list(self._read_entries(options))
+
+        imported_hashes: FrozenSet[str] = frozenset(
+            ImageFile.objects.filter(
+                gallery_item_as_original_image__isnull=False
+            ).exclude(
+                content_hash=''
+            ).values_list('content_hash', flat=True)
+        )
+
+        # Forked workers mustn't share the parent's database connections
+        connections.close_all()
+
+        self._imported = self._skipped = self._failed = 0
+        self._megapixels: float = 0
+        self._batch: List[ProcessedImage] = []
+        self._batch_hashes: Set[str] = set()
+
+        start_time: float = perf_counter()
+
+        with ProcessPoolExecutor(
+            max_workers=options['workers'],
+            initializer=_init_worker,
+            initargs=(imported_hashes,)
+        ) as processes, ThreadPoolExecutor(
+            max_workers=settings.RENDITION_THREAD_POOL_SIZE
+        ) as threads:
+
+            for future in self._iter_completed(processes, entries, options):
+
+                self._handle_result(future, threads, options['batch_size'])
+
+            self._write_batch(threads)
+
+        elapsed_seconds: float = perf_counter() - start_time
+
+        self.stdout.write(
+            f'Imported {self._imported}, skipped {self._skipped} and failed '
+            f'{self._failed} of {len(entries)} images in '
+            f'{elapsed_seconds:.1f}s ({self._imported / elapsed_seconds:.2f} '
+            f'images/s, {self._megapixels / elapsed_seconds:.1f} MP/s)'
+        )
+
+    def _iter_completed(
+        self,
+        processes: ProcessPoolExecutor,
+        entries: List[ManifestEntry],
+        options: Dict[str, Any]
+    ) -> Iterator[Future]:
+
+        # Only a few images are submitted ahead, so that finished images
+        # don't pile up in memory while earlier ones are being stored
+        max_pending: int = options['workers'] * 2
+        pending: Set[Future] = set()
+        remaining: Iterator[ManifestEntry] = iter(entries)
+
+        while True:
+
+            for entry in remaining:
+
+                future: Future = processes.submit(process_image, entry)
+                future.entry = entry
+                pending.add(future)
+
+                if len(pending) >= max_pending:
+                    break
+
+            if not pending:
+                return
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+            yield from done
+
+    def _handle_result(
+        self,
+        future: Future,
+        threads: ThreadPoolExecutor,
+        batch_size: int
+    ) -> None:
+
+        entry: ManifestEntry = future.entry
+
+        try:
+            processed: Optional[ProcessedImage] = future.result()
+        except Exception as e:
+            self._failed += 1
+            self.stderr.write(f'{entry.file_path}: failed - {e}')
+            return
+
+        if processed is None or processed.content_hash in self._batch_hashes:
+            self._skipped += 1
+            self.stdout.write(f'{entry.file_path}: imported already')
+            return
+
+        megapixels: float = processed.width * processed.height / 1e6
+
+        self.stdout.write(
+            f'{entry.file_path}: {processed.width}x{processed.height} in '
+            f'{processed.seconds:.2f}s '
+            f'({megapixels / processed.seconds:.1f} MP/s, worker peak RSS '
+            f'{processed.peak_rss_mb:.0f}MB)'
+        )
+
+        self._batch.append(processed)
+        self._batch_hashes.add(processed.content_hash)
+        self._megapixels += megapixels
+
+        if len(self._batch) >= batch_size:
+            self._write_batch(threads)
+
+    def _write_batch(self, threads: ThreadPoolExecutor) -> None:
+
+        image_files: List[ImageFile] = []
+        gallery_items: List[GalleryItem] = []
+        renditions: List[Rendition] = []
+        tag_names: Set[str] = set()
+        item_tags: List[Tuple[GalleryItem, str]] = []
+
+        stored: List[Future] = []
+        generated_time: datetime = timezone.now()
+
+        for processed in self._batch:
+
+            entry: ManifestEntry = processed.entry
+
+            original_image: ImageFile = ImageFile(id=uuid4())
+            image_files.append(original_image)
+
+            stored.append(threads.submit(
+                _store_original_image,
+                original_image,
+                processed
+            ))
+
+            item: GalleryItem = GalleryItem(
+                id=uuid4(),
+                original_image=original_image,
+                title=entry.title,
+                artist_name=entry.artist_name,
+                created_date=entry.created_date,
+                description=entry.description,
+                media_description=entry.media_description,
+                size_description=entry.size_description,
+                renditions_status=RenditionStatus.READY,
+                renditions_generated_time=generated_time,
+            )
+            gallery_items.append(item)
+
+            for encoded in processed.renditions:
+
+                image: ImageFile = ImageFile(id=uuid4())
+                image.set_placeholder(processed.placeholder)
+                image_files.append(image)
+
+                stored.append(threads.submit(
+                    image.store_file,
+                    encoded.as_file(),
+                    encoded.width,
+                    encoded.height
+                ))
+
+                renditions.append(Rendition(
+                    id=uuid4(),
+                    gallery_item=item,
+                    image=image,
+                    size=encoded.spec.size,
+                    format=encoded.spec.format
+                ))
+
+                for img_field_name, spec in GalleryItem.REDUCED_IMAGE_FIELDS:
+                    if spec == encoded.spec:
+                        setattr(item, img_field_name, image)
+
+            for tag_name in entry.tags:
+                tag_names.add(tag_name)
+                item_tags.append((item, tag_name))
+
+        # Every file must be stored before the rows pointing at it exist
+        for future in stored:
+            future.result()
+
+        with transaction.atomic():
+
+            ImageFile.objects.bulk_create(image_files)
+            GalleryItem.objects.bulk_create(gallery_items)
+            Rendition.objects.bulk_create(renditions)
+
+            ItemTag.objects.bulk_create(
+                [ItemTag(name=tag_name) for tag_name in tag_names],
+                ignore_conflicts=True
+            )
+            GalleryItem.tags.through.objects.bulk_create([
+                GalleryItem.tags.through(
+                    galleryitem_id=item.id,
+                    itemtag_id=tag_name
+                )
+                for item, tag_name in item_tags
+            ])
+
+            # Bulk creation doesn't send the signals which would do these
+            bump_content_version()
+            queue_catalogue_export()
+
+        self._imported += len(self._batch)
+        self._batch = []
+
+    def _read_entries(self, options: Dict[str, Any]) -> Iterator[ManifestEntry]:
+
+        source: str = options['source']
+
+        if path.isdir(source):
+
+            if not options['artist_name']:
+                raise CommandError(
+                    '--artist-name is required when importing a directory'
+                )
+
+            for file_name in sorted(listdir(source)):
+
+                title, extension = path.splitext(file_name)
+
+                if extension.lower() in IMAGE_EXTENSIONS:
+                    yield ManifestEntry(
+                        file_path=path.join(source, file_name),
+                        title=title,
+                        artist_name=options['artist_name'],
+                        tags=tuple(options['tags']),
+                    )
+
+            return
+
+        extension: str = path.splitext(source)[1].lower()
+
+        try:
+            with open(source, newline='') as fin:
+
+                if extension == '.csv':
+                    rows: List[Dict[str, Any]] = list(csv.DictReader(fin))
+                elif extension == '.json':
+                    rows: List[Dict[str, Any]] = json.load(fin)
+                else:
+                    raise CommandError(
+                        'The source must be a directory, or a .csv or .json '
+                        'manifest'
+                    )
+
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Failed to read the manifest: {e}')
+
+        manifest_dir: str = path.dirname(path.abspath(source))
+
+        for line, row in enumerate(rows, start=1):
+            yield self._parse_row(row, line, manifest_dir, options)
+
+    def _parse_row(
+        self,
+        row: Dict[str, Any],
+        line: int,
+        manifest_dir: str,
+        options: Dict[str, Any]
+    ) -> ManifestEntry:
+
+        tags: Any = row.get('tags') or []
+
+        if isinstance(tags, str):
+            tags = tags.split(CSV_TAG_SEPARATOR)
+
+        tags = tuple(
+            {tag.strip() for tag in tags if tag.strip()} | set(options['tags'])
+        )
+
+        if any(len(tag) > ItemTag._meta.pk.max_length for tag in tags):
+            raise CommandError(f'Manifest row {line}: a tag is too long')
+
+        created_date: Optional[date] = None
+
+        if row.get('created_date'):
+
+            created_date = parse_date(row['created_date'])
+
+            if created_date is None:
+                raise CommandError(
+                    f'Manifest row {line}: dates must be YYYY-MM-DD'
+                )
+
+        if not row.get('file') or not row.get('title'):
+            raise CommandError(f'Manifest row {line}: file and title are required')
+
+        artist_name: str = row.get('artist_name') or options['artist_name']
+
+        if not artist_name:
+            raise CommandError(f'Manifest row {line}: artist_name is required')
+
+        return ManifestEntry(
+            file_path=path.join(manifest_dir, row['file']),
+            title=row['title'],
+            artist_name=artist_name,
+            tags=tags,
+            created_date=created_date,
+            description=row.get('description') or '',
+            media_description=row.get('media_description') or '',
+            size_description=row.get('size_description') or '',
+        )
+
+
+def _store_original_image(img: ImageFile, processed: ProcessedImage) -> None:
+
+    with open(processed.entry.file_path, 'rb') as fin:
+        img.store_file(
+            File(fin),
+            processed.width,
+            processed.height,
+            processed.content_hash
+        )
@@ -0,0 +1,66 @@
+from time import sleep
+from typing import Optional
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from image_api.models import RenditionJob
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Generates the reduced size images for queued gallery items, and '
+        'runs queued catalogue exports'
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit when the queue is empty instead of waiting for jobs'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5.0,
+            help='Seconds to wait before checking an empty queue again'
+        )
+
+    def handle(self, *args, **options):
+
+        try:
+            self._process_jobs(options['once'], options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping rendition worker')
+
+    def _process_jobs(self, once: bool, poll_interval: float) -> None:
+
+        while True:
+
+            # The worker is long-lived, so drop connections the database
+            # may have closed in the meantime
+            close_old_connections()
+
+            job: Optional[RenditionJob] = RenditionJob.objects.claim()
+
+            if job is None:
+
+                if once:
+                    return
+
+                sleep(poll_interval)
+                continue
+
+            if job.kind == RenditionJob.CATALOGUE_EXPORT:
+                self.stdout.write(
+                    f'Exporting the catalogue (attempt {job.attempts})'
+                )
+            else:
+                self.stdout.write(
+                    f'Generating renditions for gallery item '
+                    f'{job.gallery_item_id} (attempt {job.attempts})'
+                )
+
+            job.run()
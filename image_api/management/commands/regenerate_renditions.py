@@ -0,0 +1,329 @@
+import json
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from datetime import datetime
+from os import (
+    path,
+    remove,
+)
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Set,
+)
+
+from django.conf import settings
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+from django.db import connection
+from django.db.models import (
+    Count,
+    Q,
+    QuerySet,
+)
+from django.utils import timezone
+from django.utils.dateparse import (
+    parse_date,
+    parse_datetime,
+)
+
+from image_api.models import (
+    GalleryItem,
+    RenditionStatus,
+)
+
+
+# Decoded images take up to 4 bytes per pixel, and each item also holds a
+# resized copy per concurrently encoded rendition
+BYTES_PER_PIXEL: int = 4 * 2
+
+
+def estimate_memory_bytes(item: GalleryItem) -> int:
+
+    original_image = item.original_image
+
+    return original_image.width * original_image.height * BYTES_PER_PIXEL
+
+
+def regenerate(item: GalleryItem) -> None:
+
+    try:
+        item.generate_renditions()
+    finally:
+        # Each worker thread has its own connection
+        connection.close()
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Regenerates the renditions of existing gallery items, e.g. after the '
+        'rendition sizes or encoder settings change. Progress is checkpointed '
+        'so that an interrupted run resumes where it stopped'
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--only-missing',
+            action='store_true',
+            help=(
+                'Only regenerate items missing one of the registry renditions '
+                "or a tile pyramid, or whose renditions aren't ready"
+            )
+        )
+        parser.add_argument(
+            '--since',
+            help=(
+                "Only regenerate items whose renditions haven't been "
+                'generated since this date or datetime (ISO 8601)'
+            )
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the items that would be regenerated without changing them'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=2,
+            help='Number of items regenerated at once'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=100,
+            help='Number of items read from the database at once'
+        )
+        parser.add_argument(
+            '--memory-limit',
+            type=int,
+            default=settings.RENDITION_REGENERATE_MEMORY_LIMIT_MB,
+            help=(
+                'Estimated memory in MB the items being regenerated at once '
+                'may use. A larger item still runs, on its own'
+            )
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default='regenerate_renditions.checkpoint',
+            help='File recording the progress, removed once the run completes'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore the checkpoint and start from the first item'
+        )
+
+    def handle(self, *args, **options):
+
+        items: QuerySet = self._get_queryset(options)
+
+        last_pk: Optional[str] = None
+
+        if not options['restart']:
+            last_pk = self._read_checkpoint(options['checkpoint'])
+
+        if last_pk is not None:
+            self.stdout.write(f'Resuming after gallery item {last_pk}')
+
+        self._regenerated = self._failed = 0
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+
+            while True:
+
+                # Keyset pagination, so each chunk is an indexed lookup
+                # however far through the items the run is
+                chunk: QuerySet = items.order_by('pk')
+
+                if last_pk is not None:
+                    chunk = chunk.filter(pk__gt=last_pk)
+
+                last_chunk_pk: Optional[str] = self._regenerate_chunk(
+                    chunk[:options['chunk_size']].iterator(),
+                    executor,
+                    options
+                )
+
+                if last_chunk_pk is None:
+                    break
+
+                last_pk = last_chunk_pk
+
+                if not options['dry_run']:
+                    self._write_checkpoint(options['checkpoint'], last_pk)
+
+        if options['dry_run']:
+            self.stdout.write(f'{self._regenerated} items would be regenerated')
+            return
+
+        if path.exists(options['checkpoint']):
+            remove(options['checkpoint'])
+
+        self.stdout.write(
+            f'Regenerated {self._regenerated} items, {self._failed} failed'
+        )
+
+    def _get_queryset(self, options: Dict[str, Any]) -> QuerySet:
+
+        items: QuerySet = GalleryItem.objects.select_related(
+            'original_image'
+        ).only(
+            'id',
+            'title',
+            'original_image__id',
+            'original_image__file',
+            'original_image__width',
+            'original_image__height',
+        )
+
+        if options['only_missing']:
+
+            is_registry_rendition: Q = Q()
+
+            for spec in GalleryItem.RENDITION_SPECS:
+                is_registry_rendition |= Q(
+                    renditions__size=spec.size,
+                    renditions__format=spec.format
+                )
+
+            is_missing: Q = (
+                Q(registry_renditions__lt=len(GalleryItem.RENDITION_SPECS)) |
+                ~Q(renditions_status=RenditionStatus.READY)
+            )
+
+            if settings.DEEP_ZOOM_ENABLED:
+
+                # Originals larger than this get a tile pyramid too
+                min_size: int = settings.DEEP_ZOOM_MIN_SIZE_PX
+
+                is_missing |= Q(tile_pyramid__isnull=True) & (
+                    Q(original_image__width__gt=min_size) |
+                    Q(original_image__height__gt=min_size)
+                )
+
+            items = items.annotate(
+                registry_renditions=Count(
+                    'renditions',
+                    filter=is_registry_rendition
+                )
+            ).filter(
+                is_missing
+            )
+
+        if options['since']:
+
+            since: datetime = self._parse_since(options['since'])
+
+            items = items.filter(
+                Q(renditions_generated_time__isnull=True) |
+                Q(renditions_generated_time__lt=since)
+            )
+
+        return items
+
+    def _regenerate_chunk(
+        self,
+        chunk: List[GalleryItem],
+        executor: ThreadPoolExecutor,
+        options: Dict[str, Any]
+    ) -> Optional[str]:
+        """Regenerates the chunk's items and returns the last one's ID, or
+        None if the chunk is empty
+        """
+
+        memory_limit: int = options['memory_limit'] * 1024 * 1024
+        memory_used: int = 0
+        running: Set[Future] = set()
+        last_pk: Optional[str] = None
+
+        for item in chunk:
+
+            last_pk = str(item.pk)
+
+            if options['dry_run']:
+                self._regenerated += 1
+                self.stdout.write(f'{item.pk}: {item.title}')
+                continue
+
+            memory_needed: int = estimate_memory_bytes(item)
+
+            # Wait until the item fits in memory next to the running ones
+            while running and (
+                memory_used + memory_needed > memory_limit or
+                len(running) >= options['workers']
+            ):
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                memory_used -= sum(self._finish(future) for future in done)
+
+            future: Future = executor.submit(regenerate, item)
+            future.item = item
+            future.memory_needed = memory_needed
+
+            running.add(future)
+            memory_used += memory_needed
+
+        # The checkpoint is only moved on once the whole chunk is done
+        for future in running:
+            self._finish(future)
+
+        return last_pk
+
+    def _finish(self, future: Future) -> int:
+
+        item: GalleryItem = future.item
+
+        try:
+            future.result()
+        except Exception as e:
+            self._failed += 1
+            self.stderr.write(f'{item.pk}: failed - {e}')
+        else:
+            self._regenerated += 1
+            self.stdout.write(f'{item.pk}: regenerated')
+
+        return future.memory_needed
+
+    def _parse_since(self, value: str) -> datetime:
+
+        since: Optional[datetime] = parse_datetime(value)
+
+        if since is None:
+
+            since_date = parse_date(value)
+
+            if since_date is None:
+                raise CommandError('--since must be an ISO 8601 date or datetime')
+
+            since = datetime.combine(since_date, datetime.min.time())
+
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+
+        return since
+
+    def _read_checkpoint(self, checkpoint_path: str) -> Optional[str]:
+
+        if not path.exists(checkpoint_path):
+            return None
+
+        try:
+            with open(checkpoint_path) as fin:
+                return json.load(fin)['last_pk']
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f'Failed to read the checkpoint: {e}')
+
+    def _write_checkpoint(self, checkpoint_path: str, last_pk: str) -> None:
+
+        with open(checkpoint_path, 'w') as fout:
+            json.dump({'last_pk': last_pk}, fout)
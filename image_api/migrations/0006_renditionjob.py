@@ -0,0 +1,62 @@
+# Generated by Django 2.2.1 on 2026-10-18 06:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def mark_existing_renditions_ready(apps, schema_editor):
+
+    GalleryItem = apps.get_model('image_api', 'GalleryItem')
+
+    # Items saved before rendition jobs existed have their images already
+    GalleryItem.objects.filter(
+        large_image__isnull=False,
+        thumbnail_image__isnull=False,
+    ).update(renditions_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('image_api', '0005_auto_20190511_1903'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='galleryitem',
+            name='renditions_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', editable=False, max_length=16),
+        ),
+        migrations.AlterField(
+            model_name='galleryitem',
+            name='large_image',
+            field=models.OneToOneField(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='gallery_item_as_large_image', to='image_api.ImageFile'),
+        ),
+        migrations.AlterField(
+            model_name='galleryitem',
+            name='thumbnail_image',
+            field=models.OneToOneField(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='gallery_item_as_thumbnail_image', to='image_api.ImageFile'),
+        ),
+        migrations.RunPython(
+            mark_existing_renditions_ready,
+            migrations.RunPython.noop,
+        ),
+        migrations.CreateModel(
+            name='RenditionJob',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False, verbose_name='Object UUID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('failed', 'Failed')], default='pending', max_length=16)),
+                ('attempts', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('run_after', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('started_time', models.DateTimeField(blank=True, null=True)),
+                ('created_time', models.DateTimeField(auto_now_add=True)),
+                ('gallery_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rendition_jobs', to='image_api.GalleryItem')),
+            ],
+            options={
+                'verbose_name': 'rendition job',
+                'ordering': ('run_after',),
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 2.2.1 on 2026-10-18 06:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+def backfill_renditions(apps, schema_editor):
+
+    GalleryItem = apps.get_model('image_api', 'GalleryItem')
+    Rendition = apps.get_model('image_api', 'Rendition')
+    RenditionJob = apps.get_model('image_api', 'RenditionJob')
+
+    for item in GalleryItem.objects.all():
+
+        # The existing reduced size images become the matching renditions
+        for image_id, size in (
+            (item.thumbnail_image_id, 300),
+            (item.large_image_id, 1000),
+        ):
+            if image_id is not None:
+                Rendition.objects.create(
+                    id=uuid.uuid4(),
+                    gallery_item=item,
+                    image_id=image_id,
+                    size=size,
+                    format='JPEG',
+                )
+
+        # The remaining sizes and formats are generated by the worker
+        RenditionJob.objects.create(id=uuid.uuid4(), gallery_item=item)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('image_api', '0006_renditionjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Rendition',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False, verbose_name='Object UUID')),
+                ('size', models.IntegerField()),
+                ('format', models.CharField(choices=[('JPEG', 'JPEG'), ('WEBP', 'WEBP')], max_length=8)),
+                ('created_time', models.DateTimeField(auto_now_add=True)),
+                ('gallery_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renditions', to='image_api.GalleryItem')),
+                ('image', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rendition', to='image_api.ImageFile')),
+            ],
+            options={
+                'verbose_name': 'rendition',
+                'ordering': ('format', 'size'),
+                'unique_together': {('gallery_item', 'size', 'format')},
+            },
+        ),
+        migrations.RunPython(
+            backfill_renditions,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.1 on 2026-10-18 06:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('image_api', '0007_rendition'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagefile',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, verbose_name='SHA-256 of the file contents'),
+        ),
+    ]
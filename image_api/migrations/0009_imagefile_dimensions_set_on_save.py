@@ -0,0 +1,19 @@
+# Generated by Django 2.2.1 on 2026-10-18 06:24
+
+from django.db import migrations, models
+import image_api.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('image_api', '0008_imagefile_content_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='imagefile',
+            name='file',
+            field=models.ImageField(upload_to=image_api.models.upload_to_uuid),
+        ),
+    ]
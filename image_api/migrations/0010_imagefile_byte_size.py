@@ -0,0 +1,18 @@
+# Generated by Django 2.2.1 on 2026-10-18 06:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('image_api', '0009_imagefile_dimensions_set_on_save'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagefile',
+            name='byte_size',
+            field=models.IntegerField(editable=False, null=True, verbose_name='File size in bytes'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.1 on 2026-10-18 06:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('image_api', '0010_imagefile_byte_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagefile',
+            name='blurhash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='imagefile',
+            name='dominant_color',
+            field=models.CharField(blank=True, editable=False, max_length=7),
+        ),
+    ]
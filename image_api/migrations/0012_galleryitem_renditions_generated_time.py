@@ -0,0 +1,18 @@
+# Generated by Django 2.2.1 on 2026-10-18 06:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('image_api', '0011_imagefile_placeholder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='galleryitem',
+            name='renditions_generated_time',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+    ]
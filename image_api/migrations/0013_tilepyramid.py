@@ -0,0 +1,29 @@
+# Generated by Django 2.2.1 on 2026-10-18 06:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('image_api', '0012_galleryitem_renditions_generated_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TilePyramid',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False, verbose_name='Object UUID')),
+                ('width', models.IntegerField(editable=False)),
+                ('height', models.IntegerField(editable=False)),
+                ('tile_size', models.IntegerField(editable=False)),
+                ('overlap', models.IntegerField(editable=False)),
+                ('created_time', models.DateTimeField(auto_now_add=True)),
+                ('gallery_item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='tile_pyramid', to='image_api.GalleryItem')),
+            ],
+            options={
+                'verbose_name': 'tile pyramid',
+            },
+        ),
+    ]
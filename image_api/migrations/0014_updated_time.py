@@ -0,0 +1,23 @@
+# Generated by Django 2.2.1 on 2026-10-18 06:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('image_api', '0013_tilepyramid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='galleryitem',
+            name='updated_time',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='itemtag',
+            name='updated_time',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
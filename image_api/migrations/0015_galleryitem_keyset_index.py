@@ -0,0 +1,16 @@
+import image_api.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('image_api', '0014_updated_time'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='galleryitem',
+            index=image_api.models.NullsLastIndex(fields=['-created_date', 'title', 'id'], name='image_api_galleryitem_keyset'),
+        ),
+    ]
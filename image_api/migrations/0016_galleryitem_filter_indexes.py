@@ -0,0 +1,17 @@
+# Generated by Django 2.2.1 on 2026-10-18 06:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('image_api', '0015_galleryitem_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='galleryitem',
+            index=models.Index(fields=['artist_name', 'created_date'], name='galleryitem_artist_date'),
+        ),
+    ]
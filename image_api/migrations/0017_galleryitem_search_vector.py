@@ -0,0 +1,69 @@
+# Generated by Django 2.2.1 on 2026-10-18 06:52
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# The text search configuration must match the one searches use
+CREATE_SEARCH_TRIGGER = """
+CREATE FUNCTION image_api_galleryitem_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.artist_name, '')), 'A') ||
+        setweight(
+            to_tsvector('english', coalesce(NEW.media_description, '')),
+            'B'
+        ) ||
+        setweight(to_tsvector('english', coalesce(NEW.description, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER image_api_galleryitem_search_vector_update
+BEFORE INSERT OR UPDATE OF
+    title, artist_name, media_description, description, search_vector
+ON image_api_galleryitem
+FOR EACH ROW EXECUTE PROCEDURE image_api_galleryitem_search_vector();
+
+UPDATE image_api_galleryitem SET search_vector = NULL;
+
+CREATE INDEX image_api_galleryitem_search
+ON image_api_galleryitem USING GIN (search_vector);
+"""
+
+DROP_SEARCH_TRIGGER = """
+DROP INDEX image_api_galleryitem_search;
+DROP TRIGGER image_api_galleryitem_search_vector_update
+ON image_api_galleryitem;
+DROP FUNCTION image_api_galleryitem_search_vector();
+"""
+
+
+def create_search_trigger(apps, schema_editor):
+
+    # Other databases search the text fields directly
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_SEARCH_TRIGGER)
+
+
+def drop_search_trigger(apps, schema_editor):
+
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SEARCH_TRIGGER)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('image_api', '0016_galleryitem_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='galleryitem',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_trigger, drop_search_trigger),
+    ]
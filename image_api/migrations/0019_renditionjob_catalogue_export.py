@@ -0,0 +1,24 @@
+# Generated by Django 2.2.1 on 2026-10-18 07:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('image_api', '0017_galleryitem_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='renditionjob',
+            name='kind',
+            field=models.CharField(choices=[('renditions', 'Renditions'), ('catalogue_export', 'Catalogue export')], default='renditions', max_length=16),
+        ),
+        migrations.AlterField(
+            model_name='renditionjob',
+            name='gallery_item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rendition_jobs', to='image_api.GalleryItem'),
+        ),
+    ]
@@ -2,17 +2,44 @@ from logging import (
     getLogger,
     Logger,
 )
-from typing import Tuple
+from collections import defaultdict
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from datetime import timedelta
+from io import BytesIO
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+from urllib.parse import (
+    urlsplit,
+    urlunsplit,
+)
 from uuid import (
     UUID,
     uuid4,
 )
 
 from boto3.exceptions import Boto3Error
+from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.db import transaction
+from django.db import (
+    IntegrityError,
+    transaction,
+)
 from django.db.models import (
     Model,
     ImageField,
@@ -24,20 +51,46 @@ from django.db.models import (
     CASCADE,
     Manager,
     CharField,
+    DateTimeField,
+    ForeignKey,
+    Index,
+    Q,
 )
 from django.db.models.fields.files import ImageFieldFile
+from django.utils import timezone
+from PIL import Image
 
 from gallery_shared.models import UUIDModel
+from image_api.renditions import (
+    DECODE_BUDGET,
+    ENCODER_PROFILES,
+    RENDITION_CONTENT_TYPES,
+    RENDITION_SPECS,
+    RenditionSpec,
+    encode_rendition,
+)
+from image_api.response_cache import bump_content_version
+from image_api.utils.content_hash import content_hash
+from image_api.utils.decode_budget import ImageTooLargeError
+from image_api.utils.deep_zoom import (
+    DeepZoomLayout,
+    dzi_descriptor,
+    iter_tiles,
+)
+from image_api.utils.image_encoder import prepare_image
+from image_api.utils.image_ingest import ImageIngest
 from image_api.utils.image_resizer import ImageResizer
+from image_api.utils.memory import peak_rss_mb
+from image_api.utils.placeholder import (
+    Placeholder,
+    make_placeholder,
+)
 
 
 log: Logger = getLogger(__name__)
 
 
 IMAGE_FOLDER_NAME: str = 'gallery_images'
-REDUCED_IMAGE_COMPRESSION_QUALITY: int = 85
-REDUCED_IMAGE_CONTENT_TYPE: str = 'image/jpeg'
-REDUCED_IMAGE_FORMAT: str = 'JPEG'
 
 
 class ReducedImageSizePx(object):
@@ -47,6 +100,19 @@ class ReducedImageSizePx(object):
     LARGE: int = 1000
 
 
+class RenditionStatus(object):
+
+    PENDING: str = 'pending'
+    READY: str = 'ready'
+    FAILED: str = 'failed'
+
+    CHOICES: Tuple[Tuple[str, str]] = (
+        (PENDING, 'Pending'),
+        (READY, 'Ready'),
+        (FAILED, 'Failed'),
+    )
+
+
 def upload_to_uuid(instance: 'ImageFile', _filename: str):
 
     if not isinstance(instance.pk, UUID):
@@ -62,11 +128,64 @@ class ImageFile(UUIDModel):
 
     width: int = IntegerField(editable=False)
     height: int = IntegerField(editable=False)
+    # The dimensions are set when the file is saved, as the image has been
+    # read already at that point. Django's dimension fields would instead
+    # read the file back from storage
     file: ImageFieldFile = ImageField(
-        height_field='height',
-        width_field='width',
         upload_to=upload_to_uuid
     )
+    content_hash: str = CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        editable=False,
+        verbose_name='SHA-256 of the file contents'
+    )
+    byte_size: int = IntegerField(
+        null=True,
+        editable=False,
+        verbose_name='File size in bytes'
+    )
+
+    # Shown by clients while the image itself is loading
+    blurhash: str = CharField(max_length=64, blank=True, editable=False)
+    dominant_color: str = CharField(max_length=7, blank=True, editable=False)
+
+    def save_file(
+        self,
+        file: File,
+        width: int,
+        height: int,
+        file_hash: Optional[str] = None
+    ) -> None:
+
+        self.store_file(file, width, height, file_hash)
+        self.save()
+
+    def store_file(
+        self,
+        file: File,
+        width: int,
+        height: int,
+        file_hash: Optional[str] = None
+    ) -> None:
+        """Writes the file to storage without saving the model"""
+
+        self.width = width
+        self.height = height
+        self.byte_size = file.size
+        self.content_hash = file_hash or content_hash(file)
+
+        self.file.save(
+            None,
+            file,
+            save=False
+        )
+
+    def set_placeholder(self, placeholder: Placeholder) -> None:
+
+        self.blurhash = placeholder.blurhash
+        self.dominant_color = placeholder.dominant_color
 
     def delete(self, *args, **kwargs):
 
@@ -92,10 +211,49 @@ class ItemTag(Model):
 
     name: str = CharField(primary_key=True, max_length=32)
 
+    updated_time = DateTimeField(auto_now=True)
+
     def __str__(self) -> str:
         return self.name
 
 
+class NullsLastIndex(Index):
+    """An index whose first field is in descending order with nulls last, as
+    ordered by F(field).desc(nulls_last=True). Django can't declare that, so
+    the first column is written for each database. SQLite can only sort
+    nulls last by an expression, which the index leads with
+    """
+
+    def create_sql(self, model, schema_editor, using=''):
+
+        statement = super(NullsLastIndex, self).create_sql(
+            model,
+            schema_editor,
+            using
+        )
+
+        columns: List[str] = [
+            schema_editor.quote_name(model._meta.get_field(name).column) +
+            (' DESC' if order else '')
+            for name, order in self.fields_orders
+        ]
+        first_column: str = schema_editor.quote_name(
+            model._meta.get_field(self.fields_orders[0][0]).column
+        )
+        vendor: str = schema_editor.connection.vendor
+
+        if vendor == 'postgresql':
+            columns[0] = f'{first_column} DESC NULLS LAST'
+        elif vendor == 'sqlite':
+            columns[:1] = [f'({first_column} IS NULL)', f'{first_column} DESC']
+        else:
+            columns[0] = f'{first_column} DESC'
+
+        statement.parts['columns'] = ', '.join(columns)
+
+        return statement
+
+
 class GalleryItem(UUIDModel):
 
     class Meta:
@@ -104,23 +262,49 @@ class GalleryItem(UUIDModel):
             '-created_date',
             'title',
         )
+        indexes = (
+            # Matches the pagination ordering, which puts undated items last
+            NullsLastIndex(
+                fields=('-created_date', 'title', 'id'),
+                name='image_api_galleryitem_keyset'
+            ),
+            # For filtering by artist, and by artist and date range. On
+            # Postgres, date ranges alone use the keyset pagination index
+            Index(
+                fields=('artist_name', 'created_date'),
+                name='galleryitem_artist_date'
+            ),
+        )
 
     objects: Manager
 
-    REDUCED_IMAGE_FIELDS: Tuple[Tuple[str, int]] = (
-        ('thumbnail_image', ReducedImageSizePx.THUMBNAIL),
-        ('large_image', ReducedImageSizePx.LARGE),
+    # The reduced size image fields point at the matching renditions
+    REDUCED_IMAGE_FIELDS: Tuple[Tuple[str, RenditionSpec]] = (
+        ('thumbnail_image', RenditionSpec(ReducedImageSizePx.THUMBNAIL, 'JPEG')),
+        ('large_image', RenditionSpec(ReducedImageSizePx.LARGE, 'JPEG')),
     )
 
+    RENDITION_SPECS: Tuple[RenditionSpec] = tuple(sorted(
+        set(RENDITION_SPECS) | {
+            spec for _img_field_name, spec in REDUCED_IMAGE_FIELDS
+        }
+    ))
+
+    # Originals are decoded at the smallest scale covering this size
+    MAX_RENDITION_SIZE_PX: int = max(spec.size for spec in RENDITION_SPECS)
+
     original_image: ImageFile = OneToOneField(
         to=ImageFile,
         on_delete=CASCADE,
         related_name='gallery_item_as_original_image'
     )
 
+    # The reduced size images are generated asynchronously by a rendition
+    # job, so they are missing until the first job for the item has run
     large_image: ImageFile = OneToOneField(
         to=ImageFile,
         on_delete=CASCADE,
+        null=True,
         editable=False,
         related_name='gallery_item_as_large_image'
     )
@@ -128,10 +312,19 @@ class GalleryItem(UUIDModel):
     thumbnail_image: ImageFile = OneToOneField(
         to=ImageFile,
         on_delete=CASCADE,
+        null=True,
         editable=False,
         related_name='gallery_item_as_thumbnail_image'
     )
 
+    renditions_status: str = CharField(
+        max_length=16,
+        choices=RenditionStatus.CHOICES,
+        default=RenditionStatus.PENDING,
+        editable=False
+    )
+    renditions_generated_time = DateTimeField(null=True, editable=False)
+
     title: str = TextField()
     created_date = DateField(null=True, blank=True)
     description: str = TextField(blank=True)
@@ -141,56 +334,704 @@ class GalleryItem(UUIDModel):
 
     tags = ManyToManyField(to=ItemTag, blank=True)
 
+    # Maintained by a database trigger on Postgres, and unused elsewhere
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # Also updated when anything else the item's API response includes, such
+    # as its tags or renditions, changes
+    updated_time = DateTimeField(auto_now=True)
+
+    # Set when a new original image is stored, so that saves which only
+    # change the item's details don't regenerate the renditions
+    _original_image_changed: bool = False
+
     def save(self, *args, **kwargs) -> None:
 
         with transaction.atomic():
 
-            self._save_reduced_size_images()
+            if self._original_image_changed:
+                # The reduced size images are generated by a rendition job so
+                # that saving doesn't wait for the resizing and the uploads
+                self.renditions_status = RenditionStatus.PENDING
 
             super(GalleryItem, self).save(*args, **kwargs)
 
-    def save_image(self, file: File) -> None:
-
-        self._save_image_field('original_image', file)
+            if self._original_image_changed:
+                RenditionJob.objects.enqueue(self)
+                self._original_image_changed = False
 
-    def _save_image_field(self, image_field: str, file: File) -> None:
+    def save_image(self, ingest: ImageIngest) -> None:
 
         try:
-            img: ImageFile = getattr(self, image_field)
+            img: Optional[ImageFile] = self.original_image
         except ImageFile.DoesNotExist:
+            img: Optional[ImageFile] = None
+
+        if img is not None and img.content_hash == ingest.content_hash:
+            return  # The same image was uploaded again
+
+        if img is None:
             # We need to generate the ID because it will become the image name
             img: ImageFile = ImageFile(id=uuid4())
 
-        # Saving the file field saves the related model too
-        img.file.save(
-            None,
-            file
+        img.save_file(
+            ingest.file,
+            ingest.width,
+            ingest.height,
+            ingest.content_hash
+        )
+
+        self.original_image = img
+        self._original_image_changed = True
+
+    def generate_renditions(self) -> None:
+
+        start_peak_rss_mb: float = peak_rss_mb()
+
+        with transaction.atomic():
+
+            self._save_renditions()
+
+            self.renditions_status = RenditionStatus.READY
+            self.renditions_generated_time = timezone.now()
+
+            # Only the generated fields are written, so that this doesn't
+            # overwrite edits made since the item was loaded
+            GalleryItem.objects.filter(pk=self.pk).update(
+                large_image=self.large_image,
+                thumbnail_image=self.thumbnail_image,
+                renditions_status=self.renditions_status,
+                renditions_generated_time=self.renditions_generated_time,
+                updated_time=self.renditions_generated_time
+            )
+            bump_content_version()
+
+        if settings.DEEP_ZOOM_ENABLED:
+            self._save_tile_pyramid()
+
+        # The peak only grows if this was the most memory hungry ingest yet
+        log.info(
+            f'Generated renditions for gallery item {self.pk}, process peak '
+            f'RSS {peak_rss_mb():.0f}MB (was {start_peak_rss_mb:.0f}MB before)'
+        )
+
+    def _save_renditions(self) -> None:
+
+        renditions: Dict[RenditionSpec, Rendition] = {
+            rendition.spec: rendition
+            for rendition in self.renditions.select_related('image')
+        }
+
+        specs_by_size: Dict[int, List[RenditionSpec]] = defaultdict(list)
+
+        for spec in self.RENDITION_SPECS:
+            specs_by_size[spec.size].append(spec)
+
+        stored: List[Tuple[Rendition, Future]] = []
+
+        resizer: ImageResizer = ImageResizer(
+            self._original_image_file(),
+            DECODE_BUDGET
+        )
+
+        executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=settings.RENDITION_THREAD_POOL_SIZE
         )
 
-        setattr(self, image_field, img)
+        with resizer, executor:
+
+            # Each size is built from the next largest one, so the
+            # full size original is only decoded (and drafted) once
+            for new_size, image in resizer.iter_box_sizes(specs_by_size):
+
+                for spec in specs_by_size[new_size]:
+
+                    rendition: Rendition = renditions.get(spec) or Rendition(
+                        gallery_item=self,
+                        size=spec.size,
+                        format=spec.format
+                    )
+
+                    if rendition.image_id is None:
+                        rendition.image = ImageFile(id=uuid4())
+
+                    # Pillow releases the GIL while encoding and the upload
+                    # is I/O bound, so renditions are encoded and stored
+                    # concurrently. Saving an image sets attributes on it,
+                    # so each thread needs its own copy
+                    stored.append((
+                        rendition,
+                        executor.submit(
+                            store_rendition,
+                            rendition.image,
+                            image.copy(),
+                            spec
+                        )
+                    ))
+
+                    renditions[spec] = rendition
+
+            # The smallest rendition is plenty to compute the placeholder from
+            placeholder: Placeholder = make_placeholder(image)
+
+            # The database is only written from this thread, once every
+            # rendition has been stored
+            for rendition, future in stored:
+                future.result()
+                rendition.image.set_placeholder(placeholder)
+                rendition.image.save()
+                rendition.save()
 
-    def _save_reduced_size_images(self) -> None:
+        # Renditions outside the registry were either removed from it or
+        # generated on demand from the previous original, so are stale now
+        for spec, rendition in renditions.items():
+            if spec not in self.RENDITION_SPECS:
+                rendition.image.delete()
+
+        for img_field_name, spec in self.REDUCED_IMAGE_FIELDS:
+            setattr(self, img_field_name, renditions[spec].image)
+
+    def _save_tile_pyramid(self) -> None:
+        """Replaces the item's tile pyramid, if the original image is large
+        enough to need one
+        """
+
+        try:
+            old_pyramid: Optional[TilePyramid] = self.tile_pyramid
+        except TilePyramid.DoesNotExist:
+            old_pyramid: Optional[TilePyramid] = None
+
+        pyramid: Optional[TilePyramid] = None
+
+        largest_dimension: int = max(
+            self.original_image.width,
+            self.original_image.height
+        )
+
+        if largest_dimension > settings.DEEP_ZOOM_MIN_SIZE_PX:
+
+            pyramid = TilePyramid(
+                gallery_item=self,
+                tile_size=settings.DEEP_ZOOM_TILE_SIZE_PX,
+                overlap=settings.DEEP_ZOOM_TILE_OVERLAP_PX
+            )
+
+            try:
+                with ImageResizer(
+                    self._original_image_file(),
+                    DECODE_BUDGET
+                ) as resizer:
+                    pyramid.store_tiles(resizer.full_size_image())
+
+            except ImageTooLargeError as e:
+                # Unlike the renditions, the tiles need a full size decode
+                log.warning(
+                    f'Not generating a tile pyramid for gallery item '
+                    f'{self.pk}: {e}'
+                )
+                pyramid = None
+
+        with transaction.atomic():
+
+            if old_pyramid is not None:
+                # The files are deleted once the new pyramid replaces it
+                TilePyramid.objects.filter(pk=old_pyramid.pk).delete()
+
+            if pyramid is not None:
+                pyramid.save()
+
+        if old_pyramid is not None:
+            old_pyramid.delete_files()
+
+    def get_or_create_rendition(self, spec: RenditionSpec) -> 'Rendition':
+        """Returns the rendition for the spec, generating and storing it if
+        it doesn't exist yet. Unlike the registry renditions, these are
+        generated on demand when first requested
+        """
+
+        try:
+            return self.renditions.select_related('image').get(
+                size=spec.size,
+                format=spec.format
+            )
+        except Rendition.DoesNotExist:
+            pass
+
+        with ImageResizer(
+            self._original_image_file(),
+            DECODE_BUDGET
+        ) as resizer:
+
+            _new_size, image = next(resizer.iter_box_sizes((spec.size,)))
+
+            file: SimpleUploadedFile = encode_rendition(image, spec)
+            width, height = image.size
+            placeholder: Placeholder = make_placeholder(image)
+
+        rendition: Rendition = Rendition(
+            gallery_item=self,
+            size=spec.size,
+            format=spec.format
+        )
+
+        try:
+            with transaction.atomic():
+                rendition.save_image(file, width, height, placeholder)
+
+        except IntegrityError:
+
+            # Another request generated the same rendition first
+            rendition.image.file.delete(save=False)
+
+            return self.renditions.select_related('image').get(
+                size=spec.size,
+                format=spec.format
+            )
+
+        return rendition
+
+    def _original_image_file(self) -> File:
 
         # The original image field is editable and
         # not nullable so we can assume it exists
-        with ImageResizer(self.original_image.file.file) as resizer:
+        return self.original_image.file.file
 
-            for img_field_name, new_size in self.REDUCED_IMAGE_FIELDS:
+    def __str__(self) -> str:
+        return f'Gallery item for "{self.title}"'
 
-                file: SimpleUploadedFile = SimpleUploadedFile(
-                    name=None,
-                    content=None,
-                    content_type=REDUCED_IMAGE_CONTENT_TYPE
-                )
 
-                resizer.shrink_image_to_box_size(
-                    new_size=new_size,
-                    fout=file.file,
-                    compression_quality=REDUCED_IMAGE_COMPRESSION_QUALITY,
-                    save_format=REDUCED_IMAGE_FORMAT,
+def store_rendition(img: ImageFile, image: Image, spec: RenditionSpec) -> None:
+    """Encodes the image and writes it to the image file's storage, without
+    saving the image file model. Safe to call from worker threads
+    """
+
+    file: SimpleUploadedFile = encode_rendition(image, spec)
+
+    img.store_file(file, image.width, image.height)
+
+    log.info(
+        f'Encoded {spec.size}px {spec.format} rendition {img.id} '
+        f'({image.width}x{image.height}) in {img.byte_size} bytes'
+    )
+
+
+class Rendition(UUIDModel):
+
+    class Meta:
+        verbose_name = 'rendition'
+        ordering = (
+            'format',
+            'size',
+        )
+        unique_together = (
+            ('gallery_item', 'size', 'format'),
+        )
+
+    objects: Manager
+
+    gallery_item: GalleryItem = ForeignKey(
+        to=GalleryItem,
+        on_delete=CASCADE,
+        related_name='renditions'
+    )
+    image: ImageFile = OneToOneField(
+        to=ImageFile,
+        on_delete=CASCADE,
+        related_name='rendition'
+    )
+
+    # Target size of the largest image dimension
+    size: int = IntegerField()
+    format: str = CharField(
+        max_length=8,
+        choices=tuple(
+            (save_format, save_format)
+            for save_format in RENDITION_CONTENT_TYPES
+        )
+    )
+
+    created_time = DateTimeField(auto_now_add=True)
+
+    @property
+    def spec(self) -> RenditionSpec:
+        return RenditionSpec(self.size, self.format)
+
+    @property
+    def content_type(self) -> str:
+        return self.spec.content_type
+
+    def save_image(
+        self,
+        file: File,
+        width: int,
+        height: int,
+        placeholder: Placeholder
+    ) -> None:
+
+        if self.image_id is None:
+            # We need to generate the ID because it will become the image name
+            self.image = ImageFile(id=uuid4())
+
+        self.image.set_placeholder(placeholder)
+        self.image.save_file(file, width, height)
+
+        self.save()
+
+    def __str__(self) -> str:
+        return f'{self.size}px {self.format} rendition'
+
+
+class TilePyramid(UUIDModel):
+    """A Deep Zoom (DZI) tile pyramid of a gallery item's original image, so
+    that zoomable viewers only fetch the tiles in view. The descriptor and
+    tiles are stored under the pyramid's ID, as <ID>.dzi and
+    <ID>_files/<level>/<column>_<row>.jpg
+    """
+
+    class Meta:
+        verbose_name = 'tile pyramid'
+
+    objects: Manager
+    DoesNotExist: ObjectDoesNotExist
+
+    TILE_FORMAT: str = 'JPEG'
+    TILE_FILE_EXTENSION: str = 'jpg'
+
+    gallery_item: GalleryItem = OneToOneField(
+        to=GalleryItem,
+        on_delete=CASCADE,
+        related_name='tile_pyramid'
+    )
+
+    width: int = IntegerField(editable=False)
+    height: int = IntegerField(editable=False)
+    tile_size: int = IntegerField(editable=False)
+    overlap: int = IntegerField(editable=False)
+
+    created_time = DateTimeField(auto_now_add=True)
+
+    @property
+    def layout(self) -> DeepZoomLayout:
+        return DeepZoomLayout(
+            self.width,
+            self.height,
+            self.tile_size,
+            self.overlap
+        )
+
+    @property
+    def name(self) -> str:
+        return f'{IMAGE_FOLDER_NAME}/{self.pk}'
+
+    @property
+    def descriptor_name(self) -> str:
+        return f'{self.name}.dzi'
+
+    def tile_name(self, level: int, column: int, row: int) -> str:
+        return (
+            f'{self.name}_files/{level}/{column}_{row}.'
+            f'{self.TILE_FILE_EXTENSION}'
+        )
+
+    @property
+    def url(self) -> str:
+        return default_storage.url(self.descriptor_name)
+
+    @property
+    def tiles_url(self) -> str:
+        """The URL viewers append <level>/<column>_<row>.jpg to"""
+
+        # The bucket is public-read, and a query string signature would only
+        # be valid for the directory itself, not the tiles inside it
+        return urlunsplit(
+            urlsplit(default_storage.url(f'{self.name}_files/'))._replace(
+                query=''
+            )
+        )
+
+    def store_tiles(self, image: Image) -> None:
+        """Cuts the full size image into tiles and writes them and the
+        descriptor to storage, without saving the model
+        """
+
+        if self.pk is None:
+            # We need to generate the ID because it will become the file names
+            self.id = uuid4()
+
+        tile_image, save_options = prepare_image(
+            image,
+            ENCODER_PROFILES[self.TILE_FORMAT]
+        )
+
+        self.width, self.height = tile_image.size
+
+        layout: DeepZoomLayout = self.layout
+        max_pending: int = settings.RENDITION_THREAD_POOL_SIZE * 4
+        pending: Set[Future] = set()
+
+        with ThreadPoolExecutor(
+            max_workers=settings.RENDITION_THREAD_POOL_SIZE
+        ) as executor:
+
+            for level, column, row, tile in iter_tiles(tile_image, layout):
+
+                # Only a few tiles are cut ahead of the uploads, as a large
+                # image has thousands of them
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        future.result()
+
+                pending.add(executor.submit(
+                    store_tile,
+                    self.tile_name(level, column, row),
+                    tile,
+                    self.TILE_FORMAT,
+                    save_options
+                ))
+
+            for future in pending:
+                future.result()
+
+        default_storage.save(
+            self.descriptor_name,
+            ContentFile(
+                dzi_descriptor(layout, self.TILE_FILE_EXTENSION).encode()
+            )
+        )
+
+        log.info(
+            f'Stored {self.width}x{self.height} tile pyramid {self.id} with '
+            f'{layout.max_level + 1} levels'
+        )
+
+    def delete_files(self) -> None:
+
+        try:
+            for level, column, row in self.layout.iter_tile_positions():
+                default_storage.delete(self.tile_name(level, column, row))
+
+            default_storage.delete(self.descriptor_name)
+
+        except Boto3Error as e:
+            log.warning(
+                f'Failed to delete tile pyramid files: {e}'
+            )
+
+    def delete(self, *args, **kwargs):
+
+        self.delete_files()
+
+        super(TilePyramid, self).delete(*args, **kwargs)
+
+    def __str__(self) -> str:
+        return f'{self.width}x{self.height} tile pyramid'
+
+
+def store_tile(
+    name: str,
+    tile: Image,
+    save_format: str,
+    save_options: Dict[str, Any]
+) -> None:
+    """Encodes the tile and writes it to storage. Safe to call from worker
+    threads
+    """
+
+    buffer: BytesIO = BytesIO()
+
+    tile.save(buffer, format=save_format, **save_options)
+
+    default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+class RenditionJobManager(Manager):
+
+    def enqueue(self, gallery_item: GalleryItem) -> 'RenditionJob':
+
+        # A new job supersedes any that haven't started yet
+        self.filter(
+            gallery_item=gallery_item,
+            status__in=(
+                RenditionJob.PENDING,
+                RenditionJob.FAILED,
+            )
+        ).delete()
+
+        return self.create(gallery_item=gallery_item)
+
+    def enqueue_catalogue_export(self) -> 'RenditionJob':
+        """Queues an export of the catalogue, unless one is queued already.
+        An export includes everything committed before it runs, so one
+        queued export covers any number of changes.
+
+        The queued export is locked until the current transaction commits,
+        so the worker can't run it before this transaction's changes are
+        visible
+        """
+
+        with transaction.atomic():
+
+            job: Optional[RenditionJob] = self.select_for_update().filter(
+                kind=RenditionJob.CATALOGUE_EXPORT,
+                status=RenditionJob.PENDING
+            ).first()
+
+            if job is not None:
+                return job
+
+            self.filter(
+                kind=RenditionJob.CATALOGUE_EXPORT,
+                status=RenditionJob.FAILED
+            ).delete()
+
+            return self.create(kind=RenditionJob.CATALOGUE_EXPORT)
+
+    def claim(self) -> Optional['RenditionJob']:
+        """Marks the next runnable job as running and returns it. Running
+        jobs whose lease has expired are assumed to belong to a worker that
+        died, and are claimed again
+        """
+
+        now = timezone.now()
+        lease_expired = now - timedelta(
+            seconds=settings.RENDITION_JOB_LEASE_SECONDS
+        )
+
+        with transaction.atomic():
+
+            job: Optional[RenditionJob] = self.select_for_update(
+                skip_locked=True
+            ).filter(
+                Q(status=RenditionJob.PENDING) |
+                Q(status=RenditionJob.RUNNING, started_time__lt=lease_expired),
+                run_after__lte=now
+            ).order_by(
+                'run_after'
+            ).first()
+
+            if job is None:
+                return None
+
+            job.status = RenditionJob.RUNNING
+            job.started_time = now
+            job.attempts += 1
+            job.save(update_fields=('status', 'started_time', 'attempts'))
+
+        return job
+
+
+class RenditionJob(UUIDModel):
+
+    class Meta:
+        verbose_name = 'rendition job'
+        ordering = (
+            'run_after',
+        )
+
+    PENDING: str = 'pending'
+    RUNNING: str = 'running'
+    FAILED: str = 'failed'
+
+    STATUS_CHOICES: Tuple[Tuple[str, str]] = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    )
+
+    # The worker also exports the catalogue, which has no gallery item
+    RENDITIONS: str = 'renditions'
+    CATALOGUE_EXPORT: str = 'catalogue_export'
+
+    KIND_CHOICES: Tuple[Tuple[str, str]] = (
+        (RENDITIONS, 'Renditions'),
+        (CATALOGUE_EXPORT, 'Catalogue export'),
+    )
+
+    objects = RenditionJobManager()
+
+    kind: str = CharField(
+        max_length=16,
+        choices=KIND_CHOICES,
+        default=RENDITIONS
+    )
+    gallery_item: Optional[GalleryItem] = ForeignKey(
+        to=GalleryItem,
+        on_delete=CASCADE,
+        related_name='rendition_jobs',
+        null=True,
+        blank=True
+    )
+    status: str = CharField(
+        max_length=16,
+        choices=STATUS_CHOICES,
+        default=PENDING
+    )
+    attempts: int = IntegerField(default=0)
+    last_error: str = TextField(null=True, blank=True)
+
+    run_after = DateTimeField(default=timezone.now, db_index=True)
+    started_time = DateTimeField(null=True, blank=True)
+    created_time = DateTimeField(auto_now_add=True)
+
+    def run(self) -> None:
+
+        try:
+
+            if self.kind == self.CATALOGUE_EXPORT:
+
+                # The catalogue is serialized from these models
+                from image_api.catalogue import export_catalogue
+                export_catalogue()
+
+            else:
+                self.gallery_item.generate_renditions()
+
+        except Exception as e:
+            log.exception(
+                f'Rendition job {self.id} failed on attempt {self.attempts}'
+            )
+            self._fail(e)
+        else:
+            self.delete()
+
+    def _fail(self, e: Exception) -> None:
+
+        self.last_error = f'{type(e).__name__}: {e}'
+
+        if self.attempts < settings.RENDITION_JOB_MAX_ATTEMPTS:
+
+            # Back off exponentially before retrying
+            delay: int = (
+                settings.RENDITION_JOB_RETRY_DELAY_SECONDS *
+                2 ** (self.attempts - 1)
+            )
+
+            self.status = self.PENDING
+            self.run_after = timezone.now() + timedelta(seconds=delay)
+
+        else:
+
+            self.status = self.FAILED
+
+            if self.gallery_item_id is not None:
+
+                GalleryItem.objects.filter(pk=self.gallery_item_id).update(
+                    renditions_status=RenditionStatus.FAILED,
+                    updated_time=timezone.now()
                 )
+                bump_content_version()
 
-                self._save_image_field(img_field_name, file)
+                # Updating doesn't send the signal which would do this
+                from image_api.catalogue import queue_catalogue_export
+                queue_catalogue_export()
+
+        self.save(update_fields=('status', 'run_after', 'last_error'))
 
     def __str__(self) -> str:
-        return f'Gallery item for "{self.title}"'
+
+        if self.kind == self.CATALOGUE_EXPORT:
+            return 'Catalogue export job'
+
+        return f'Rendition job for "{self.gallery_item.title}"'
@@ -0,0 +1,202 @@
+import json
+from base64 import (
+    urlsafe_b64decode,
+    urlsafe_b64encode,
+)
+from collections import OrderedDict
+from datetime import date
+from uuid import UUID
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from django.db.models import (
+    F,
+    Q,
+    QuerySet,
+)
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from image_api.models import GalleryItem
+
+
+# (created_date, title, id) of the last item on the previous page
+Position = Tuple[Optional[date], str, str]
+
+
+class GalleryItemCursorPagination(BasePagination):
+    """Keyset pagination over the gallery items, newest first. Each page
+    seeks to where the previous one ended, so every page costs the same as
+    the first, and there's no count query. Items without a date come last.
+
+    The ordering is matched by the image_api_galleryitem_keyset index
+    """
+
+    page_size: int = api_settings.PAGE_SIZE
+    cursor_query_param: str = 'cursor'
+    invalid_cursor_message: str = 'Invalid cursor'
+
+    ordering = (
+        F('created_date').desc(nulls_last=True),
+        'title',
+        'id',
+    )
+
+    def paginate_queryset(
+        self,
+        queryset: QuerySet,
+        request: Request,
+        view=None
+    ) -> List[Union[GalleryItem, Dict[str, Any]]]:
+
+        self.request: Request = request
+
+        position: Optional[Position] = self.decode_cursor(request)
+
+        # One extra item tells whether there's a next page
+        items: List[Union[GalleryItem, Dict[str, Any]]] = items_after(
+            queryset.order_by(*self.ordering),
+            position,
+            self.page_size + 1
+        )
+
+        self.has_next: bool = len(items) > self.page_size
+        self.page: List[Union[GalleryItem, Dict[str, Any]]] = (
+            items[:self.page_size]
+        )
+
+        return self.page
+
+    def get_paginated_response(self, data) -> Response:
+
+        return Response(OrderedDict((
+            ('next', self.get_next_link()),
+            ('results', data),
+        )))
+
+    def get_next_link(self) -> Optional[str]:
+
+        if not self.has_next:
+            return None
+
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            encode_cursor(get_position(self.page[-1]))
+        )
+
+    def decode_cursor(self, request: Request) -> Optional[Position]:
+
+        encoded: Optional[str] = request.query_params.get(
+            self.cursor_query_param
+        )
+
+        if encoded is None:
+            return None
+
+        try:
+            created_date, title, item_id = json.loads(
+                urlsafe_b64decode(encoded.encode('ascii'))
+            )
+
+            if created_date is not None:
+                created_date = parse_date(created_date)
+
+                if created_date is None:
+                    raise ValueError('Invalid date')
+
+            if not isinstance(title, str) or not isinstance(item_id, str):
+                raise ValueError('Invalid position')
+
+            item_id = str(UUID(item_id))
+
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return created_date, title, item_id
+
+
+def get_position(item: Union[GalleryItem, Dict[str, Any]]) -> Position:
+    """The position of an item, or of a .values() row of one"""
+
+    if isinstance(item, dict):
+        return item['created_date'], item['title'], str(item['id'])
+
+    return item.created_date, item.title, str(item.id)
+
+
+def encode_cursor(position: Position) -> str:
+
+    created_date, title, item_id = position
+
+    return urlsafe_b64encode(json.dumps((
+        created_date.isoformat() if created_date is not None else None,
+        title,
+        item_id,
+    )).encode()).decode('ascii')
+
+
+def items_after(
+    queryset: QuerySet,
+    position: Optional[Position],
+    limit: int
+) -> List[Union[GalleryItem, Dict[str, Any]]]:
+    """Up to limit items of the queryset, in the pagination ordering, after
+    the position or from the start without one. Each of after_position()'s
+    conditions is queried in turn, only until there are enough items
+    """
+
+    if position is None:
+        return list(queryset[:limit])
+
+    items: List[Union[GalleryItem, Dict[str, Any]]] = []
+
+    for condition in after_position(position):
+
+        items += queryset.filter(condition)[:limit - len(items)]
+
+        if len(items) >= limit:
+            break
+
+    return items
+
+
+def after_position(position: Position) -> Tuple[Q, ...]:
+    """Matches the items after the position in the pagination ordering, as
+    consecutive runs of it: the rest of the position's date, the earlier
+    dates, and the undated items. Each condition is a range of the leading
+    ordering columns, with no disjunction across them, so the index seeks
+    to the position and is read in order rather than sorted
+    """
+
+    created_date, title, item_id = position
+
+    # Excluding the few items up to the position, rather than matching a
+    # disjunction after it, keeps the planner's row estimate for the title
+    # range, so that it reads the index in order instead of sorting
+    after_title: Q = (
+        Q(title__gte=title) & ~Q(title=title, id__lte=item_id)
+    )
+
+    if created_date is None:
+        # Only undated items come after an undated item
+        return (
+            Q(created_date__isnull=True) & after_title,
+        )
+
+    return (
+        Q(created_date=created_date) & after_title,
+        Q(created_date__lt=created_date),
+        Q(created_date__isnull=True),
+    )
@@ -0,0 +1,52 @@
+from typing import (
+    Any,
+    Iterable,
+    Iterator,
+)
+
+from rest_framework.renderers import (
+    BaseRenderer,
+    JSONRenderer,
+)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Renders a list as newline delimited JSON, with one item per line.
+    Anything else, such as an error, is rendered as a single line
+    """
+
+    media_type: str = 'application/x-ndjson'
+    format: str = 'ndjson'
+    charset = None
+
+    def render(
+        self,
+        data: Any,
+        accepted_media_type: str = None,
+        renderer_context: dict = None
+    ) -> bytes:
+
+        return b''.join(
+            iter_ndjson(data if isinstance(data, list) else [data])
+        )
+
+
+def iter_ndjson(items: Iterable[Any]) -> Iterator[bytes]:
+
+    renderer: JSONRenderer = JSONRenderer()
+
+    for item in items:
+        yield renderer.render(item) + b'\n'
+
+
+def iter_json_array(items: Iterable[Any]) -> Iterator[bytes]:
+    """Renders a JSON array piece by piece, as its items are rendered"""
+
+    renderer: JSONRenderer = JSONRenderer()
+    separator: bytes = b'['
+
+    for item in items:
+        yield separator + renderer.render(item)
+        separator = b','
+
+    yield b']' if separator == b',' else b'[]'
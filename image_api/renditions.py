@@ -0,0 +1,165 @@
+from collections import defaultdict
+from io import (
+    BytesIO,
+    FileIO,
+)
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Tuple,
+)
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import (
+    features,
+    Image,
+)
+
+from image_api.utils.decode_budget import DecodeBudget
+from image_api.utils.image_encoder import (
+    EncoderProfile,
+    encode_image,
+)
+from image_api.utils.image_resizer import ImageResizer
+from image_api.utils.placeholder import (
+    Placeholder,
+    make_placeholder,
+)
+
+
+RENDITION_CONTENT_TYPES: Dict[str, str] = {
+    'JPEG': 'image/jpeg',
+    'WEBP': 'image/webp',
+}
+
+
+DECODE_BUDGET: DecodeBudget = DecodeBudget(
+    max_pixels=settings.IMAGE_MAX_PIXELS,
+    max_memory_bytes=settings.IMAGE_DECODE_MEMORY_LIMIT_MB * 1024 * 1024
+)
+
+# Pillow warns about images over its own limit, and refuses to open images
+# over twice it. Those over the decode budget are rejected anyway
+Image.MAX_IMAGE_PIXELS = DECODE_BUDGET.max_pixels
+
+
+ENCODER_PROFILES: Dict[str, EncoderProfile] = {
+    save_format: EncoderProfile(save_format, **profile)
+    for save_format, profile in settings.RENDITION_ENCODER_PROFILES.items()
+}
+
+
+class RenditionSpec(NamedTuple):
+
+    # Target size of the largest image dimension
+    size: int
+
+    # Pillow image format name
+    format: str
+
+    @property
+    def content_type(self) -> str:
+        return RENDITION_CONTENT_TYPES[self.format]
+
+    @property
+    def encoder_profile(self) -> EncoderProfile:
+        return ENCODER_PROFILES[self.format]
+
+
+class EncodedRendition(NamedTuple):
+
+    spec: RenditionSpec
+    content: bytes
+    width: int
+    height: int
+
+    def as_file(self) -> SimpleUploadedFile:
+
+        return SimpleUploadedFile(
+            name=None,
+            content=self.content,
+            content_type=self.spec.content_type
+        )
+
+
+def format_supported(save_format: str) -> bool:
+
+    # Pillow is only built with WebP support if libwebp is installed
+    if save_format == 'WEBP':
+        return features.check_module('webp')
+
+    return save_format in RENDITION_CONTENT_TYPES
+
+
+# Every size is generated in every supported format
+RENDITION_SPECS: Tuple[RenditionSpec, ...] = tuple(
+    RenditionSpec(size, save_format)
+    for size in settings.RENDITION_SIZES_PX
+    for save_format in settings.RENDITION_FORMATS
+    if format_supported(save_format)
+)
+
+
+def snap_size(requested_size: int) -> int:
+    """Rounds a requested size up to the nearest allowed on-demand size, so
+    that arbitrary sizes can't fill the storage with renditions
+    """
+
+    allowed_sizes: Tuple[int, ...] = tuple(
+        sorted(settings.RENDITION_ON_DEMAND_SIZES_PX)
+    )
+
+    for size in allowed_sizes:
+        if size >= requested_size:
+            return size
+
+    return allowed_sizes[-1]
+
+
+def encode_rendition(image: Image, spec: RenditionSpec) -> SimpleUploadedFile:
+
+    buffer: BytesIO = BytesIO()
+
+    encode_image(image, buffer, spec.encoder_profile)
+
+    # Uploaded files take their size from the initial content
+    return SimpleUploadedFile(
+        name=None,
+        content=buffer.getvalue(),
+        content_type=spec.content_type
+    )
+
+
+def render_renditions(
+    image_file: FileIO,
+    specs: Iterable[RenditionSpec]
+) -> Tuple[List[EncodedRendition], Placeholder]:
+    """Encodes every rendition of the image in memory, without storing
+    anything, along with the placeholder. Safe to call in worker processes
+    """
+
+    specs_by_size: Dict[int, List[RenditionSpec]] = defaultdict(list)
+
+    for spec in specs:
+        specs_by_size[spec.size].append(spec)
+
+    renditions: List[EncodedRendition] = []
+
+    with ImageResizer(image_file, DECODE_BUDGET) as resizer:
+
+        for new_size, image in resizer.iter_box_sizes(specs_by_size):
+            for spec in specs_by_size[new_size]:
+                renditions.append(EncodedRendition(
+                    spec,
+                    encode_rendition(image, spec).read(),
+                    image.width,
+                    image.height
+                ))
+
+        # The smallest rendition is plenty to compute the placeholder from
+        placeholder: Placeholder = make_placeholder(image)
+
+    return renditions, placeholder
@@ -0,0 +1,196 @@
+from hashlib import sha1
+from logging import (
+    getLogger,
+    Logger,
+)
+from time import (
+    monotonic,
+    sleep,
+)
+from typing import (
+    Any,
+    Callable,
+    Optional,
+)
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import (
+    BaseCache,
+    caches,
+)
+from django.db import (
+    DatabaseError,
+    transaction,
+)
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+
+log: Logger = getLogger(__name__)
+
+
+LOCK_POLL_INTERVAL_SECONDS: float = 0.05
+
+# Identifies the current gallery content. Cached responses are keyed by it, so
+# replacing it makes every cached response unreachable at once
+CONTENT_VERSION_KEY: str = 'gallery-content-version'
+
+
+def api_cache() -> BaseCache:
+    return caches[settings.API_CACHE_ALIAS]
+
+
+def content_version() -> str:
+
+    cache: BaseCache = api_cache()
+    version: Optional[str] = cache.get(CONTENT_VERSION_KEY)
+
+    if version is None:
+
+        # The version is random rather than a counter, so that if it's evicted
+        # from the cache it can't restart at a version with responses cached
+        cache.add(CONTENT_VERSION_KEY, uuid4().hex, timeout=None)
+        version = cache.get(CONTENT_VERSION_KEY)
+
+    return version
+
+
+def bump_content_version() -> None:
+    """Invalidates every cached response, once the current transaction (if
+    any) commits. Bumping any earlier would let a request cache the old
+    content under the new version
+    """
+
+    transaction.on_commit(
+        lambda: api_cache().set(CONTENT_VERSION_KEY, uuid4().hex, timeout=None)
+    )
+
+
+class ContentVersionCacheMixin(object):
+    """Caches the serialized data of successful list and retrieve responses
+    under the current content version. The data is rendered per request, so
+    content negotiation still applies.
+
+    The last good response for each URL is also kept, and is served (marked
+    stale) while another request rebuilds the response after the content
+    changes. If the cache is kept outside the database, it's also served
+    while the database can't be reached
+    """
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        return self.cached_response(
+            super(ContentVersionCacheMixin, self).list,
+            request,
+            *args,
+            **kwargs
+        )
+
+    def retrieve(self, request: Request, *args, **kwargs) -> Response:
+        return self.cached_response(
+            super(ContentVersionCacheMixin, self).retrieve,
+            request,
+            *args,
+            **kwargs
+        )
+
+    def cached_response(
+        self,
+        view: Callable[..., Response],
+        request: Request,
+        *args,
+        **kwargs
+    ) -> Response:
+
+        cache: BaseCache = api_cache()
+
+        # The absolute URL is in the keys because the response has links
+        url_hash: str = sha1(request.build_absolute_uri().encode()).hexdigest()
+
+        # The version is read before the database, so data read before a
+        # change commits is never cached under the version after it
+        key: str = f'api-response:{content_version()}:{url_hash}'
+        stale_key: str = f'api-response-stale:{url_hash}'
+        lock_key: str = f'{key}:lock'
+
+        data: Any = cache.get(key)
+
+        if data is not None:
+            return Response(data)
+
+        # Only one request per key rebuilds the response. The others get the
+        # previous response while it does, or wait for it if there isn't one
+        locked: bool = cache.add(
+            lock_key,
+            True,
+            timeout=settings.API_CACHE_LOCK_TIMEOUT_SECONDS
+        )
+
+        if not locked:
+
+            data = cache.get(stale_key)
+
+            if data is not None:
+                return stale_response(data)
+
+            data = wait_for_cached_data(cache, key)
+
+            if data is not None:
+                return Response(data)
+
+        try:
+            response: Response = view(request, *args, **kwargs)
+
+        except DatabaseError as e:
+
+            data = cache.get(stale_key)
+
+            if data is None:
+                raise
+
+            log.warning(f'Serving a stale response after a database error: {e}')
+
+            return stale_response(data)
+
+        finally:
+            if locked:
+                cache.delete(lock_key)
+
+        if response.status_code == 200:
+            cache.set(key, response.data)
+            cache.set(
+                stale_key,
+                response.data,
+                timeout=settings.API_CACHE_STALE_TIMEOUT_SECONDS
+            )
+
+        return response
+
+
+def stale_response(data: Any) -> Response:
+
+    return Response(
+        data,
+        headers={
+            'Warning': '110 - "Response is Stale"',
+        }
+    )
+
+
+def wait_for_cached_data(cache: BaseCache, key: str) -> Any:
+    """Polls for the response another request is building. Returns None if
+    it isn't cached in time, e.g. because building it failed
+    """
+
+    deadline: float = monotonic() + settings.API_CACHE_LOCK_WAIT_SECONDS
+
+    while monotonic() < deadline:
+
+        sleep(LOCK_POLL_INTERVAL_SECONDS)
+
+        data: Any = cache.get(key)
+
+        if data is not None:
+            return data
+
+    return None
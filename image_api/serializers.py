@@ -1,14 +1,41 @@
+from collections import (
+    OrderedDict,
+    defaultdict,
+)
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+from django.db.models import Manager
 from rest_framework.serializers import (
     HyperlinkedModelSerializer,
+    ListSerializer,
     ModelSerializer,
 )
-from rest_framework.fields import ImageField
+from rest_framework.fields import (
+    CharField,
+    ImageField,
+    IntegerField,
+)
 
+from gallery_shared.serializers import SparseFieldsetSerializerMixin
 from image_api.models import (
     GalleryItem,
     ItemTag,
     ImageFile,
+    Rendition,
+    TilePyramid,
 )
+from image_api.renditions import RENDITION_CONTENT_TYPES
+from image_api.utils.url_template import URLTemplate
+
+# A .values() row of a gallery item
+Row = Dict[str, Any]
 
 
 class ItemTagSerializer(ModelSerializer):
@@ -29,20 +56,326 @@ class ImageFileSerializer(HyperlinkedModelSerializer):
             'url',
             'height',
             'width',
+            'blurhash',
+            'dominant_color',
         )
 
     url = ImageField(source='file')
 
 
-class GalleryItemSerializer(HyperlinkedModelSerializer):
+class RenditionSerializer(ModelSerializer):
+    """Describes one image candidate, in the shape of a srcset entry"""
+
+    class Meta:
+        model = Rendition
+        fields = read_only_fields = (
+            'url',
+            'width',
+            'height',
+            'type',
+        )
+
+    url = ImageField(source='image.file')
+    width = IntegerField(source='image.width')
+    height = IntegerField(source='image.height')
+    type = CharField(source='content_type')
+
+
+class TilePyramidSerializer(ModelSerializer):
+    """Describes a Deep Zoom (DZI) tile source. The descriptor is at url, and
+    each tile at tiles_url + <level>/<column>_<row>.<format>
+    """
+
+    class Meta:
+        model = TilePyramid
+        fields = read_only_fields = (
+            'url',
+            'tiles_url',
+            'format',
+            'width',
+            'height',
+            'tile_size',
+            'overlap',
+        )
+
+    url = CharField()
+    tiles_url = CharField()
+    format = CharField(source='TILE_FILE_EXTENSION')
+
+
+class GalleryItemListSerializer(ListSerializer):
+    """Lists gallery items from .values() rows rather than model instances.
+    Each item is built directly from its row, not through a serializer field
+    per value, and URLs are built from templates rather than by the storage
+    for each image.
+
+    The representation is the same as GalleryItemSerializer's, which still
+    serializes model instances
+    """
+
+    # The relations' columns, each in a row as <relation>__<column>
+    IMAGE_FIELDS: Tuple[str, ...] = (
+        'large_image',
+        'thumbnail_image',
+    )
+    IMAGE_COLUMNS: Tuple[str, ...] = (
+        'id',
+        'file',
+        'width',
+        'height',
+        'blurhash',
+        'dominant_color',
+    )
+    TILE_PYRAMID_COLUMNS: Tuple[str, ...] = (
+        'id',
+        'width',
+        'height',
+        'tile_size',
+        'overlap',
+    )
+
+    # Loaded separately for the rows' items
+    RELATED_FIELDS: Tuple[str, ...] = (
+        'renditions',
+        'tags',
+    )
+
+    @classmethod
+    def get_values_fields(cls, field_names: Tuple[str, ...]) -> List[str]:
+        """The fields of the .values() rows which the fields are built from"""
+
+        values_fields: List[str] = ['id']
+
+        for field_name in field_names:
+
+            if field_name in cls.IMAGE_FIELDS:
+                values_fields += (
+                    f'{field_name}__{column}' for column in cls.IMAGE_COLUMNS
+                )
+
+            elif field_name == 'tile_source':
+                values_fields += (
+                    f'tile_pyramid__{column}'
+                    for column in cls.TILE_PYRAMID_COLUMNS
+                )
+
+            elif field_name not in ('id', 'url', *cls.RELATED_FIELDS):
+                values_fields.append(field_name)
+
+        return values_fields
+
+    def to_representation(self, data) -> List[OrderedDict]:
+
+        items: List = list(data.all() if isinstance(data, Manager) else data)
+
+        if not all(isinstance(item, dict) for item in items):
+            return super(GalleryItemListSerializer, self).to_representation(
+                items
+            )
+
+        getters: List[Tuple[str, Callable[[Row], Any]]] = self.get_getters(
+            tuple(self.child.fields),
+            [row['id'] for row in items]
+        )
+
+        return [
+            OrderedDict((name, get(row)) for name, get in getters)
+            for row in items
+        ]
+
+    def get_getters(
+        self,
+        field_names: Tuple[str, ...],
+        item_ids: List
+    ) -> List[Tuple[str, Callable[[Row], Any]]]:
+        """A function per field, which gets its value from a row"""
+
+        image_url: Callable[[str], Optional[str]] = self.get_image_url()
+
+        getters: List[Tuple[str, Callable[[Row], Any]]] = []
+
+        for field_name in field_names:
+
+            if field_name == 'id':
+                get = get_id
+
+            elif field_name == 'url':
+                get = self.get_item_url_getter()
+
+            elif field_name in self.IMAGE_FIELDS:
+                get = get_image_getter(field_name, image_url)
+
+            elif field_name == 'renditions':
+                get = get_renditions_getter(item_ids, image_url)
+
+            elif field_name == 'tile_source':
+                get = get_tile_source_getter()
+
+            elif field_name == 'tags':
+                get = get_tags_getter(item_ids)
+
+            elif field_name == 'created_date':
+                get = get_created_date
+
+            else:
+                get = get_column_getter(field_name)
+
+            getters.append((field_name, get))
+
+        return getters
+
+    def get_item_url_getter(self) -> Callable[[Row], str]:
+
+        url_field = self.child.fields['url']
+        item_url: URLTemplate = URLTemplate(
+            lambda pk: url_field.to_representation(GalleryItem(pk=pk))
+        )
+
+        return lambda row: item_url(str(row['id']))
+
+    def get_image_url(self) -> Callable[[str], Optional[str]]:
+
+        url_field = ImageFileSerializer(context=self.context).fields['url']
+
+        return URLTemplate(
+            lambda name: url_field.to_representation(ImageFile(file=name).file)
+        )
+
+
+def get_id(row: Row) -> str:
+    return str(row['id'])
+
+
+def get_created_date(row: Row) -> Optional[str]:
+
+    created_date = row['created_date']
+
+    return created_date.isoformat() if created_date else None
+
+
+def get_column_getter(column: str) -> Callable[[Row], Any]:
+    return lambda row: row[column]
+
+
+def get_image_getter(
+    field_name: str,
+    image_url: Callable[[str], Optional[str]]
+) -> Callable[[Row], Optional[OrderedDict]]:
+
+    columns: Tuple[str, ...] = tuple(
+        f'{field_name}__{column}'
+        for column in GalleryItemListSerializer.IMAGE_COLUMNS
+    )
+
+    def get_image(row: Row) -> Optional[OrderedDict]:
+
+        image_id, name, width, height, blurhash, dominant_color = (
+            row[column] for column in columns
+        )
+
+        if image_id is None:
+            return None
+
+        return OrderedDict((
+            ('id', str(image_id)),
+            ('url', image_url(name) if name else None),
+            ('height', height),
+            ('width', width),
+            ('blurhash', blurhash),
+            ('dominant_color', dominant_color),
+        ))
+
+    return get_image
+
+
+def get_renditions_getter(
+    item_ids: List,
+    image_url: Callable[[str], Optional[str]]
+) -> Callable[[Row], List[OrderedDict]]:
+
+    renditions: Dict[Any, List[OrderedDict]] = defaultdict(list)
+
+    for item_id, name, width, height, save_format in Rendition.objects.filter(
+        gallery_item_id__in=item_ids
+    ).values_list(
+        'gallery_item_id',
+        'image__file',
+        'image__width',
+        'image__height',
+        'format',
+    ):
+        renditions[item_id].append(OrderedDict((
+            ('url', image_url(name) if name else None),
+            ('width', width),
+            ('height', height),
+            ('type', RENDITION_CONTENT_TYPES[save_format]),
+        )))
+
+    return lambda row: renditions.get(row['id'], [])
+
+
+def get_tile_source_getter() -> Callable[[Row], Optional[OrderedDict]]:
+
+    descriptor_url: URLTemplate = URLTemplate(
+        lambda pk: TilePyramid(pk=pk).url
+    )
+    tiles_url: URLTemplate = URLTemplate(
+        lambda pk: TilePyramid(pk=pk).tiles_url
+    )
+
+    def get_tile_source(row: Row) -> Optional[OrderedDict]:
+
+        pyramid_id = row['tile_pyramid__id']
+
+        if pyramid_id is None:
+            return None
+
+        return OrderedDict((
+            ('url', descriptor_url(str(pyramid_id))),
+            ('tiles_url', tiles_url(str(pyramid_id))),
+            ('format', TilePyramid.TILE_FILE_EXTENSION),
+            ('width', row['tile_pyramid__width']),
+            ('height', row['tile_pyramid__height']),
+            ('tile_size', row['tile_pyramid__tile_size']),
+            ('overlap', row['tile_pyramid__overlap']),
+        ))
+
+    return get_tile_source
+
+
+def get_tags_getter(item_ids: List) -> Callable[[Row], List[OrderedDict]]:
+
+    tags: Dict[Any, List[OrderedDict]] = defaultdict(list)
+
+    # Tags are keyed by name, so the through table has everything
+    for item_id, name in GalleryItem.tags.through.objects.filter(
+        galleryitem_id__in=item_ids
+    ).order_by(
+        'itemtag_id'
+    ).values_list(
+        'galleryitem_id',
+        'itemtag_id',
+    ):
+        tags[item_id].append(OrderedDict((('name', name),)))
+
+    return lambda row: tags.get(row['id'], [])
+
+
+class GalleryItemSerializer(
+    SparseFieldsetSerializerMixin,
+    HyperlinkedModelSerializer
+):
 
     class Meta:
         model = GalleryItem
+        list_serializer_class = GalleryItemListSerializer
         fields = (
             'id',
             'url',
             'large_image',
             'thumbnail_image',
+            'renditions',
+            'tile_source',
             'title',
             'created_date',
             'description',
@@ -50,6 +383,7 @@ class GalleryItemSerializer(HyperlinkedModelSerializer):
             'size_description',
             'artist_name',
             'tags',
+            'renditions_status',
         )
         read_only_fields = (
             'id',
@@ -57,9 +391,29 @@ class GalleryItemSerializer(HyperlinkedModelSerializer):
             'tags',
             'large_image',
             'thumbnail_image',
+            'renditions',
+            'tile_source',
+            'renditions_status',
+        )
+
+        # Enough for a grid of thumbnails
+        compact_fields = (
+            'id',
+            'url',
+            'title',
+            'thumbnail_image',
+        )
+        expandable_fields = (
+            'large_image',
+            'thumbnail_image',
+            'renditions',
+            'tile_source',
+            'tags',
         )
 
     large_image = ImageFileSerializer()
     thumbnail_image = ImageFileSerializer()
+    renditions = RenditionSerializer(many=True)
+    tile_source = TilePyramidSerializer(source='tile_pyramid')
 
     tags = ItemTagSerializer(many=True)
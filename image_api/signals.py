@@ -0,0 +1,113 @@
+from typing import Optional
+
+from django.db.models import QuerySet
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from image_api.models import (
+    GalleryItem,
+    ImageFile,
+    ItemTag,
+    Rendition,
+    TilePyramid,
+)
+from image_api.catalogue import queue_catalogue_export
+from image_api.response_cache import bump_content_version
+from links_api.models import SocialMediaLinks
+
+
+def invalidate_cached_responses(sender, **kwargs) -> None:
+    bump_content_version()
+
+
+# Every model the cached API responses are serialized from
+for model in (GalleryItem, ImageFile, ItemTag, Rendition, TilePyramid):
+    post_save.connect(invalidate_cached_responses, sender=model)
+    post_delete.connect(invalidate_cached_responses, sender=model)
+
+
+@receiver(m2m_changed, sender=GalleryItem.tags.through)
+def invalidate_cached_responses_for_tags(sender, action: str, **kwargs) -> None:
+
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_content_version()
+
+
+def touch_gallery_item(sender, instance, **kwargs) -> None:
+    """Marks the gallery item as updated when something its API response
+    includes is saved or deleted
+    """
+
+    GalleryItem.objects.filter(pk=instance.gallery_item_id).update(
+        updated_time=timezone.now()
+    )
+
+
+for model in (Rendition, TilePyramid):
+    post_save.connect(touch_gallery_item, sender=model)
+    post_delete.connect(touch_gallery_item, sender=model)
+
+
+@receiver(m2m_changed, sender=GalleryItem.tags.through)
+def touch_gallery_items_for_tags(
+    sender,
+    instance,
+    action: str,
+    reverse: bool,
+    pk_set: Optional[set],
+    **kwargs
+) -> None:
+
+    items: Optional[QuerySet] = None
+
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        items = GalleryItem.objects.filter(pk=instance.pk)
+
+    elif reverse and action in ('post_add', 'post_remove'):
+        items = GalleryItem.objects.filter(pk__in=pk_set)
+
+    elif reverse and action == 'pre_clear':
+        # The tag's items can't be found once they've been cleared
+        items = GalleryItem.objects.filter(tags=instance)
+
+    if items is not None:
+        items.update(updated_time=timezone.now())
+
+
+@receiver(pre_delete, sender=ItemTag)
+def touch_gallery_items_for_deleted_tag(sender, instance, **kwargs) -> None:
+
+    # Deleting a tag removes it from its items without an m2m_changed signal
+    GalleryItem.objects.filter(tags=instance).update(
+        updated_time=timezone.now()
+    )
+
+
+def export_catalogue(sender, **kwargs) -> None:
+    queue_catalogue_export()
+
+
+# The models the catalogue is exported from. The rendition worker saves the
+# renditions and tile pyramids after the item, so they're exported again
+for model in (
+    GalleryItem,
+    ItemTag,
+    Rendition,
+    SocialMediaLinks,
+    TilePyramid,
+):
+    post_save.connect(export_catalogue, sender=model)
+    post_delete.connect(export_catalogue, sender=model)
+
+
+@receiver(m2m_changed, sender=GalleryItem.tags.through)
+def export_catalogue_for_tags(sender, action: str, **kwargs) -> None:
+
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        queue_catalogue_export()
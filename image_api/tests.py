@@ -1,3 +1,3412 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+from base64 import urlsafe_b64encode
+from collections import OrderedDict
+from datetime import (
+    date,
+    timedelta,
+)
+from hashlib import sha256
+from io import (
+    BytesIO,
+    StringIO,
+)
+from math import (
+    copysign,
+    cos,
+    floor,
+    pi,
+)
+from os import path
+from shutil import rmtree
+from tempfile import mkdtemp
+from threading import (
+    Lock,
+    Thread,
+    current_thread,
+    main_thread,
+)
+from time import (
+    perf_counter,
+    sleep,
+)
+from typing import (
+    List,
+    Optional,
+    Tuple,
+)
+from unittest import (
+    mock,
+    skipUnless,
+)
+from uuid import uuid4
+from xml.etree import ElementTree
 
-# Create your tests here.
+import numpy
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import (
+    OperationalError,
+    connection,
+    transaction,
+)
+from django.db.models import QuerySet
+from django.test import (
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from PIL import (
+    Image,
+    features,
+)
+from rest_framework.mixins import ListModelMixin
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.serializers import ListSerializer
+from rest_framework.settings import api_settings
+from rest_framework.test import (
+    APIRequestFactory,
+    APITestCase,
+    APITransactionTestCase,
+)
+
+from gallery_shared.serializers import get_requested_field_names
+from gallery_shared.testing import QueryBudgetMixin
+from image_api.admin import IngestImageField
+from image_api.benchmarks import (
+    SOURCE_TYPES,
+    BenchmarkCase,
+    find_regressions,
+    run_case,
+    write_source_image,
+)
+from image_api.catalogue import (
+    export_catalogue,
+    replace_file,
+)
+from image_api.checks import (
+    check_api_cache_outside_database,
+    check_api_cache_shared,
+)
+from image_api.filters import (
+    GalleryItemSearchFilter,
+    filter_by_tags,
+)
+from image_api.models import (
+    GalleryItem,
+    ImageFile,
+    ItemTag,
+    Rendition,
+    RenditionJob,
+    RenditionStatus,
+    TilePyramid,
+)
+from image_api.pagination import (
+    GalleryItemCursorPagination,
+    Position,
+    after_position,
+    encode_cursor,
+    get_position,
+)
+from image_api.renditions import (
+    ENCODER_PROFILES,
+    RENDITION_SPECS,
+    RenditionSpec,
+    format_supported,
+    render_renditions,
+    snap_size,
+)
+from image_api.response_cache import api_cache
+from image_api.serializers import GalleryItemSerializer
+from image_api.utils.content_hash import content_hash
+from image_api.utils.decode_budget import (
+    DecodeBudget,
+    ImageTooLargeError,
+    check_decode_budget,
+    decoded_size_bytes,
+    open_image,
+)
+from image_api.utils.deep_zoom import (
+    DZI_NAMESPACE,
+    DeepZoomLayout,
+    dzi_descriptor,
+    iter_tiles,
+)
+from image_api.utils.image_encoder import (
+    EncoderProfile,
+    ImageCms,
+    convert_for_format,
+    encode_image,
+    has_transparency,
+    prepare_image,
+)
+from image_api.utils.image_ingest import ImageIngest
+from image_api.utils.placeholder import (
+    BASE83_CHARACTERS,
+    Placeholder,
+    blurhash,
+    encode_base83,
+    make_placeholder,
+)
+from image_api.utils.image_resizer import (
+    ImageResizer,
+    box_dimensions,
+    working_image,
+)
+from image_api.views import GalleryViewSet
+from links_api.models import SocialMediaLinks
+
+
+# The tests run in one process, and the query budgets count only the API's own
+# queries, so the API cache isn't kept in the database
+LOCAL_API_CACHES = {
+    **settings.CACHES,
+    settings.API_CACHE_ALIAS: {
+        **settings.CACHES[settings.API_CACHE_ALIAS],
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+
+def clear_caches() -> None:
+
+    api_cache().clear()
+
+    # The throttles count requests in the default cache
+    cache.clear()
+
+
+def make_image_file(width: int, height: int) -> ImageFile:
+
+    img: ImageFile = ImageFile(id=uuid4(), width=width, height=height)
+    img.file.name = f'gallery_images/{img.id}'
+    img.save()
+
+    return img
+
+
+def use_temporary_media(test_case: TestCase, **overrides) -> None:
+    """Stores files in a temporary directory for the rest of the test,
+    along with any other settings overrides
+    """
+
+    media_root: str = mkdtemp()
+    test_case.addCleanup(rmtree, media_root)
+
+    settings_override = override_settings(
+        DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+        MEDIA_ROOT=media_root,
+        MEDIA_URL='/media/',
+        **overrides
+    )
+    settings_override.enable()
+    test_case.addCleanup(settings_override.disable)
+
+
+def make_upload(
+    width: int,
+    height: int,
+    image_format: str = 'JPEG',
+    mode: str = 'RGB',
+    color=0
+) -> SimpleUploadedFile:
+
+    buffer: BytesIO = BytesIO()
+    Image.new(mode, (width, height), color).save(buffer, image_format)
+
+    return SimpleUploadedFile(
+        f'upload.{image_format.lower()}',
+        buffer.getvalue(),
+        content_type=Image.MIME[image_format]
+    )
+
+
+def make_uploaded_gallery_item(
+    title: str,
+    upload: SimpleUploadedFile
+) -> GalleryItem:
+    """An item saved with an uploaded original, as the admin saves it, so
+    that a rendition job is queued for it
+    """
+
+    item: GalleryItem = GalleryItem(title=title, artist_name='Artist')
+    item.save_image(ImageIngest(upload))
+    item.save()
+
+    return item
+
+
+def run_queued_jobs() -> None:
+    """Runs jobs as the rendition worker does, until none are runnable. The
+    worker command itself would close the test database connection
+    """
+
+    while True:
+
+        job: Optional[RenditionJob] = RenditionJob.objects.claim()
+
+        if job is None:
+            return
+
+        job.run()
+
+
+def make_gallery_item(title: str, tags) -> GalleryItem:
+
+    item: GalleryItem = GalleryItem.objects.create(
+        title=title,
+        artist_name='Artist',
+        original_image=make_image_file(6000, 4000),
+        renditions_status=RenditionStatus.READY,
+    )
+    item.tags.set(tags)
+
+    for spec in GalleryItem.RENDITION_SPECS:
+        Rendition.objects.create(
+            gallery_item=item,
+            image=make_image_file(spec.size, spec.size * 2 // 3),
+            size=spec.size,
+            format=spec.format,
+        )
+
+    for img_field_name, spec in GalleryItem.REDUCED_IMAGE_FIELDS:
+        setattr(
+            item,
+            img_field_name,
+            item.renditions.get(size=spec.size, format=spec.format).image
+        )
+
+    item.save()
+
+    TilePyramid.objects.create(
+        gallery_item=item,
+        width=6000,
+        height=4000,
+        tile_size=256,
+        overlap=1,
+    )
+
+    return item
+
+
+@override_settings(
+    CACHES=LOCAL_API_CACHES,
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage'
+)
+class ApiQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    """Each endpoint is requested with several items, tags and renditions,
+    so an N+1 query would exceed the budget
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+
+        cls.tags = [
+            ItemTag.objects.create(name=name)
+            for name in ('oil', 'portrait', 'landscape')
+        ]
+        cls.items = [
+            make_gallery_item(f'Item {number}', cls.tags)
+            for number in range(5)
+        ]
+
+    def setUp(self):
+
+        # The budgets are for building the responses, not serving them cached
+        clear_caches()
+
+    def test_gallery_item_list(self):
+
+        # Conditional GET state, and items joined to their thumbnails
+        with self.assertQueryBudget(2):
+            response = self.client.get(reverse('galleryitem-list'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), len(self.items))
+
+    def test_expanded_gallery_item_list(self):
+
+        # Conditional GET state, items, tags and renditions
+        with self.assertQueryBudget(4):
+            response = self.client.get(
+                reverse('galleryitem-list'),
+                {'expand': 'large_image,tile_source,tags,renditions'}
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), len(self.items))
+
+    def test_gallery_item_detail(self):
+
+        # Conditional GET state, item, tags and renditions
+        with self.assertQueryBudget(4):
+            response = self.client.get(
+                reverse('galleryitem-detail', args=(self.items[0].pk,))
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            len(response.data['renditions']),
+            len(GalleryItem.RENDITION_SPECS)
+        )
+
+    def test_item_tag_list(self):
+
+        # Conditional GET state, count and tags
+        with self.assertQueryBudget(3):
+            response = self.client.get(reverse('itemtag-list'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), len(self.tags))
+
+    def test_item_tag_detail(self):
+
+        # Conditional GET state and tag
+        with self.assertQueryBudget(2):
+            response = self.client.get(
+                reverse('itemtag-detail', args=(self.tags[0].pk,))
+            )
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_image_rendition_redirect(self):
+
+        # A rendition that exists already, so none is generated
+        spec: RenditionSpec = next(
+            spec for spec in GalleryItem.RENDITION_SPECS
+            if snap_size(spec.size) == spec.size
+        )
+
+        # Item and the existing rendition
+        with self.assertQueryBudget(2):
+            response = self.client.get(
+                reverse(
+                    'image-rendition-detail',
+                    args=(self.items[0].original_image_id,)
+                ),
+                {'w': spec.size, 'fmt': spec.format.lower()}
+            )
+
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(
+    CACHES=LOCAL_API_CACHES,
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage'
+)
+class SparseFieldsetTests(QueryBudgetMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.item = make_gallery_item(
+            'Item',
+            (ItemTag.objects.create(name='oil'),)
+        )
+
+    def setUp(self):
+        clear_caches()
+
+    def get(self, url_name: str, params=None):
+
+        kwargs = (
+            {'args': (self.item.pk,)} if url_name.endswith('detail') else {}
+        )
+
+        with self.assertQueryBudget(4) as context:
+            response = self.client.get(reverse(url_name, **kwargs), params)
+
+        self.assertEqual(response.status_code, 200)
+
+        # The response and the SQL which built it
+        return response, ' '.join(
+            query['sql'] for query in context.captured_queries
+        )
+
+    def test_compact_list(self):
+
+        response, sql = self.get('galleryitem-list')
+
+        self.assertEqual(
+            list(response.data['results'][0]),
+            ['id', 'url', 'thumbnail_image', 'title']
+        )
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn('image_api_galleryitem_tags', sql)
+        self.assertNotIn('image_api_rendition', sql)
+
+    def test_full_detail(self):
+
+        response, _sql = self.get('galleryitem-detail')
+
+        self.assertEqual(
+            list(response.data),
+            list(GalleryItemSerializer.Meta.fields)
+        )
+
+    def test_fields(self):
+
+        response, sql = self.get(
+            'galleryitem-detail',
+            {'fields': 'title,tags'}
+        )
+
+        self.assertEqual(list(response.data), ['title', 'tags'])
+        self.assertNotIn('image_api_imagefile', sql)
+        self.assertNotIn('image_api_rendition', sql)
+
+    def test_expand(self):
+
+        response, sql = self.get(
+            'galleryitem-list',
+            {'fields': 'title', 'expand': 'tags'}
+        )
+
+        self.assertEqual(
+            response.data['results'][0],
+            {'title': 'Item', 'tags': [{'name': 'oil'}]}
+        )
+        self.assertNotIn('image_api_imagefile', sql)
+
+    def test_unknown_fields(self):
+
+        for params in (
+            {'fields': 'title,secret'},
+            {'expand': 'title'},
+        ):
+            response = self.client.get(reverse('galleryitem-list'), params)
+
+            self.assertEqual(response.status_code, 400)
+
+
+@override_settings(
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage'
+)
+class GalleryItemListParityTests(APITestCase):
+    """The list responses are built from rows by GalleryItemListSerializer,
+    and must match GalleryItemSerializer's representation of the items
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+
+        tags: List[ItemTag] = [
+            ItemTag.objects.create(name=name)
+            for name in ('oil', 'portrait', 'landscape')
+        ]
+
+        cls.items: List[GalleryItem] = [
+            make_gallery_item(f'Item {number}', tags[:number])
+            for number in range(4)
+        ]
+
+        # Without a date, reduced size images or a tile pyramid
+        undated: GalleryItem = cls.items[0]
+        undated.created_date = None
+        undated.thumbnail_image = None
+        undated.large_image = None
+        undated.description = 'Ünïcode "quoted" <description>'
+        undated.save()
+        undated.tile_pyramid.delete()
+
+        for number, item in enumerate(cls.items[1:]):
+            item.created_date = date(2019, 1, 1 + number)
+            item.save()
+
+    def setUp(self):
+        clear_caches()
+
+    def serialize(self, params) -> bytes:
+        """Renders the items with GalleryItemSerializer, as a list response
+        would without GalleryItemListSerializer
+        """
+
+        request: Request = Request(
+            APIRequestFactory().get(reverse('galleryitem-list'), params)
+        )
+
+        serializer: ListSerializer = ListSerializer(
+            child=GalleryItemSerializer(),
+            context={
+                'request': request,
+                'field_names': get_requested_field_names(
+                    request,
+                    GalleryItemSerializer,
+                    compact=True
+                ),
+            }
+        )
+
+        return JSONRenderer().render(OrderedDict((
+            ('next', None),
+            ('results', serializer.to_representation(
+                GalleryItem.objects.order_by(
+                    *GalleryItemCursorPagination.ordering
+                )
+            )),
+        )))
+
+    def test_responses_match_serializer(self):
+
+        for params in (
+            {},
+            {'fields': ','.join(GalleryItemSerializer.Meta.fields)},
+            {'expand': 'large_image,renditions,tile_source,tags'},
+            {'fields': 'url,description', 'expand': 'tags'},
+        ):
+            with self.subTest(**params):
+
+                response = self.client.get(
+                    reverse('galleryitem-list'),
+                    params
+                )
+
+                self.assertEqual(response.content, self.serialize(params))
+
+    def test_faster_than_serializer(self):
+        """A micro-benchmark of listing a page of items both ways, including
+        the queries for their relations. The serializer is given prefetched
+        instances, and is still slower
+        """
+
+        for number in range(len(self.items), api_settings.PAGE_SIZE):
+            make_gallery_item(f'Item {number}', ())
+
+        view: GalleryViewSet = GalleryViewSet(
+            action='list',
+            format_kwarg=None,
+            request=Request(
+                APIRequestFactory().get(
+                    reverse('galleryitem-list'),
+                    {'fields': ','.join(GalleryItemSerializer.Meta.fields)}
+                )
+            )
+        )
+
+        rows: List[dict] = list(view.get_queryset())
+
+        view.action = 'retrieve'
+        items: List[GalleryItem] = list(view.get_queryset())
+
+        context = view.get_serializer_context()
+
+        listings: List[Tuple[ListSerializer, List]] = [
+            (GalleryItemSerializer(many=True, context=context), rows),
+            (
+                ListSerializer(child=GalleryItemSerializer(), context=context),
+                items
+            ),
+        ]
+        timings: List[List[float]] = [[], []]
+
+        # The runs alternate, so that both ways see the same machine load
+        for _run in range(10):
+            for (serializer, data), listing_timings in zip(listings, timings):
+                start: float = perf_counter()
+                serializer.to_representation(data)
+                listing_timings.append(perf_counter() - start)
+
+        self.assertLess(min(timings[0]), min(timings[1]))
+
+
+@override_settings(
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+    MEDIA_URL='/media/'
+)
+class GalleryItemExportTests(QueryBudgetMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        tags: List[ItemTag] = [
+            ItemTag.objects.create(name=name)
+            for name in ('oil', 'portrait')
+        ]
+
+        for number in range(5):
+            make_gallery_item(f'Item {number}', tags[:number % 3])
+
+    def setUp(self):
+        clear_caches()
+
+    def get_listed_items(self, **params) -> List[dict]:
+
+        return json.loads(self.client.get(
+            reverse('galleryitem-list'),
+            {'fields': ','.join(GalleryItemSerializer.Meta.fields), **params}
+        ).content)['results']
+
+    def export(self, params=None) -> bytes:
+
+        response = self.client.get(reverse('galleryitem-export'), params)
+
+        self.assertEqual(response.status_code, 200)
+
+        return b''.join(response.streaming_content)
+
+    def test_ndjson(self):
+
+        content: bytes = self.export()
+
+        self.assertEqual(
+            [json.loads(line) for line in content.splitlines()],
+            self.get_listed_items()
+        )
+
+    def test_json_array(self):
+
+        self.assertEqual(
+            json.loads(self.export({'format': 'json'})),
+            self.get_listed_items(format='json')
+        )
+        self.assertEqual(
+            self.export({'format': 'json', 'tag': 'missing'}),
+            b'[]'
+        )
+
+    def test_fields_and_filters(self):
+
+        self.assertEqual(
+            [
+                json.loads(line)
+                for line in self.export({
+                    'tag': 'portrait',
+                    'fields': 'title',
+                }).splitlines()
+            ],
+            [{'title': 'Item 2'}]
+        )
+
+    def test_queries_per_chunk(self):
+
+        # The items, then each chunk's tags and renditions
+        with mock.patch('image_api.views.EXPORT_CHUNK_SIZE', 2):
+            with self.assertQueryBudget(1 + 3 * 2):
+                content: bytes = self.export()
+
+        self.assertEqual(len(content.splitlines()), 5)
+
+    def test_invalid_fields(self):
+
+        response = self.client.get(
+            reverse('galleryitem-export'),
+            {'fields': 'secret'}
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+
+class CatalogueExportTests(APITestCase):
+
+    def setUp(self):
+
+        clear_caches()
+        use_temporary_media(self, CATALOGUE_API_ORIGIN='http://testserver')
+
+        tags: List[ItemTag] = [
+            ItemTag.objects.create(name=name)
+            for name in ('oil', 'portrait')
+        ]
+        self.items: List[GalleryItem] = [
+            make_gallery_item(f'Item {number}', tags[:number])
+            for number in range(3)
+        ]
+
+        SocialMediaLinks.objects.create(facebook='https://facebook.com/a')
+
+    def read_document(self, url: str) -> bytes:
+
+        name: str = url[len(settings.MEDIA_URL):]
+
+        with default_storage.open(name) as document_file:
+            return gzip.decompress(document_file.read())
+
+    def test_documents_match_api_responses(self):
+
+        manifest = export_catalogue()
+
+        for url, api_url, params in (
+            (
+                manifest['gallery_items'][0],
+                reverse('galleryitem-list'),
+                {'fields': ','.join(GalleryItemSerializer.Meta.fields)},
+            ),
+            (manifest['image_tags'], reverse('itemtag-list'), {}),
+            (
+                manifest['social_media_links'],
+                reverse('socialmedialinks-list'),
+                {},
+            ),
+        ):
+            with self.subTest(api_url=api_url):
+                self.assertEqual(
+                    self.read_document(url),
+                    self.client.get(api_url, params).content
+                )
+
+    def test_pages_link_to_the_next_page(self):
+
+        with mock.patch.object(GalleryItemCursorPagination, 'page_size', 2):
+            manifest = export_catalogue()
+
+        self.assertEqual(len(manifest['gallery_items']), 2)
+
+        first_page, last_page = (
+            json.loads(self.read_document(url))
+            for url in manifest['gallery_items']
+        )
+
+        self.assertEqual(first_page['next'], manifest['gallery_items'][1])
+        self.assertEqual(len(first_page['results']), 2)
+        self.assertIsNone(last_page['next'])
+        self.assertEqual(len(last_page['results']), 1)
+
+    def test_manifest_points_at_current_version(self):
+
+        version: str = export_catalogue()['version']
+
+        self.items[0].title = 'New title'
+        self.items[0].save()
+
+        manifest = export_catalogue()
+
+        self.assertNotEqual(manifest['version'], version)
+
+        with default_storage.open(
+            f'{settings.CATALOGUE_PREFIX}/manifest.json'
+        ) as manifest_file:
+            self.assertEqual(json.loads(manifest_file.read()), manifest)
+
+    def test_unchanged_content_not_rewritten(self):
+
+        version: str = export_catalogue()['version']
+
+        with mock.patch('image_api.catalogue.save_document') as save:
+            self.assertEqual(export_catalogue()['version'], version)
+
+        save.assert_not_called()
+
+    def test_overwriting_storage_replaces_in_place(self):
+
+        storage = mock.Mock(file_overwrite=True)
+
+        replace_file(storage, 'manifest.json', b'{}')
+
+        storage.delete.assert_not_called()
+        storage.save.assert_called_once()
+
+    def queued_exports(self) -> QuerySet:
+        return RenditionJob.objects.filter(
+            kind=RenditionJob.CATALOGUE_EXPORT,
+            status=RenditionJob.PENDING
+        )
+
+    def test_exported_on_save_when_enabled(self):
+
+        self.items[0].save()
+        self.assertFalse(self.queued_exports().exists())
+
+        with override_settings(CATALOGUE_EXPORT_ON_SAVE=True):
+
+            with transaction.atomic():
+                self.items[0].save()
+                self.items[1].tags.clear()
+                ItemTag.objects.create(name='sketch')
+
+            # The queued export also covers later changes
+            self.items[2].save()
+
+        self.assertEqual(self.queued_exports().count(), 1)
+
+        self.queued_exports().get().run()
+
+        self.assertFalse(RenditionJob.objects.exists())
+        self.assertTrue(default_storage.exists(
+            f'{settings.CATALOGUE_PREFIX}/manifest.json'
+        ))
+
+    @override_settings(CATALOGUE_EXPORT_ON_SAVE=True)
+    def test_exported_again_with_renditions(self):
+
+        item: GalleryItem = make_uploaded_gallery_item(
+            'Uploaded',
+            make_upload(1200, 800)
+        )
+
+        run_queued_jobs()
+
+        self.assertFalse(RenditionJob.objects.exists())
+
+        manifest = json.loads(default_storage.open(
+            f'{settings.CATALOGUE_PREFIX}/manifest.json'
+        ).read())
+
+        exported = next(
+            result
+            for url in manifest['gallery_items']
+            for result in json.loads(self.read_document(url))['results']
+            if result['id'] == str(item.pk)
+        )
+
+        item.refresh_from_db()
+
+        self.assertEqual(exported['renditions_status'], RenditionStatus.READY)
+        self.assertEqual(
+            exported['thumbnail_image']['url'],
+            f'http://testserver{item.thumbnail_image.file.url}'
+        )
+        self.assertEqual(
+            sorted(rendition['url'] for rendition in exported['renditions']),
+            sorted(
+                f'http://testserver{rendition.image.file.url}'
+                for rendition in item.renditions.all()
+            )
+        )
+
+    @override_settings(CATALOGUE_EXPORT_ON_SAVE=True)
+    def test_exported_when_tags_change(self):
+
+        self.items[0].tags.clear()
+
+        self.assertEqual(self.queued_exports().count(), 1)
+
+
+@override_settings(
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage'
+)
+class GalleryItemPaginationTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        # Shared dates and titles, and undated items, so that every column
+        # of the ordering decides between some items
+        for created_date in (date(2019, 5, 1), date(2018, 1, 1), None):
+            for title in ('A', 'A', 'B'):
+                GalleryItem.objects.create(
+                    title=title,
+                    artist_name='Artist',
+                    created_date=created_date,
+                    original_image=make_image_file(100, 100),
+                )
+
+    def setUp(self):
+        clear_caches()
+
+    def test_keyset_index_survives_migrations(self):
+
+        # SQLite rebuilds tables to alter them, keeping only the indexes in
+        # the model state
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor,
+                GalleryItem._meta.db_table
+            )
+
+        self.assertIn('image_api_galleryitem_keyset', constraints)
+
+    def test_pages_follow_ordering(self):
+
+        expected_ids: List[str] = [
+            str(item_id)
+            for item_id in GalleryItem.objects.order_by(
+                *GalleryItemCursorPagination.ordering
+            ).values_list('id', flat=True)
+        ]
+
+        self.assertEqual(
+            GalleryItem.objects.get(pk=expected_ids[0]).created_date,
+            date(2019, 5, 1)
+        )
+        self.assertIsNone(
+            GalleryItem.objects.get(pk=expected_ids[-1]).created_date
+        )
+
+        # Pages which end on the last dated item, and which span dated and
+        # undated items
+        for page_size in (2, 4):
+            with self.subTest(page_size=page_size):
+
+                ids: List[str] = []
+                url: str = reverse('galleryitem-list')
+
+                with mock.patch.object(
+                    GalleryItemCursorPagination,
+                    'page_size',
+                    page_size
+                ):
+                    while url is not None:
+                        clear_caches()
+                        response = self.client.get(url)
+                        ids.extend(
+                            item['id'] for item in response.data['results']
+                        )
+                        url = response.data['next']
+
+                self.assertEqual(ids, expected_ids)
+
+    def test_invalid_cursor(self):
+
+        for cursor in (
+            'not a cursor',
+            encode_cursor((date(2020, 1, 1), 'A', 'not a UUID')),
+            urlsafe_b64encode(b'["2020-13-01", "A", "x"]').decode(),
+        ):
+            with self.subTest(cursor=cursor):
+
+                response = self.client.get(
+                    reverse('galleryitem-list'),
+                    {'cursor': cursor}
+                )
+
+                self.assertEqual(response.status_code, 404)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Postgres query plans')
+class GalleryItemKeysetIndexTests(TestCase):
+    """Each page must seek the keyset index to its cursor, with an index
+    condition, rather than filter out every item before it. Runs of items
+    much longer than a page must be read from the index in order, so there
+    are enough items for the planner's choice to be a realistic one
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+
+        image_files: List[ImageFile] = ImageFile.objects.bulk_create(
+            ImageFile(id=uuid4(), width=100, height=100)
+            for _ in range(4000)
+        )
+
+        # 100 items on each of 30 dates, and 1000 undated items, with the
+        # titles interleaved between the dates
+        GalleryItem.objects.bulk_create(
+            GalleryItem(
+                id=uuid4(),
+                title=f'Item {number * 7919 % 4000:04}',
+                artist_name='Artist',
+                created_date=(
+                    date(2000 + number % 30, 1, 1) if number < 3000 else None
+                ),
+                original_image=image_file,
+            )
+            for number, image_file in enumerate(image_files)
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE image_api_galleryitem')
+
+    def explain_runs(self, index: int) -> List[str]:
+
+        queryset: QuerySet = GalleryItem.objects.order_by(
+            *GalleryItemCursorPagination.ordering
+        )
+        position: Position = get_position(queryset[index])
+
+        plans: List[str] = [
+            queryset.filter(condition)[
+                :GalleryItemCursorPagination.page_size + 1
+            ].explain()
+            for condition in after_position(position)
+        ]
+
+        for plan in plans:
+            self.assertIn('image_api_galleryitem_keyset', plan)
+            self.assertIn('Index Cond', plan)
+
+        return plans
+
+    def test_deep_dated_cursor(self):
+
+        # Halfway through a date's items. The rest of them may be sorted,
+        # being less than a page
+        rest_of_date, earlier_dates, undated = self.explain_runs(1050)
+
+        self.assertIn('title >=', rest_of_date)
+        self.assertNotIn('Sort', earlier_dates)
+        self.assertNotIn('Sort', undated)
+
+    def test_undated_cursor(self):
+
+        (undated,) = self.explain_runs(3100)
+
+        self.assertIn('title >=', undated)
+        self.assertNotIn('Sort', undated)
+
+
+@override_settings(
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage'
+)
+class GalleryItemFilterTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        oil, watercolour, portrait = (
+            ItemTag.objects.create(name=name)
+            for name in ('oil', 'watercolour', 'portrait')
+        )
+
+        for title, artist_name, created_date, tags in (
+            ('Oil portrait', 'Ann', date(2018, 6, 1), (oil, portrait)),
+            ('Oil', 'Ann', date(2019, 6, 1), (oil,)),
+            ('Watercolour', 'Bob', date(2019, 7, 1), (watercolour,)),
+            ('Undated', 'Bob', None, (watercolour, portrait)),
+        ):
+            item: GalleryItem = GalleryItem.objects.create(
+                title=title,
+                artist_name=artist_name,
+                created_date=created_date,
+                original_image=make_image_file(100, 100),
+            )
+            item.tags.set(tags)
+
+    def setUp(self):
+        clear_caches()
+
+    def get_titles(self, params) -> List[str]:
+
+        response = self.client.get(reverse('galleryitem-list'), params)
+
+        self.assertEqual(response.status_code, 200)
+
+        return sorted(item['title'] for item in response.data['results'])
+
+    def test_any_tag(self):
+
+        self.assertEqual(
+            self.get_titles({'tag': ['oil', 'watercolour']}),
+            ['Oil', 'Oil portrait', 'Undated', 'Watercolour']
+        )
+
+    def test_all_tags(self):
+
+        self.assertEqual(
+            self.get_titles({'tag': ['oil', 'portrait'], 'tag_match': 'all'}),
+            ['Oil portrait']
+        )
+
+    def test_artist_name(self):
+
+        self.assertEqual(
+            self.get_titles({'artist_name': 'Bob'}),
+            ['Undated', 'Watercolour']
+        )
+
+    def test_created_date_range(self):
+
+        self.assertEqual(
+            self.get_titles({
+                'created_date_after': '2018-06-01',
+                'created_date_before': '2019-06-30',
+            }),
+            ['Oil', 'Oil portrait']
+        )
+
+    def test_combined_filters(self):
+
+        self.assertEqual(
+            self.get_titles({
+                'tag': 'portrait',
+                'artist_name': 'Ann',
+                'created_date_after': '2018-01-01',
+            }),
+            ['Oil portrait']
+        )
+
+    def test_invalid_params(self):
+
+        for params in (
+            {'created_date_after': '01/06/2018'},
+            {'created_date_before': '2018-13-01'},
+            {'tag': 'oil', 'tag_match': 'some'},
+        ):
+            response = self.client.get(reverse('galleryitem-list'), params)
+
+            self.assertEqual(response.status_code, 400)
+
+
+@override_settings(
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage'
+)
+class GalleryItemSearchTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        for title, artist_name, media_description, description in (
+            ('Harbour at dusk', 'Ann', 'Oil on canvas', 'Boats at rest'),
+            ('Boats', 'Bob', 'Watercolour', 'A harbour in the rain'),
+            ('Still life', 'Cat', 'Oil on board', 'Fruit on a table'),
+        ):
+            GalleryItem.objects.create(
+                title=title,
+                artist_name=artist_name,
+                media_description=media_description,
+                description=description,
+                original_image=make_image_file(100, 100),
+            )
+
+    def setUp(self):
+        clear_caches()
+
+    def search(self, terms: str, **params):
+
+        response = self.client.get(
+            reverse('galleryitem-list'),
+            {'search': terms, **params}
+        )
+
+        self.assertEqual(response.status_code, 200)
+
+        return response
+
+    def get_titles(self, terms: str) -> List[str]:
+        return sorted(
+            item['title'] for item in self.search(terms).data['results']
+        )
+
+    def test_searches_every_text_field(self):
+
+        self.assertEqual(
+            self.get_titles('harbour'),
+            ['Boats', 'Harbour at dusk']
+        )
+        self.assertEqual(self.get_titles('Cat'), ['Still life'])
+        self.assertEqual(
+            self.get_titles('oil'),
+            ['Harbour at dusk', 'Still life']
+        )
+
+    def test_every_word_must_match(self):
+
+        self.assertEqual(self.get_titles('oil harbour'), ['Harbour at dusk'])
+        self.assertEqual(self.get_titles('oil rain'), [])
+
+    def test_combines_with_filters(self):
+
+        response = self.search('harbour', artist_name='Bob')
+
+        self.assertEqual(
+            [item['title'] for item in response.data['results']],
+            ['Boats']
+        )
+
+    def test_paginated_by_page_number(self):
+
+        response = self.search('harbour', page=1)
+
+        self.assertEqual(response.data['count'], 2)
+        self.assertIsNone(response.data['next'])
+
+    def test_blank_search_is_ignored(self):
+
+        response = self.search('  ')
+
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertNotIn('count', response.data)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Postgres full text search')
+@override_settings(
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage'
+)
+class GalleryItemSearchRankTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        for title, description in (
+            ('Still life', 'A harbour seen from afar'),
+            ('Harbour', ''),
+        ):
+            GalleryItem.objects.create(
+                title=title,
+                artist_name='Ann',
+                description=description,
+                original_image=make_image_file(100, 100),
+            )
+
+    def search(self, terms: str) -> QuerySet:
+
+        request = mock.Mock(query_params={'search': terms})
+
+        return GalleryItemSearchFilter().filter_queryset(
+            request,
+            GalleryItem.objects.all(),
+            None
+        )
+
+    def test_title_matches_rank_first(self):
+
+        self.assertEqual(
+            [item.title for item in self.search('harbours')],
+            ['Harbour', 'Still life']
+        )
+
+    def test_search_vector_updated_on_save(self):
+
+        item: GalleryItem = GalleryItem.objects.get(title='Still life')
+        item.description = 'Apples'
+        item.save()
+
+        self.assertEqual(
+            [item.title for item in self.search('harbour')],
+            ['Harbour']
+        )
+
+    def test_uses_gin_index(self):
+
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+        self.assertIn(
+            'image_api_galleryitem_search',
+            self.search('harbour').explain()
+        )
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Postgres query plans')
+class GalleryItemFilterIndexTests(TestCase):
+    """The test tables are tiny, so sequential scans are disabled to show
+    that an index can serve each filter, rather than that the planner would
+    pick it over a scan of the table
+    """
+
+    def explain_without_seq_scan(self, queryset: QuerySet) -> str:
+
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+        plan: str = queryset.explain()
+        self.assertNotIn('Seq Scan', plan)
+
+        return plan
+
+    def assertUsesIndexes(self, queryset: QuerySet, *index_names) -> None:
+
+        plan: str = self.explain_without_seq_scan(queryset)
+
+        for index_name in index_names:
+            self.assertIn(index_name, plan)
+
+    def test_tag_filter(self):
+
+        for match in ('any', 'all'):
+            with self.subTest(match=match):
+                self.assertUsesIndexes(
+                    filter_by_tags(
+                        GalleryItem.objects.all(),
+                        ['oil', 'x'],
+                        match
+                    ),
+                    # Django's index on the through table's tag column
+                    'image_api_galleryitem_tags_itemtag_id',
+                )
+
+    def test_artist_name_filter(self):
+
+        self.assertUsesIndexes(
+            GalleryItem.objects.filter(artist_name='Ann'),
+            'galleryitem_artist_date',
+        )
+
+    def test_artist_name_and_created_date_range_filter(self):
+
+        self.assertUsesIndexes(
+            GalleryItem.objects.filter(
+                artist_name='Ann',
+                created_date__gte=date(2018, 1, 1),
+            ),
+            'galleryitem_artist_date',
+        )
+
+    def test_created_date_range_filter(self):
+
+        plan: str = self.explain_without_seq_scan(
+            GalleryItem.objects.filter(
+                created_date__gte=date(2018, 1, 1),
+                created_date__lte=date(2019, 1, 1),
+            )
+        )
+
+        # Either index's dates can be compared without reading the table. On
+        # a tiny table the planner's choice between them is a coin toss
+        self.assertTrue(
+            'image_api_galleryitem_keyset' in plan
+            or 'galleryitem_artist_date' in plan,
+            plan
+        )
+
+
+@override_settings(
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage'
+)
+class ConditionalGetTests(QueryBudgetMixin, APITransactionTestCase):
+
+    def setUp(self):
+
+        clear_caches()
+
+        self.tag = ItemTag.objects.create(name='oil')
+        self.item = make_gallery_item('Item', (self.tag,))
+
+    def get_etag(self, url: str) -> str:
+        return self.client.get(url)['ETag']
+
+    def test_unchanged_list_not_modified(self):
+
+        url: str = reverse('galleryitem-list')
+        etag: str = self.get_etag(url)
+
+        with self.assertQueryBudget(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse(response.content)
+
+    def test_unchanged_detail_not_modified(self):
+
+        url: str = reverse('galleryitem-detail', args=(self.item.pk,))
+        etag: str = self.get_etag(url)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_malformed_pk_not_found(self):
+
+        response = self.client.get(
+            reverse('galleryitem-detail', args=('not-a-uuid',))
+        )
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_last_modified(self):
+
+        url: str = reverse('itemtag-detail', args=(self.tag.pk,))
+        last_modified: str = self.client.get(url)['Last-Modified']
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_deleting_an_older_item_modifies_list(self):
+
+        make_gallery_item('Newer item', ())
+
+        url: str = reverse('galleryitem-list')
+        response = self.client.get(url)
+
+        # The newest item's updated time is unchanged by the deletion
+        self.assertNotIn('Last-Modified', response)
+
+        self.item.delete()
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_changing_tags_changes_etag(self):
+
+        url: str = reverse('galleryitem-detail', args=(self.item.pk,))
+        etag: str = self.get_etag(url)
+
+        self.item.tags.clear()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['tags'], [])
+
+    def test_deleting_a_tag_changes_etag(self):
+
+        url: str = reverse('galleryitem-list')
+        etag: str = self.get_etag(url)
+
+        self.tag.delete()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_new_rendition_changes_etag(self):
+
+        url: str = reverse('galleryitem-detail', args=(self.item.pk,))
+        etag: str = self.get_etag(url)
+
+        Rendition.objects.create(
+            gallery_item=self.item,
+            image=make_image_file(123, 82),
+            size=123,
+            format='JPEG',
+        )
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_deleting_an_item_changes_etag(self):
+
+        make_gallery_item('Other item', ())
+
+        url: str = reverse('galleryitem-list')
+        etag: str = self.get_etag(url)
+
+        self.item.delete()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+
+
+class ApiCacheCheckTests(TestCase):
+
+    def test_shared_cache(self):
+        self.assertEqual(check_api_cache_shared(None), [])
+
+    def test_database_cache(self):
+
+        self.assertEqual(
+            settings.CACHES[settings.API_CACHE_ALIAS]['OPTIONS'],
+            {'MAX_ENTRIES': 5000}
+        )
+        self.assertEqual(
+            [warning.id for warning in check_api_cache_outside_database(None)],
+            ['image_api.W001']
+        )
+
+        with override_settings(CACHES={
+            **settings.CACHES,
+            settings.API_CACHE_ALIAS: {
+                'BACKEND': 'django.core.cache.backends.memcached.PyLibMCCache',
+                'LOCATION': 'localhost:11211',
+            },
+        }):
+            self.assertEqual(check_api_cache_outside_database(None), [])
+
+    @override_settings(CACHES=LOCAL_API_CACHES)
+    def test_process_local_cache(self):
+
+        self.assertEqual(
+            [error.id for error in check_api_cache_shared(None)],
+            ['image_api.E001']
+        )
+
+
+@override_settings(
+    CACHES=LOCAL_API_CACHES,
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage'
+)
+class ResponseCacheTests(QueryBudgetMixin, APITransactionTestCase):
+    """Transaction test cases commit, so the content version is bumped"""
+
+    def setUp(self):
+
+        clear_caches()
+
+        self.tag = ItemTag.objects.create(name='oil')
+        self.item = make_gallery_item('Item', (self.tag,))
+
+    def test_cache_hit_runs_no_queries(self):
+
+        self.client.get(reverse('galleryitem-list'))
+
+        # Only the conditional GET state
+        with self.assertQueryBudget(1):
+            response = self.client.get(reverse('galleryitem-list'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_saving_an_item_invalidates(self):
+
+        self.client.get(reverse('galleryitem-detail', args=(self.item.pk,)))
+
+        self.item.title = 'New title'
+        self.item.save()
+
+        response = self.client.get(
+            reverse('galleryitem-detail', args=(self.item.pk,))
+        )
+
+        self.assertEqual(response.data['title'], 'New title')
+
+    def test_changing_tags_invalidates(self):
+
+        self.client.get(reverse('galleryitem-list'), {'expand': 'tags'})
+
+        self.item.tags.clear()
+
+        response = self.client.get(
+            reverse('galleryitem-list'),
+            {'expand': 'tags'}
+        )
+
+        self.assertEqual(response.data['results'][0]['tags'], [])
+
+    def test_deleting_a_tag_invalidates(self):
+
+        self.client.get(reverse('itemtag-list'))
+
+        self.tag.delete()
+
+        response = self.client.get(reverse('itemtag-list'))
+
+        self.assertEqual(response.data['results'], [])
+
+    def test_stale_response_while_another_request_rebuilds(self):
+
+        self.client.get(reverse('galleryitem-list'))
+
+        self.item.title = 'New title'
+        self.item.save()
+
+        # Another request holds the lock
+        with mock.patch.object(api_cache(), 'add', return_value=False):
+            response = self.client.get(reverse('galleryitem-list'))
+
+        self.assertEqual(response.data['results'][0]['title'], 'Item')
+        self.assertIn('Stale', response['Warning'])
+
+        # The stale content can't be revalidated as the current content
+        self.assertNotIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+        response = self.client.get(reverse('galleryitem-list'))
+
+        self.assertEqual(response.data['results'][0]['title'], 'New title')
+        self.assertIn('ETag', response)
+
+    def test_stale_response_when_database_unreachable(self):
+
+        self.client.get(reverse('galleryitem-list'))
+
+        self.item.title = 'New title'
+        self.item.save()
+
+        with mock.patch.object(
+            ListModelMixin,
+            'list',
+            side_effect=OperationalError('Connection refused')
+        ):
+            response = self.client.get(reverse('galleryitem-list'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['title'], 'Item')
+        self.assertIn('Stale', response['Warning'])
+
+
+class ImageResizerTests(TestCase):
+
+    def resize_sources(
+        self,
+        upload: SimpleUploadedFile,
+        sizes
+    ) -> Tuple[List, List]:
+        """The renditions' sizes, and the size of each image a rendition is
+        resized from
+        """
+
+        resize = Image.Image.resize
+
+        with mock.patch.object(
+            Image.Image,
+            'resize',
+            autospec=True,
+            side_effect=resize
+        ) as resize_mock, ImageResizer(upload) as resizer:
+            renditions = [
+                (size, image.size)
+                for size, image in resizer.iter_box_sizes(sizes)
+            ]
+
+        return renditions, [
+            call[0][0].size for call in resize_mock.call_args_list
+        ]
+
+    def test_box_dimensions(self):
+
+        self.assertEqual(box_dimensions((6000, 4000), 600), (600, 400))
+        self.assertEqual(box_dimensions((4000, 6000), 600), (400, 600))
+        self.assertEqual(box_dimensions((500, 300), 600), None)
+
+    def test_jpeg_decoded_at_reduced_scale(self):
+
+        renditions, sources = self.resize_sources(
+            make_upload(2400, 1600),
+            (300, 1000)
+        )
+
+        self.assertEqual(renditions, [(1000, (1000, 667)), (300, (300, 200))])
+
+        # Decoded at half scale, the smallest covering the largest size, and
+        # each smaller rendition resized from the one above it
+        self.assertEqual(sources, [(1200, 800), (1000, 667)])
+
+    def test_other_formats_decoded_at_full_size(self):
+
+        renditions, sources = self.resize_sources(
+            make_upload(2400, 1600, 'PNG'),
+            (300, 1000)
+        )
+
+        self.assertEqual(renditions, [(1000, (1000, 667)), (300, (300, 200))])
+        self.assertEqual(sources, [(2400, 1600), (1000, 667)])
+
+    def test_small_images_not_enlarged(self):
+
+        renditions, sources = self.resize_sources(
+            make_upload(400, 200),
+            (300, 1000)
+        )
+
+        self.assertEqual(renditions, [(1000, (400, 200)), (300, (300, 150))])
+        self.assertEqual(sources, [(400, 200)])
+
+    def test_shrink_image_to_box_sizes(self):
+
+        small: BytesIO = BytesIO()
+        small_copy: BytesIO = BytesIO()
+        large: BytesIO = BytesIO()
+
+        with ImageResizer(make_upload(1200, 1600)) as resizer:
+            resizer.shrink_image_to_box_sizes(
+                ((300, small), (800, large), (300, small_copy))
+            )
+
+        for fout, size in (
+            (small, (225, 300)),
+            (small_copy, (225, 300)),
+            (large, (600, 800)),
+        ):
+            fout.seek(0)
+
+            with Image.open(fout) as image:
+                self.assertEqual(image.format, 'JPEG')
+                self.assertEqual(image.size, size)
+
+    def test_working_image_modes(self):
+
+        palette: Image = Image.new('P', (2, 2))
+        transparent_palette: Image = Image.new('P', (2, 2))
+        transparent_palette.info['transparency'] = 0
+
+        for image, mode in (
+            (palette, 'RGB'),
+            (transparent_palette, 'RGBA'),
+            (Image.new('1', (2, 2)), 'L'),
+            (Image.new('RGB', (2, 2)), 'RGB'),
+            (Image.new('CMYK', (2, 2)), 'CMYK'),
+        ):
+            self.assertEqual(working_image(image).mode, mode)
+
+        # 16 bit greyscale is scaled down to 8 bits
+        deep: Image = working_image(Image.new('I;16', (2, 2), 512))
+
+        self.assertEqual(deep.mode, 'L')
+        self.assertEqual(deep.getpixel((0, 0)), 2)
+
+
+class RenditionJobTests(TestCase):
+
+    def setUp(self):
+
+        self.item: GalleryItem = make_gallery_item('Item', ())
+
+    def fail_job(self, job: RenditionJob) -> RenditionJob:
+
+        with mock.patch.object(
+            GalleryItem,
+            'generate_renditions',
+            side_effect=OSError('Disk full')
+        ), self.assertLogs('image_api.models', 'ERROR'):
+            job.run()
+
+        job.refresh_from_db()
+
+        return job
+
+    def test_claim(self):
+
+        job: RenditionJob = RenditionJob.objects.create(gallery_item=self.item)
+
+        claimed: RenditionJob = RenditionJob.objects.claim()
+
+        self.assertEqual(claimed, job)
+        self.assertEqual(claimed.status, RenditionJob.RUNNING)
+        self.assertEqual(claimed.attempts, 1)
+        self.assertIsNotNone(claimed.started_time)
+
+        # A running job isn't claimed twice
+        self.assertIsNone(RenditionJob.objects.claim())
+
+    def test_jobs_not_claimed_before_run_after(self):
+
+        RenditionJob.objects.create(
+            gallery_item=self.item,
+            run_after=timezone.now() + timedelta(minutes=1)
+        )
+
+        self.assertIsNone(RenditionJob.objects.claim())
+
+    def test_expired_lease_claimed_again(self):
+
+        lease: timedelta = timedelta(
+            seconds=settings.RENDITION_JOB_LEASE_SECONDS
+        )
+
+        job: RenditionJob = RenditionJob.objects.create(
+            gallery_item=self.item,
+            status=RenditionJob.RUNNING,
+            started_time=timezone.now() - lease + timedelta(minutes=1),
+            attempts=1
+        )
+
+        self.assertIsNone(RenditionJob.objects.claim())
+
+        job.started_time = timezone.now() - lease - timedelta(minutes=1)
+        job.save()
+
+        claimed: RenditionJob = RenditionJob.objects.claim()
+
+        self.assertEqual(claimed, job)
+        self.assertEqual(claimed.attempts, 2)
+
+    def test_failed_job_retried_with_backoff(self):
+
+        RenditionJob.objects.create(gallery_item=self.item)
+
+        for attempt, delay in ((1, 30), (2, 60), (3, 120)):
+
+            job: RenditionJob = RenditionJob.objects.claim()
+
+            self.assertEqual(job.attempts, attempt)
+
+            job = self.fail_job(job)
+
+            self.assertEqual(job.status, RenditionJob.PENDING)
+            self.assertEqual(job.last_error, 'OSError: Disk full')
+            self.assertAlmostEqual(
+                (job.run_after - timezone.now()).total_seconds(),
+                delay,
+                delta=5
+            )
+
+            # Not runnable until the delay has passed
+            self.assertIsNone(RenditionJob.objects.claim())
+
+            job.run_after = timezone.now()
+            job.save()
+
+    def test_failed_after_max_attempts(self):
+
+        RenditionJob.objects.create(
+            gallery_item=self.item,
+            attempts=settings.RENDITION_JOB_MAX_ATTEMPTS - 1
+        )
+
+        job: RenditionJob = self.fail_job(RenditionJob.objects.claim())
+
+        self.assertEqual(job.status, RenditionJob.FAILED)
+        self.assertIsNone(RenditionJob.objects.claim())
+
+        self.item.refresh_from_db()
+
+        self.assertEqual(self.item.renditions_status, RenditionStatus.FAILED)
+
+    def test_enqueue_supersedes_jobs_not_started(self):
+
+        running: RenditionJob = RenditionJob.objects.create(
+            gallery_item=self.item,
+            status=RenditionJob.RUNNING,
+            started_time=timezone.now()
+        )
+        RenditionJob.objects.create(gallery_item=self.item)
+        RenditionJob.objects.create(
+            gallery_item=self.item,
+            status=RenditionJob.FAILED
+        )
+
+        job: RenditionJob = RenditionJob.objects.enqueue(self.item)
+
+        self.assertEqual(
+            set(self.item.rendition_jobs.all()),
+            {running, job}
+        )
+
+    def test_queued_when_original_changes(self):
+
+        use_temporary_media(self)
+
+        item: GalleryItem = make_uploaded_gallery_item(
+            'Uploaded',
+            make_upload(1200, 800)
+        )
+
+        self.assertEqual(item.renditions_status, RenditionStatus.PENDING)
+        self.assertEqual(item.rendition_jobs.count(), 1)
+        self.assertFalse(item.renditions.exists())
+
+        # Saving other fields doesn't queue renditions again
+        item.title = 'New title'
+        item.save()
+
+        self.assertEqual(item.rendition_jobs.count(), 1)
+
+        run_queued_jobs()
+
+        item.refresh_from_db()
+
+        self.assertEqual(item.renditions_status, RenditionStatus.READY)
+        self.assertFalse(item.rendition_jobs.exists())
+        self.assertTrue(item.renditions.exists())
+        self.assertEqual(item.thumbnail_image.width, 300)
+
+
+class RenditionRegistryTests(APITestCase):
+
+    def test_every_size_in_every_supported_format(self):
+
+        self.assertEqual(
+            set(RENDITION_SPECS),
+            {
+                RenditionSpec(size, save_format)
+                for size in settings.RENDITION_SIZES_PX
+                for save_format in settings.RENDITION_FORMATS
+                if format_supported(save_format)
+            }
+        )
+        self.assertIn(RenditionSpec(300, 'JPEG'), RENDITION_SPECS)
+
+    def test_webp_needs_libwebp(self):
+
+        with mock.patch.object(features, 'check_module', return_value=False):
+            self.assertFalse(format_supported('WEBP'))
+
+        with mock.patch.object(features, 'check_module', return_value=True):
+            self.assertTrue(format_supported('WEBP'))
+
+        self.assertTrue(format_supported('JPEG'))
+        self.assertFalse(format_supported('GIF'))
+
+    def test_render_renditions(self):
+
+        specs: List[RenditionSpec] = [
+            spec
+            for spec in (
+                RenditionSpec(300, 'JPEG'),
+                RenditionSpec(300, 'WEBP'),
+                RenditionSpec(1000, 'JPEG'),
+            )
+            if format_supported(spec.format)
+        ]
+
+        renditions, _placeholder = render_renditions(
+            make_upload(1600, 1200),
+            specs
+        )
+
+        self.assertEqual(
+            [rendition.spec for rendition in renditions],
+            sorted(specs, key=lambda spec: -spec.size)
+        )
+
+        for rendition in renditions:
+
+            with Image.open(BytesIO(rendition.content)) as image:
+
+                self.assertEqual(image.format, rendition.spec.format)
+                self.assertEqual(
+                    image.size,
+                    (rendition.width, rendition.height)
+                )
+                self.assertEqual(max(image.size), rendition.spec.size)
+
+    def test_renditions_listed_as_srcset_candidates(self):
+
+        clear_caches()
+        use_temporary_media(self, CACHES=LOCAL_API_CACHES)
+
+        item: GalleryItem = make_uploaded_gallery_item(
+            'Uploaded',
+            make_upload(2400, 1200)
+        )
+        run_queued_jobs()
+
+        response = self.client.get(
+            reverse('galleryitem-detail', args=(item.pk,)),
+            {'fields': 'renditions,thumbnail_image'}
+        )
+
+        self.assertEqual(
+            sorted(
+                (rendition['width'], rendition['height'], rendition['type'])
+                for rendition in response.data['renditions']
+            ),
+            sorted(
+                (spec.size, spec.size // 2, spec.content_type)
+                for spec in GalleryItem.RENDITION_SPECS
+            )
+        )
+
+        for rendition in response.data['renditions']:
+            with default_storage.open(
+                rendition['url'][len('http://testserver/media/'):]
+            ) as fin, Image.open(fin) as image:
+                self.assertEqual(
+                    image.size,
+                    (rendition['width'], rendition['height'])
+                )
+
+        # The thumbnail is the smallest JPEG rendition
+        self.assertEqual(response.data['thumbnail_image']['width'], 300)
+
+
+class OnDemandRenditionTests(APITestCase):
+
+    def setUp(self):
+
+        use_temporary_media(self)
+
+        self.item: GalleryItem = make_uploaded_gallery_item(
+            'Uploaded',
+            make_upload(2400, 1200)
+        )
+        run_queued_jobs()
+
+    def get(self, image_id, params):
+
+        return self.client.get(
+            reverse('image-rendition-detail', args=(image_id,)),
+            params
+        )
+
+    def test_snap_size(self):
+
+        for requested_size, size in (
+            (1, 160),
+            (160, 160),
+            (161, 320),
+            (1999, 2000),
+            (5000, 2000),
+        ):
+            self.assertEqual(snap_size(requested_size), size)
+
+    def test_generated_once(self):
+
+        response = self.get(self.item.original_image_id, {'w': 700})
+
+        self.assertEqual(response.status_code, 302)
+
+        rendition: Rendition = self.item.renditions.get(size=800)
+
+        self.assertEqual(rendition.format, 'JPEG')
+        self.assertEqual(response['Location'], rendition.image.file.url)
+
+        with default_storage.open(rendition.image.file.name) as fin:
+            with Image.open(fin) as image:
+                self.assertEqual(image.size, (800, 400))
+
+        # Requests by any of the item's images find the stored rendition
+        with mock.patch.object(ImageResizer, 'iter_box_sizes') as resize:
+            response = self.get(rendition.image_id, {'w': 800, 'fmt': 'jpeg'})
+
+        resize.assert_not_called()
+        self.assertEqual(response['Location'], rendition.image.file.url)
+        self.assertEqual(self.item.renditions.filter(size=800).count(), 1)
+
+    def test_concurrent_requests_redirected_to_nearest(self):
+
+        # Another request is generating the 800px rendition
+        api_cache().add(f'rendition:{self.item.pk}:800:JPEG:lock', True)
+
+        with override_settings(RENDITION_ON_DEMAND_WAIT_SECONDS=0.1):
+            response = self.get(self.item.original_image_id, {'w': 700})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            response['Location'],
+            self.item.renditions.get(size=1000, format='JPEG').image.file.url
+        )
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertFalse(self.item.renditions.filter(size=800).exists())
+
+        # Larger than any rendition, so the largest stands in
+        api_cache().add(f'rendition:{self.item.pk}:2000:JPEG:lock', True)
+        self.item.renditions.filter(size=2000).delete()
+
+        with override_settings(RENDITION_ON_DEMAND_WAIT_SECONDS=0.1):
+            response = self.get(self.item.original_image_id, {'w': 2000})
+
+        self.assertEqual(
+            response['Location'],
+            self.item.renditions.get(size=1000, format='JPEG').image.file.url
+        )
+
+    def test_waits_for_concurrent_request(self):
+
+        lock_key: str = f'rendition:{self.item.pk}:800:JPEG:lock'
+        api_cache().add(lock_key, True)
+
+        generated: List[Rendition] = []
+
+        def wait_for_rendition(*args) -> None:
+
+            # The other request finishes while this one waits
+            generated.append(
+                self.item.get_or_create_rendition(RenditionSpec(800, 'JPEG'))
+            )
+            api_cache().delete(lock_key)
+
+        with mock.patch(
+            'image_api.views.sleep',
+            side_effect=wait_for_rendition
+        ):
+            response = self.get(self.item.original_image_id, {'w': 700})
+
+        self.assertEqual(response['Location'], generated[0].image.file.url)
+        self.assertIn('max-age', response['Cache-Control'])
+
+    def test_too_large_to_generate(self):
+
+        with mock.patch(
+            'image_api.models.DECODE_BUDGET',
+            DecodeBudget(max_pixels=1000, max_memory_bytes=1000)
+        ):
+            response = self.get(self.item.original_image_id, {'w': 700})
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.data['detail'].code, 'image_too_large')
+
+        # The lock isn't left behind
+        self.assertIsNone(
+            api_cache().get(f'rendition:{self.item.pk}:800:JPEG:lock')
+        )
+
+    def test_dropped_when_renditions_regenerated(self):
+
+        self.get(self.item.original_image_id, {'w': 700})
+
+        self.item.generate_renditions()
+
+        self.assertEqual(
+            {rendition.spec for rendition in self.item.renditions.all()},
+            set(GalleryItem.RENDITION_SPECS)
+        )
+
+    def test_invalid_requests(self):
+
+        for params in (
+            {},
+            {'w': 0},
+            {'w': 'wide'},
+            {'w': 640, 'fmt': 'gif'},
+        ):
+            with self.subTest(**params):
+                response = self.get(self.item.original_image_id, params)
+
+                self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(self.get(uuid4(), {'w': 640}).status_code, 404)
+
+
+class UnchangedOriginalTests(APITestCase):
+
+    def setUp(self):
+
+        use_temporary_media(self, CACHES=LOCAL_API_CACHES)
+
+        self.item: GalleryItem = make_uploaded_gallery_item(
+            'Uploaded',
+            make_upload(1200, 800)
+        )
+        run_queued_jobs()
+
+        self.item.refresh_from_db()
+
+    def test_content_hash_stored(self):
+
+        upload: SimpleUploadedFile = make_upload(1200, 800)
+
+        self.assertEqual(
+            self.item.original_image.content_hash,
+            sha256(upload.read()).hexdigest()
+        )
+        self.assertEqual(
+            content_hash(upload),
+            self.item.original_image.content_hash
+        )
+
+    def test_identical_upload_not_stored(self):
+
+        with mock.patch.object(ImageFile, 'save_file') as save_file:
+            self.item.save_image(ImageIngest(make_upload(1200, 800)))
+            self.item.save()
+
+        save_file.assert_not_called()
+        self.assertFalse(self.item.rendition_jobs.exists())
+        self.assertEqual(self.item.renditions_status, RenditionStatus.READY)
+
+    def test_new_upload_replaces_original(self):
+
+        original_image_id = self.item.original_image_id
+        original_hash: str = self.item.original_image.content_hash
+
+        self.item.save_image(ImageIngest(make_upload(1200, 800, color=255)))
+        self.item.save()
+
+        self.item.original_image.refresh_from_db()
+
+        # The original keeps its ID, and so its name
+        self.assertEqual(self.item.original_image_id, original_image_id)
+        self.assertNotEqual(
+            self.item.original_image.content_hash,
+            original_hash
+        )
+        self.assertEqual(self.item.rendition_jobs.count(), 1)
+        self.assertEqual(self.item.renditions_status, RenditionStatus.PENDING)
+
+    def test_editing_details_in_admin_keeps_original(self):
+
+        self.client.force_login(User.objects.create_superuser(
+            'admin',
+            'admin@example.com',
+            'password'
+        ))
+
+        with mock.patch.object(ImageIngest, '__init__') as ingest:
+            response = self.client.post(
+                reverse(
+                    'admin:image_api_galleryitem_change',
+                    args=(self.item.pk,)
+                ),
+                {
+                    'title': 'New title',
+                    'artist_name': 'Artist',
+                    'created_date': '',
+                    'description': '',
+                    'media_description': '',
+                    'size_description': '',
+                }
+            )
+
+        self.assertEqual(response.status_code, 302)
+
+        # The upload wasn't read, and no renditions were queued
+        ingest.assert_not_called()
+        self.assertFalse(self.item.rendition_jobs.exists())
+
+        self.item.refresh_from_db()
+
+        self.assertEqual(self.item.title, 'New title')
+        self.assertEqual(self.item.renditions_status, RenditionStatus.READY)
+
+
+class ImageIngestTests(TestCase):
+
+    def test_single_read(self):
+
+        upload: SimpleUploadedFile = make_upload(1200, 800, 'PNG')
+
+        ingest: ImageIngest = ImageIngest(upload)
+
+        self.assertEqual((ingest.width, ingest.height), (1200, 800))
+        self.assertEqual(ingest.format, 'PNG')
+        self.assertEqual(
+            ingest.content_hash,
+            sha256(upload.read()).hexdigest()
+        )
+
+        # Left ready for storing
+        upload.seek(0)
+        self.assertEqual(ingest.file.tell(), 0)
+
+    def test_dimensions_saved_without_reading_storage(self):
+
+        use_temporary_media(self)
+
+        with mock.patch.object(Image, 'open', wraps=Image.open) as image_open:
+            item: GalleryItem = make_uploaded_gallery_item(
+                'Uploaded',
+                make_upload(1200, 800)
+            )
+
+        self.assertEqual(image_open.call_count, 1)
+        self.assertEqual(
+            (item.original_image.width, item.original_image.height),
+            (1200, 800)
+        )
+
+    def test_invalid_images(self):
+
+        truncated: SimpleUploadedFile = make_upload(1200, 800, 'PNG')
+        truncated.file = BytesIO(truncated.read()[:-100])
+
+        for upload in (
+            SimpleUploadedFile('upload.jpeg', b'Not an image'),
+            truncated,
+        ):
+            # Pillow reports unreadable and corrupt data differently
+            with self.assertRaises((OSError, SyntaxError)):
+                ImageIngest(upload)
+
+    def test_admin_field_errors(self):
+
+        field: IngestImageField = IngestImageField()
+
+        self.assertEqual(
+            field.clean(make_upload(1200, 800)).ingest.width,
+            1200
+        )
+
+        with self.assertRaises(ValidationError) as context:
+            field.clean(SimpleUploadedFile('upload.jpeg', b'Not an image'))
+
+        self.assertEqual(context.exception.code, 'invalid_image')
+
+        with mock.patch(
+            'image_api.admin.DECODE_BUDGET',
+            DecodeBudget(max_pixels=1000 * 1000, max_memory_bytes=1024 ** 3)
+        ), self.assertRaises(ValidationError) as context:
+            field.clean(make_upload(1200, 1000, 'PNG'))
+
+        self.assertEqual(context.exception.code, 'image_too_large')
+
+
+class RenditionThreadPoolTests(TestCase):
+
+    def setUp(self):
+
+        use_temporary_media(self, RENDITION_THREAD_POOL_SIZE=2)
+
+        self.item: GalleryItem = make_uploaded_gallery_item(
+            'Uploaded',
+            make_upload(2400, 1200)
+        )
+
+    def test_stored_on_pool_threads(self):
+
+        store_file = ImageFile.store_file
+        save = ImageFile.save
+        store_threads: List[Thread] = []
+        save_threads: List[Thread] = []
+
+        def record_store(img: ImageFile, *args, **kwargs) -> None:
+            store_threads.append(current_thread())
+            store_file(img, *args, **kwargs)
+
+        def record_save(img: ImageFile, *args, **kwargs) -> None:
+            save_threads.append(current_thread())
+            save(img, *args, **kwargs)
+
+        with mock.patch.object(
+            ImageFile,
+            'store_file',
+            autospec=True,
+            side_effect=record_store
+        ), mock.patch.object(
+            ImageFile,
+            'save',
+            autospec=True,
+            side_effect=record_save
+        ):
+            self.item.generate_renditions()
+
+        self.assertEqual(len(store_threads), len(GalleryItem.RENDITION_SPECS))
+        self.assertNotIn(main_thread(), store_threads)
+        self.assertLessEqual(len(set(store_threads)), 2)
+
+        # The database is only written from the calling thread
+        self.assertEqual(set(save_threads), {main_thread()})
+
+        for rendition in self.item.renditions.select_related('image'):
+
+            with default_storage.open(rendition.image.file.name) as fin:
+                with Image.open(fin) as image:
+                    self.assertEqual(image.format, rendition.format)
+                    self.assertEqual(
+                        image.size,
+                        (rendition.image.width, rendition.image.height)
+                    )
+
+    def test_failed_upload_saves_nothing(self):
+
+        store_file = ImageFile.store_file
+
+        def fail_large(img: ImageFile, file, width: int, *args) -> None:
+
+            if width > 1000:
+                raise OSError('Upload failed')
+
+            store_file(img, file, width, *args)
+
+        with mock.patch.object(
+            ImageFile,
+            'store_file',
+            autospec=True,
+            side_effect=fail_large
+        ), self.assertRaises(OSError):
+            self.item.generate_renditions()
+
+        self.assertFalse(self.item.renditions.exists())
+
+        self.item.refresh_from_db()
+
+        self.assertEqual(self.item.renditions_status, RenditionStatus.PENDING)
+
+
+class ImageEncoderTests(TestCase):
+
+    def encode(self, image: Image, profile: EncoderProfile) -> Image:
+
+        buffer: BytesIO = BytesIO()
+        encode_image(image, buffer, profile)
+        buffer.seek(0)
+
+        return Image.open(buffer)
+
+    def test_profiles_from_settings(self):
+
+        profiles = settings.RENDITION_ENCODER_PROFILES
+
+        for save_format, profile in profiles.items():
+
+            encoder_profile: EncoderProfile = ENCODER_PROFILES[save_format]
+
+            self.assertEqual(encoder_profile.format, save_format)
+            self.assertEqual(
+                encoder_profile.save_options,
+                profile['save_options']
+            )
+            self.assertEqual(
+                RenditionSpec(300, save_format).encoder_profile,
+                encoder_profile
+            )
+
+    def test_save_options(self):
+
+        image: Image = Image.new('RGB', (64, 64), 'red')
+
+        progressive: Image = self.encode(
+            image,
+            EncoderProfile('JPEG', {'quality': 85, 'progressive': True})
+        )
+        baseline: Image = self.encode(
+            image,
+            EncoderProfile('JPEG', {'quality': 85})
+        )
+
+        self.assertIn('progressive', progressive.info)
+        self.assertNotIn('progressive', baseline.info)
+
+    def test_metadata_dropped(self):
+
+        buffer: BytesIO = BytesIO()
+        Image.new('RGB', (64, 64)).save(
+            buffer,
+            'JPEG',
+            exif=b'Exif\x00\x00MM\x00*\x00\x00\x00\x08\x00\x00\x00\x00\x00\x00'
+        )
+        buffer.seek(0)
+
+        with Image.open(buffer) as image:
+
+            self.assertIn('exif', image.info)
+
+            encoded: Image = self.encode(image, ENCODER_PROFILES['JPEG'])
+
+        self.assertNotIn('exif', encoded.info)
+
+    def test_icc_profile_kept(self):
+
+        image: Image = Image.new('RGB', (64, 64))
+        image.info['icc_profile'] = b'Colour profile'
+
+        encoded: Image = self.encode(
+            image,
+            EncoderProfile('JPEG', {}, keep_icc_profile=True)
+        )
+
+        self.assertEqual(encoded.info['icc_profile'], b'Colour profile')
+
+        # The profile doesn't describe the colours once the mode changes
+        image = Image.new('RGBA', (64, 64))
+        image.info['icc_profile'] = b'Colour profile'
+
+        encoded = self.encode(
+            image,
+            EncoderProfile('JPEG', {}, keep_icc_profile=True)
+        )
+
+        self.assertNotIn('icc_profile', encoded.info)
+
+    @skipUnless(ImageCms is not None, 'Pillow built without LittleCMS')
+    def test_converted_to_srgb(self):
+
+        image: Image = Image.new('RGB', (64, 64), (200, 100, 50))
+        image.info['icc_profile'] = ImageCms.ImageCmsProfile(
+            ImageCms.createProfile('LAB')
+        ).tobytes()
+
+        converted, save_options = prepare_image(
+            image,
+            ENCODER_PROFILES['JPEG']
+        )
+
+        self.assertNotIn('icc_profile', save_options)
+        self.assertEqual(converted.mode, 'RGB')
+        self.assertNotEqual(
+            converted.getpixel((0, 0)),
+            image.getpixel((0, 0))
+        )
+
+    def test_transparency(self):
+
+        transparent: Image = Image.new('RGBA', (2, 2), (0, 0, 0, 0))
+
+        # Formats without transparency get a white background
+        flattened: Image = convert_for_format(transparent, 'JPEG')
+
+        self.assertEqual(flattened.mode, 'RGB')
+        self.assertEqual(flattened.getpixel((0, 0)), (255, 255, 255))
+
+        self.assertEqual(convert_for_format(transparent, 'WEBP').mode, 'RGBA')
+
+        palette: Image = Image.new('P', (2, 2))
+        palette.info['transparency'] = 0
+
+        self.assertTrue(has_transparency(palette))
+        self.assertEqual(
+            convert_for_format(palette, 'JPEG').getpixel((0, 0)),
+            (255, 255, 255)
+        )
+
+        # Modes the format supports are left alone
+        grey: Image = Image.new('L', (2, 2))
+
+        self.assertIs(convert_for_format(grey, 'JPEG'), grey)
+        self.assertEqual(convert_for_format(grey, 'WEBP').mode, 'RGB')
+
+
+def decode_base83(value: str) -> int:
+
+    result: int = 0
+
+    for character in value:
+        result = result * 83 + BASE83_CHARACTERS.index(character)
+
+    return result
+
+
+def reference_blurhash(
+    image: Image,
+    components_x: int,
+    components_y: int
+) -> str:
+    """BlurHash encoded pixel by pixel, as the reference encoders do"""
+
+    width, height = image.size
+
+    def to_linear(value: int) -> float:
+        value /= 255
+        return value / 12.92 if value <= 0.04045 else (
+            ((value + 0.055) / 1.055) ** 2.4
+        )
+
+    def to_srgb(value: float) -> int:
+        value = max(0, min(1, value))
+        return int(
+            value * 12.92 * 255 + 0.5 if value <= 0.0031308 else
+            (1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5
+        )
+
+    factors: List[List[float]] = []
+
+    for j in range(components_y):
+        for i in range(components_x):
+
+            normalisation: float = 1 if i == 0 and j == 0 else 2
+            factor: List[float] = [0, 0, 0]
+
+            for y in range(height):
+                for x in range(width):
+
+                    basis: float = normalisation * cos(
+                        pi * i * x / width
+                    ) * cos(pi * j * y / height)
+
+                    for channel, value in enumerate(image.getpixel((x, y))):
+                        factor[channel] += basis * to_linear(value)
+
+            factors.append([value / (width * height) for value in factor])
+
+    dc, ac = factors[0], factors[1:]
+
+    result: str = encode_base83(
+        (components_x - 1) + (components_y - 1) * 9,
+        1
+    )
+
+    actual_max: float = max(
+        (abs(value) for values in ac for value in values),
+        default=0
+    )
+    quantised_max: int = max(0, min(82, floor(actual_max * 166 - 0.5)))
+    max_value: float = (quantised_max + 1) / 166
+
+    result += encode_base83(quantised_max, 1)
+
+    red, green, blue = (to_srgb(value) for value in dc)
+    result += encode_base83((red << 16) + (green << 8) + blue, 4)
+
+    def quantise(value: float) -> int:
+        scaled: float = abs(value / max_value) ** 0.5 * 9
+        return max(0, min(18, floor(copysign(scaled, value) + 9.5)))
+
+    for red, green, blue in ac:
+        result += encode_base83(
+            quantise(red) * 19 * 19 + quantise(green) * 19 + quantise(blue),
+            2
+        )
+
+    return result
+
+
+class PlaceholderTests(APITestCase):
+
+    def test_blurhash_matches_reference(self):
+
+        image: Image = Image.merge('RGB', (
+            Image.linear_gradient('L').rotate(90),
+            Image.linear_gradient('L'),
+            Image.effect_noise((256, 256), 64),
+        )).resize((400, 300))
+
+        sample: Image = image.resize((32, 24), Image.BICUBIC)
+
+        for components in ((4, 3), (3, 4), (1, 1), (9, 9)):
+            with self.subTest(components=components):
+                self.assertEqual(
+                    blurhash(
+                        numpy.asarray(sample, dtype=numpy.float64),
+                        *components
+                    ),
+                    reference_blurhash(sample, *components)
+                )
+
+        self.assertEqual(
+            make_placeholder(image).blurhash,
+            reference_blurhash(sample, 4, 3)
+        )
+
+    def test_solid_colour(self):
+
+        placeholder: Placeholder = make_placeholder(
+            Image.new('RGB', (400, 300), (160, 82, 45))
+        )
+
+        self.assertEqual(placeholder.dominant_color, '#a0522d')
+
+        hash_: str = placeholder.blurhash
+
+        # 4x3 components, so 11 AC components after the average colour
+        self.assertEqual(len(hash_), 6 + 11 * 2)
+        self.assertEqual(decode_base83(hash_[0]), 3 + 2 * 9)
+        self.assertEqual(decode_base83(hash_[2:6]), 0xa0522d)
+
+    def test_components_follow_orientation(self):
+
+        landscape: str = make_placeholder(Image.new('RGB', (400, 300))).blurhash
+        portrait: str = make_placeholder(Image.new('RGB', (300, 400))).blurhash
+
+        self.assertEqual(decode_base83(landscape[0]), 3 + 2 * 9)
+        self.assertEqual(decode_base83(portrait[0]), 2 + 3 * 9)
+
+    def test_dominant_colour_is_most_common(self):
+
+        image: Image = Image.new('RGB', (400, 300), (0, 0, 255))
+        image.paste((250, 10, 10), (0, 0, 300, 300))
+
+        self.assertEqual(make_placeholder(image).dominant_color, '#fa0a0a')
+
+    def test_transparent_images_on_white(self):
+
+        image: Image = Image.new('RGBA', (400, 300), (0, 0, 0, 0))
+
+        self.assertEqual(make_placeholder(image).dominant_color, '#ffffff')
+
+    def test_renditions_carry_placeholder(self):
+
+        use_temporary_media(self, CACHES=LOCAL_API_CACHES)
+
+        item: GalleryItem = make_uploaded_gallery_item(
+            'Uploaded',
+            make_upload(1200, 800, color=(160, 82, 45))
+        )
+        run_queued_jobs()
+
+        response = self.client.get(
+            reverse('galleryitem-detail', args=(item.pk,)),
+            {'fields': 'thumbnail_image'}
+        )
+        thumbnail: dict = response.data['thumbnail_image']
+
+        self.assertEqual(len(thumbnail['blurhash']), 28)
+
+        # Allowing for JPEG compression
+        self.assertEqual(
+            [
+                round(int(thumbnail['dominant_color'][i:i + 2], 16) / 16)
+                for i in (1, 3, 5)
+            ],
+            [round(value / 16) for value in (160, 82, 45)]
+        )
+
+
+class BenchmarkTests(TestCase):
+
+    def test_case_size(self):
+
+        case: BenchmarkCase = BenchmarkCase(6, 'RGB', 'JPEG')
+
+        width, height = case.size
+
+        self.assertEqual(case.name, 'RGB-JPEG-6MP')
+        self.assertEqual((width, height), (3000, 2000))
+
+    def test_run_case(self):
+
+        temp_dir: str = mkdtemp()
+        self.addCleanup(rmtree, temp_dir)
+
+        for mode, source_format in SOURCE_TYPES:
+            with self.subTest(mode=mode, format=source_format):
+
+                case: BenchmarkCase = BenchmarkCase(1, mode, source_format)
+                source_path: str = f'{temp_dir}/{case.name}'
+
+                write_source_image(case, source_path)
+
+                with Image.open(source_path) as image:
+                    self.assertEqual(image.mode, mode)
+                    self.assertEqual(image.size, case.size)
+
+                result = run_case(
+                    case,
+                    source_path,
+                    (300, 600),
+                    (ENCODER_PROFILES['JPEG'],)
+                )
+
+                self.assertEqual(
+                    [
+                        (rendition['size'], rendition['width'])
+                        for rendition in result['renditions']
+                    ],
+                    [(600, 600), (300, 300)]
+                )
+                self.assertEqual(
+                    result['output_bytes'],
+                    sum(
+                        rendition['bytes']
+                        for rendition in result['renditions']
+                    )
+                )
+
+    def test_find_regressions(self):
+
+        baseline = {
+            'RGB-JPEG-1MP': {
+                'wall_seconds': 1,
+                'peak_rss_mb': 100,
+                'output_bytes': 1000,
+            },
+        }
+        results = {
+            'RGB-JPEG-1MP': {
+                'wall_seconds': 1.5,
+                'peak_rss_mb': 120,
+                'output_bytes': 1030,
+            },
+            # Cases without a baseline are skipped
+            'RGB-JPEG-2MP': {
+                'wall_seconds': 10,
+                'peak_rss_mb': 1000,
+                'output_bytes': 10000,
+            },
+        }
+
+        self.assertEqual(
+            find_regressions(
+                results,
+                baseline,
+                {'peak_rss_mb': 0.25, 'output_bytes': 0.02}
+            ),
+            [
+                'RGB-JPEG-1MP: output_bytes 1030 exceeds the baseline 1000 '
+                'by more than 2%'
+            ]
+        )
+
+        # Wall times are relative to each machine's calibration
+        self.assertEqual(
+            len(find_regressions(results, baseline, {'wall_seconds': 0.25})),
+            1
+        )
+        self.assertEqual(
+            find_regressions(
+                results,
+                baseline,
+                {'wall_seconds': 0.25},
+                time_scale=1.25
+            ),
+            []
+        )
+
+
+class ImportGalleryTests(TransactionTestCase):
+    """The command closes the database connections before starting its
+    worker processes, which a test case's transaction wouldn't survive
+    """
+
+    def setUp(self):
+
+        use_temporary_media(self)
+
+        self.source_dir: str = mkdtemp()
+        self.addCleanup(rmtree, self.source_dir)
+
+    def write_image(
+        self,
+        file_name: str,
+        image_format: str = 'JPEG',
+        **kwargs
+    ) -> None:
+
+        upload: SimpleUploadedFile = make_upload(
+            1200,
+            800,
+            image_format,
+            **kwargs
+        )
+
+        with open(path.join(self.source_dir, file_name), 'wb') as fout:
+            fout.write(upload.read())
+
+    def import_gallery(self, source: str, *args) -> Tuple[str, str]:
+
+        stdout: StringIO = StringIO()
+        stderr: StringIO = StringIO()
+
+        call_command(
+            'import_gallery',
+            source,
+            '--workers=2',
+            '--batch-size=2',
+            *args,
+            stdout=stdout,
+            stderr=stderr
+        )
+
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_directory(self):
+
+        self.write_image('Blue.jpg', color='blue')
+        self.write_image('Red.png', 'PNG', color='red')
+        self.write_image('Green.jpeg', color='green')
+
+        # The same image twice is imported once
+        self.write_image('Copy of blue.jpg', color='blue')
+
+        with open(path.join(self.source_dir, 'Broken.jpg'), 'wb') as fout:
+            fout.write(b'Not an image')
+
+        with open(path.join(self.source_dir, 'notes.txt'), 'w') as fout:
+            fout.write('Not an image either')
+
+        stdout, stderr = self.import_gallery(
+            self.source_dir,
+            '--artist-name=Ann',
+            '--tag=oil'
+        )
+
+        self.assertIn('Imported 3, skipped 1 and failed 1 of 5', stdout)
+        self.assertIn('Broken.jpg: failed', stderr)
+
+        items: List[GalleryItem] = list(GalleryItem.objects.all())
+        titles: List[str] = sorted(item.title for item in items)
+
+        # Either copy may be processed first
+        self.assertIn(titles[:1], (['Blue'], ['Copy of blue']))
+        self.assertEqual(titles[1:], ['Green', 'Red'])
+
+        # Ready to serve, without any rendition jobs
+        self.assertFalse(
+            RenditionJob.objects.filter(kind=RenditionJob.RENDITIONS).exists()
+        )
+
+        for item in items:
+
+            self.assertEqual(item.artist_name, 'Ann')
+            self.assertEqual(
+                list(item.tags.values_list('name', flat=True)),
+                ['oil']
+            )
+            self.assertEqual(item.renditions_status, RenditionStatus.READY)
+            self.assertEqual(
+                {rendition.spec for rendition in item.renditions.all()},
+                set(GalleryItem.RENDITION_SPECS)
+            )
+            self.assertEqual(item.thumbnail_image.width, 300)
+            self.assertTrue(item.thumbnail_image.blurhash)
+
+            with default_storage.open(item.original_image.file.name) as fin:
+                self.assertEqual(
+                    content_hash(fin),
+                    item.original_image.content_hash
+                )
+
+    def test_run_again_to_resume(self):
+
+        self.write_image('Blue.jpg', color='blue')
+
+        self.import_gallery(self.source_dir, '--artist-name=Ann')
+
+        self.write_image('Red.jpg', color='red')
+
+        stdout, _stderr = self.import_gallery(
+            self.source_dir,
+            '--artist-name=Ann'
+        )
+
+        self.assertIn('Imported 1, skipped 1 and failed 0 of 2', stdout)
+        self.assertEqual(
+            sorted(GalleryItem.objects.values_list('title', flat=True)),
+            ['Blue', 'Red']
+        )
+
+    def test_manifests(self):
+
+        self.write_image('blue.jpg', color='blue')
+        self.write_image('red.jpg', color='red')
+
+        csv_path: str = path.join(self.source_dir, 'manifest.csv')
+
+        with open(csv_path, 'w', newline='') as fout:
+            csv.writer(fout).writerows((
+                (
+                    'file',
+                    'title',
+                    'artist_name',
+                    'tags',
+                    'created_date',
+                    'media_description',
+                ),
+                (
+                    'blue.jpg',
+                    'Blue',
+                    'Ann',
+                    'oil; portrait',
+                    '2019-05-01',
+                    'Oil on canvas',
+                ),
+            ))
+
+        json_path: str = path.join(self.source_dir, 'manifest.json')
+
+        with open(json_path, 'w') as fout:
+            json.dump([{'file': 'red.jpg', 'title': 'Red'}], fout)
+
+        self.import_gallery(csv_path)
+        self.import_gallery(json_path, '--artist-name=Bob', '--tag=sketch')
+
+        blue: GalleryItem = GalleryItem.objects.get(title='Blue')
+        red: GalleryItem = GalleryItem.objects.get(title='Red')
+
+        self.assertEqual(blue.artist_name, 'Ann')
+        self.assertEqual(blue.created_date, date(2019, 5, 1))
+        self.assertEqual(blue.media_description, 'Oil on canvas')
+        self.assertEqual(
+            sorted(blue.tags.values_list('name', flat=True)),
+            ['oil', 'portrait']
+        )
+
+        self.assertEqual(red.artist_name, 'Bob')
+        self.assertEqual(
+            list(red.tags.values_list('name', flat=True)),
+            ['sketch']
+        )
+
+    def test_invalid_manifests(self):
+
+        json_path: str = path.join(self.source_dir, 'manifest.json')
+
+        for rows in (
+            [{'file': 'blue.jpg', 'title': 'Blue'}],
+            [{'file': 'blue.jpg', 'artist_name': 'Ann'}],
+            [{
+                'file': 'blue.jpg',
+                'title': 'Blue',
+                'artist_name': 'Ann',
+                'created_date': '1 May 2019',
+            }],
+        ):
+            with self.subTest(rows=rows):
+
+                with open(json_path, 'w') as fout:
+                    json.dump(rows, fout)
+
+                with self.assertRaises(CommandError):
+                    self.import_gallery(json_path)
+
+        # Directories have no manifest to give the artist
+        with self.assertRaises(CommandError):
+            self.import_gallery(self.source_dir)
+
+        self.assertFalse(GalleryItem.objects.exists())
+
+
+class RegenerateRenditionsTests(TransactionTestCase):
+    """Items are regenerated on worker threads, each with its own database
+    connection, which can't see a test case's uncommitted transaction
+    """
+
+    def setUp(self):
+
+        use_temporary_media(self)
+
+        self.items: List[GalleryItem] = sorted(
+            (
+                make_uploaded_gallery_item(
+                    f'Item {number}',
+                    make_upload(1200, 800, color=number)
+                )
+                for number in range(3)
+            ),
+            key=lambda item: str(item.pk)
+        )
+        run_queued_jobs()
+
+        self.checkpoint_dir: str = mkdtemp()
+        self.addCleanup(rmtree, self.checkpoint_dir)
+        self.checkpoint: str = path.join(self.checkpoint_dir, 'checkpoint')
+
+    def regenerate(self, *args) -> str:
+
+        stdout: StringIO = StringIO()
+
+        call_command(
+            'regenerate_renditions',
+            f'--checkpoint={self.checkpoint}',
+            '--chunk-size=2',
+            *args,
+            stdout=stdout,
+            stderr=StringIO()
+        )
+
+        return stdout.getvalue()
+
+    def regenerated_items(self, *args) -> List[GalleryItem]:
+
+        with mock.patch(
+            'image_api.management.commands.regenerate_renditions.regenerate'
+        ) as regenerate:
+            self.regenerate(*args)
+
+        return sorted(
+            (call[0][0] for call in regenerate.call_args_list),
+            key=lambda item: str(item.pk)
+        )
+
+    def test_regenerates_every_item(self):
+
+        Rendition.objects.all().delete()
+
+        # SQLite's test database locks out concurrent writers
+        stdout: str = self.regenerate('--workers=1')
+
+        self.assertIn('Regenerated 3 items, 0 failed', stdout)
+
+        for item in self.items:
+            self.assertEqual(
+                {rendition.spec for rendition in item.renditions.all()},
+                set(GalleryItem.RENDITION_SPECS)
+            )
+
+        self.assertFalse(path.exists(self.checkpoint))
+
+    def test_only_missing(self):
+
+        missing, failed, _ready = self.items
+
+        missing.renditions.get(size=600, format='JPEG').delete()
+        GalleryItem.objects.filter(pk=failed.pk).update(
+            renditions_status=RenditionStatus.FAILED
+        )
+
+        self.assertEqual(
+            self.regenerated_items('--only-missing'),
+            [missing, failed]
+        )
+
+    def test_only_missing_tile_pyramids(self):
+
+        pyramid_missing, pyramid_generated, _small = self.items
+
+        for item in (pyramid_missing, pyramid_generated):
+            ImageFile.objects.filter(pk=item.original_image_id).update(
+                width=6000,
+                height=4000
+            )
+
+        TilePyramid.objects.create(
+            gallery_item=pyramid_generated,
+            width=6000,
+            height=4000,
+            tile_size=256,
+            overlap=1
+        )
+
+        self.assertEqual(
+            self.regenerated_items('--only-missing'),
+            [pyramid_missing]
+        )
+
+        with override_settings(DEEP_ZOOM_ENABLED=False):
+            self.assertEqual(self.regenerated_items('--only-missing'), [])
+
+    def test_since(self):
+
+        GalleryItem.objects.filter(pk=self.items[0].pk).update(
+            renditions_generated_time=timezone.now() - timedelta(days=2)
+        )
+        GalleryItem.objects.filter(pk=self.items[1].pk).update(
+            renditions_generated_time=None
+        )
+
+        since: str = (timezone.now() - timedelta(days=1)).date().isoformat()
+
+        self.assertEqual(
+            self.regenerated_items(f'--since={since}'),
+            self.items[:2]
+        )
+
+        with self.assertRaises(CommandError):
+            self.regenerate('--since=yesterday')
+
+    def test_resumes_from_checkpoint(self):
+
+        with open(self.checkpoint, 'w') as fout:
+            json.dump({'last_pk': str(self.items[0].pk)}, fout)
+
+        self.assertEqual(self.regenerated_items(), self.items[1:])
+
+        with open(self.checkpoint, 'w') as fout:
+            json.dump({'last_pk': str(self.items[0].pk)}, fout)
+
+        self.assertEqual(self.regenerated_items('--restart'), self.items)
+
+    def test_dry_run(self):
+
+        with mock.patch.object(GalleryItem, 'generate_renditions') as generate:
+            stdout: str = self.regenerate('--dry-run')
+
+        generate.assert_not_called()
+        self.assertIn('3 items would be regenerated', stdout)
+        self.assertFalse(path.exists(self.checkpoint))
+
+    def test_failures_reported(self):
+
+        self.items[0].original_image.file.delete(save=False)
+
+        stdout: str = self.regenerate('--workers=1')
+
+        self.assertIn('Regenerated 2 items, 1 failed', stdout)
+
+    def test_items_over_memory_limit_run_alone(self):
+
+        lock: Lock = Lock()
+        running: List[GalleryItem] = []
+        most_running: List[int] = [0]
+
+        def record(item: GalleryItem) -> None:
+
+            with lock:
+                running.append(item)
+                most_running[0] = max(most_running[0], len(running))
+
+            sleep(0.05)
+
+            with lock:
+                running.remove(item)
+
+        with mock.patch(
+            'image_api.management.commands.regenerate_renditions.regenerate',
+            side_effect=record
+        ):
+            self.regenerate('--workers=3', '--memory-limit=1')
+
+        self.assertEqual(most_running[0], 1)
+
+
+class DecodeBudgetTests(TestCase):
+
+    # Room for a 1000x1000 colour image, or a 4000x4000 greyscale one
+    BUDGET: DecodeBudget = DecodeBudget(
+        max_pixels=20 * 1000 * 1000,
+        max_memory_bytes=4 * 1000 * 1000
+    )
+
+    def test_decoded_size(self):
+
+        for mode, bytes_per_pixel in (
+            ('1', 1),
+            ('L', 1),
+            ('P', 1),
+            ('I;16', 2),
+            ('I', 4),
+            ('LA', 4),
+            ('RGB', 4),
+            ('CMYK', 4),
+        ):
+            with self.subTest(mode=mode):
+                self.assertEqual(
+                    decoded_size_bytes(Image.new(mode, (10, 20))),
+                    200 * bytes_per_pixel
+                )
+
+    def test_check_decode_budget(self):
+
+        check_decode_budget(Image.new('RGB', (1000, 1000)), self.BUDGET)
+        check_decode_budget(Image.new('L', (4000, 1000)), self.BUDGET)
+
+        for image in (
+            Image.new('RGB', (1000, 1001)),
+            Image.new('L', (5000, 5000)),
+        ):
+            with self.assertRaises(ImageTooLargeError):
+                check_decode_budget(image, self.BUDGET)
+
+    def test_decompression_bombs_too_large(self):
+
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 1000):
+            with self.assertRaises(ImageTooLargeError):
+                open_image(make_upload(100, 100, 'PNG'))
+
+    def test_budget_applies_after_drafting(self):
+
+        # A JPEG only needs decoding at a quarter scale for a 500px target
+        jpeg: ImageIngest = ImageIngest(
+            make_upload(2000, 2000),
+            self.BUDGET,
+            target_size=500
+        )
+
+        self.assertEqual((jpeg.width, jpeg.height), (2000, 2000))
+
+        for upload, target_size in (
+            (make_upload(2000, 2000), 2000),
+            (make_upload(2000, 2000), None),
+            (make_upload(2000, 2000, 'PNG'), 500),
+        ):
+            with self.assertRaises(ImageTooLargeError):
+                ImageIngest(upload, self.BUDGET, target_size)
+
+    def test_resizer_checks_before_decoding(self):
+
+        with ImageResizer(
+            make_upload(2000, 2000, 'PNG'),
+            self.BUDGET
+        ) as resizer, mock.patch.object(Image.Image, 'load') as load:
+
+            with self.assertRaises(ImageTooLargeError):
+                next(resizer.iter_box_sizes((500,)))
+
+            with self.assertRaises(ImageTooLargeError):
+                resizer.full_size_image()
+
+        load.assert_not_called()
+
+        with ImageResizer(make_upload(2000, 2000), self.BUDGET) as resizer:
+            _size, image = next(resizer.iter_box_sizes((500,)))
+
+        self.assertEqual(image.size, (500, 500))
+
+    def test_rendition_job_fails_over_budget(self):
+
+        use_temporary_media(self)
+
+        item: GalleryItem = make_uploaded_gallery_item(
+            'Uploaded',
+            make_upload(2000, 2000, 'PNG')
+        )
+
+        with mock.patch('image_api.models.DECODE_BUDGET', self.BUDGET):
+            with self.assertLogs('image_api.models', 'ERROR'):
+                run_queued_jobs()
+
+        job: RenditionJob = item.rendition_jobs.get()
+
+        self.assertEqual(job.status, RenditionJob.PENDING)
+        self.assertTrue(job.last_error.startswith('ImageTooLargeError'))
+        self.assertFalse(item.renditions.exists())
+
+
+class DeepZoomTests(APITestCase):
+
+    LAYOUT: DeepZoomLayout = DeepZoomLayout(
+        width=1000,
+        height=600,
+        tile_size=256,
+        overlap=1
+    )
+
+    def test_levels(self):
+
+        self.assertEqual(self.LAYOUT.max_level, 10)
+
+        for level, dimensions, tiles in (
+            (10, (1000, 600), (4, 3)),
+            (9, (500, 300), (2, 2)),
+            (8, (250, 150), (1, 1)),
+            (0, (1, 1), (1, 1)),
+        ):
+            self.assertEqual(self.LAYOUT.level_dimensions(level), dimensions)
+            self.assertEqual(self.LAYOUT.level_tiles(level), tiles)
+
+    def test_tiles_overlap_their_neighbours(self):
+
+        for position, box in (
+            ((10, 0, 0), (0, 0, 257, 257)),
+            ((10, 1, 1), (255, 255, 513, 513)),
+            ((10, 3, 2), (767, 511, 1000, 600)),
+            ((0, 0, 0), (0, 0, 1, 1)),
+        ):
+            self.assertEqual(self.LAYOUT.tile_box(*position), box)
+
+    def test_iter_tiles(self):
+
+        image: Image = Image.new('RGB', (1000, 600))
+
+        tiles = list(iter_tiles(image, self.LAYOUT))
+
+        self.assertEqual(
+            [tile[:3] for tile in tiles],
+            list(self.LAYOUT.iter_tile_positions())
+        )
+        self.assertEqual(tiles[0][:3], (10, 0, 0))
+
+        for level, column, row, tile in tiles:
+
+            left, upper, right, lower = self.LAYOUT.tile_box(
+                level,
+                column,
+                row
+            )
+
+            self.assertEqual(tile.size, (right - left, lower - upper))
+
+    def test_descriptor(self):
+
+        descriptor = ElementTree.fromstring(
+            dzi_descriptor(self.LAYOUT, 'jpg').encode()
+        )
+
+        self.assertEqual(descriptor.tag, f'{{{DZI_NAMESPACE}}}Image')
+        self.assertEqual(
+            descriptor.attrib,
+            {'Format': 'jpg', 'Overlap': '1', 'TileSize': '256'}
+        )
+        self.assertEqual(
+            descriptor.find(f'{{{DZI_NAMESPACE}}}Size').attrib,
+            {'Width': '1000', 'Height': '600'}
+        )
+
+    def test_pyramid_generated_for_large_images(self):
+
+        use_temporary_media(
+            self,
+            CACHES=LOCAL_API_CACHES,
+            DEEP_ZOOM_MIN_SIZE_PX=1000
+        )
+
+        small: GalleryItem = make_uploaded_gallery_item(
+            'Small',
+            make_upload(1000, 600)
+        )
+        large: GalleryItem = make_uploaded_gallery_item(
+            'Large',
+            make_upload(1200, 600)
+        )
+        run_queued_jobs()
+
+        self.assertFalse(TilePyramid.objects.filter(gallery_item=small))
+
+        pyramid: TilePyramid = TilePyramid.objects.get(gallery_item=large)
+
+        self.assertEqual((pyramid.width, pyramid.height), (1200, 600))
+
+        for level, column, row in pyramid.layout.iter_tile_positions():
+
+            with default_storage.open(
+                pyramid.tile_name(level, column, row)
+            ) as fin:
+                with Image.open(fin) as tile:
+                    self.assertEqual(tile.format, 'JPEG')
+
+        response = self.client.get(
+            reverse('galleryitem-detail', args=(large.pk,)),
+            {'fields': 'tile_source'}
+        )
+
+        self.assertEqual(response.data['tile_source']['url'], pyramid.url)
+        self.assertEqual(response.data['tile_source']['tile_size'], 256)
+
+        # Generating again replaces the pyramid and its files
+        large.generate_renditions()
+
+        self.assertFalse(default_storage.exists(pyramid.descriptor_name))
+        self.assertNotEqual(large.tile_pyramid.pk, pyramid.pk)
+        self.assertTrue(
+            default_storage.exists(large.tile_pyramid.descriptor_name)
+        )
+
+    def test_no_pyramid_over_decode_budget(self):
+
+        use_temporary_media(self, DEEP_ZOOM_MIN_SIZE_PX=1000)
+
+        item: GalleryItem = make_uploaded_gallery_item(
+            'Large',
+            make_upload(4400, 4400)
+        )
+
+        # The renditions are decoded at half size, so only the tiles are
+        # over the budget
+        with mock.patch(
+            'image_api.models.DECODE_BUDGET',
+            DecodeBudget(
+                max_pixels=100 * 1000 * 1000,
+                max_memory_bytes=20 * 1000 * 1000
+            )
+        ), self.assertLogs('image_api.models', 'WARNING'):
+            run_queued_jobs()
+
+        item.refresh_from_db()
+
+        self.assertEqual(item.renditions_status, RenditionStatus.READY)
+        self.assertFalse(TilePyramid.objects.filter(gallery_item=item))
@@ -0,0 +1,15 @@
+from hashlib import sha256
+
+from django.core.files import File
+
+
+def content_hash(file: File) -> str:
+    """Returns the hex SHA-256 digest of the file's contents"""
+
+    file_hash = sha256()
+
+    # Chunking always starts from the beginning of the file
+    for chunk in file.chunks():
+        file_hash.update(chunk)
+
+    return file_hash.hexdigest()
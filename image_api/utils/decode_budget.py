@@ -0,0 +1,69 @@
+from io import FileIO
+from typing import NamedTuple
+
+from PIL import Image
+
+
+class DecodeBudget(NamedTuple):
+
+    # Images with more pixels than this are rejected without decoding them
+    max_pixels: int
+
+    # The most memory an image may take once decoded
+    max_memory_bytes: int
+
+
+class ImageTooLargeError(ValueError):
+    pass
+
+
+def open_image(image_file: FileIO) -> Image:
+    """Opens the image, reading only its header. Images over Pillow's own
+    decompression bomb limit raise ImageTooLargeError
+    """
+
+    try:
+        return Image.open(image_file)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e)) from e
+
+
+def decoded_size_bytes(image: Image) -> int:
+    """Estimates the memory Pillow needs to hold the image once decoded, at
+    its current (possibly drafted) size
+    """
+
+    if len(image.getbands()) > 1 or image.mode in ('I', 'F'):
+        # Multi-band images are stored with 4 bytes per pixel
+        bytes_per_pixel: int = 4
+    elif image.mode.startswith('I;16'):
+        bytes_per_pixel: int = 2
+    else:
+        bytes_per_pixel: int = 1
+
+    return image.width * image.height * bytes_per_pixel
+
+
+def check_decode_budget(image: Image, budget: DecodeBudget) -> None:
+    """Raises ImageTooLargeError if decoding the image would exceed the
+    budget. Only the header has to have been read, and JPEG images should be
+    drafted first so that their reduced decoding scale is accounted for
+    """
+
+    width, height = image.size
+
+    if width * height > budget.max_pixels:
+        raise ImageTooLargeError(
+            f'The image is {width}x{height} pixels, more than the limit of '
+            f'{budget.max_pixels / 1e6:.0f} megapixels'
+        )
+
+    memory_bytes: int = decoded_size_bytes(image)
+
+    if memory_bytes > budget.max_memory_bytes:
+        raise ImageTooLargeError(
+            f'Decoding the {width}x{height} pixel image would take an '
+            f'estimated {memory_bytes / 1024 ** 2:.0f}MB, more than the limit '
+            f'of {budget.max_memory_bytes / 1024 ** 2:.0f}MB. Only JPEG images '
+            f'can be decoded at a reduced scale'
+        )
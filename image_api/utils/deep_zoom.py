@@ -0,0 +1,111 @@
+from math import (
+    ceil,
+    log2,
+)
+from typing import (
+    Iterator,
+    NamedTuple,
+    Tuple,
+)
+
+from PIL import Image
+
+
+DZI_NAMESPACE: str = 'http://schemas.microsoft.com/deepzoom/2008'
+
+
+class DeepZoomLayout(NamedTuple):
+    """The levels and tiles of a Deep Zoom (DZI) image pyramid. Level 0 is a
+    single pixel, and each level doubles the size of the one below it up to
+    the full size image at the top level
+    """
+
+    width: int
+    height: int
+    tile_size: int
+    overlap: int
+
+    @property
+    def max_level(self) -> int:
+        return ceil(log2(max(self.width, self.height, 1)))
+
+    def level_dimensions(self, level: int) -> Tuple[int, int]:
+
+        scale: int = 2 ** (self.max_level - level)
+
+        return ceil(self.width / scale), ceil(self.height / scale)
+
+    def level_tiles(self, level: int) -> Tuple[int, int]:
+        """Returns the number of (columns, rows) of tiles in the level"""
+
+        width, height = self.level_dimensions(level)
+
+        return ceil(width / self.tile_size), ceil(height / self.tile_size)
+
+    def tile_box(
+        self,
+        level: int,
+        column: int,
+        row: int
+    ) -> Tuple[int, int, int, int]:
+        """Returns the (left, upper, right, lower) crop box of the tile. Tiles
+        overlap their neighbours, but not the edges of the image
+        """
+
+        width, height = self.level_dimensions(level)
+
+        left: int = column * self.tile_size - (self.overlap if column else 0)
+        upper: int = row * self.tile_size - (self.overlap if row else 0)
+        right: int = min((column + 1) * self.tile_size + self.overlap, width)
+        lower: int = min((row + 1) * self.tile_size + self.overlap, height)
+
+        return left, upper, right, lower
+
+    def iter_tile_positions(self) -> Iterator[Tuple[int, int, int]]:
+        """Yields the (level, column, row) of every tile, top level first"""
+
+        for level in range(self.max_level, -1, -1):
+
+            columns, rows = self.level_tiles(level)
+
+            for column in range(columns):
+                for row in range(rows):
+                    yield level, column, row
+
+
+def iter_tiles(
+    image: Image,
+    layout: DeepZoomLayout
+) -> Iterator[Tuple[int, int, int, Image]]:
+    """Yields (level, column, row, tile image) for every tile of the full size
+    image, top level first. Each level is resized from the one above it, so
+    at most two levels are held in memory
+    """
+
+    level_image: Image = image
+
+    for level in range(layout.max_level, -1, -1):
+
+        level_dimensions: Tuple[int, int] = layout.level_dimensions(level)
+
+        if level_image.size != level_dimensions:
+            level_image = level_image.resize(level_dimensions, Image.BICUBIC)
+
+        columns, rows = layout.level_tiles(level)
+
+        for column in range(columns):
+            for row in range(rows):
+                yield level, column, row, level_image.crop(
+                    layout.tile_box(level, column, row)
+                )
+
+
+def dzi_descriptor(layout: DeepZoomLayout, file_extension: str) -> str:
+
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<Image xmlns="{DZI_NAMESPACE}" Format="{file_extension}" '
+        f'Overlap="{layout.overlap}" TileSize="{layout.tile_size}">'
+        f'<Size Width="{layout.width}" Height="{layout.height}"/>'
+        f'</Image>\n'
+    )
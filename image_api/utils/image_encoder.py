@@ -0,0 +1,136 @@
+from io import (
+    BytesIO,
+    FileIO,
+)
+from logging import (
+    getLogger,
+    Logger,
+)
+from typing import (
+    Any,
+    Dict,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from PIL import Image
+
+try:
+    from PIL import ImageCms
+except ImportError:
+    # Pillow is built without colour management if LittleCMS is missing
+    ImageCms = None
+
+
+log: Logger = getLogger(__name__)
+
+
+# The image modes each format can be saved in without conversion
+FORMAT_MODES: Dict[str, Tuple[str, ...]] = {
+    'JPEG': ('L', 'RGB'),
+    'WEBP': ('RGB', 'RGBA'),
+}
+
+
+class EncoderProfile(NamedTuple):
+
+    # Pillow image format name
+    format: str
+
+    # Passed to Image.save(), e.g. quality, progressive or subsampling
+    save_options: Dict[str, Any]
+
+    # Embed the original colour profile instead of converting to sRGB
+    keep_icc_profile: bool = False
+
+
+def encode_image(image: Image, fout: FileIO, profile: EncoderProfile) -> None:
+    """Saves the image using the encoder profile. EXIF, XMP and comments are
+    never passed on to the encoder, so the output carries no metadata
+    """
+
+    prepared_image, save_options = prepare_image(image, profile)
+
+    prepared_image.save(
+        fout,
+        format=profile.format,
+        **save_options
+    )
+
+
+def prepare_image(
+    image: Image,
+    profile: EncoderProfile
+) -> Tuple[Image, Dict[str, Any]]:
+    """Converts the image's colours and mode for the profile, returning it
+    with the options to save it with. Crops of the prepared image can be
+    saved with the same options without converting each of them
+    """
+
+    save_options: Dict[str, Any] = dict(profile.save_options)
+    icc_profile: Optional[bytes] = image.info.get('icc_profile')
+
+    if icc_profile and profile.keep_icc_profile:
+        save_options['icc_profile'] = icc_profile
+
+    elif icc_profile:
+        # Dropping the profile would shift the colours of anything not
+        # already in sRGB, which browsers assume for untagged images
+        image = convert_to_srgb(image, icc_profile)
+
+    converted_image: Image = convert_for_format(image, profile.format)
+
+    if converted_image.mode != image.mode:
+        # The original profile doesn't describe the converted colours
+        save_options.pop('icc_profile', None)
+
+    return converted_image, save_options
+
+
+def convert_to_srgb(image: Image, icc_profile: bytes) -> Image:
+
+    if ImageCms is None or image.mode not in ('L', 'RGB', 'CMYK'):
+        return image
+
+    try:
+        return ImageCms.profileToProfile(
+            image,
+            ImageCms.ImageCmsProfile(BytesIO(icc_profile)),
+            ImageCms.createProfile('sRGB'),
+            outputMode='RGB'
+        )
+    except ImageCms.PyCMSError as e:
+        log.warning(f'Failed to convert image colours to sRGB: {e}')
+        return image
+
+
+def convert_for_format(image: Image, save_format: str) -> Image:
+
+    modes: Tuple[str, ...] = FORMAT_MODES[save_format]
+
+    if image.mode in modes:
+        return image
+
+    if has_transparency(image):
+
+        if 'RGBA' in modes:
+            return image.convert('RGBA')
+
+        # Formats without transparency get a white background
+        image = image.convert('RGBA')
+
+        background: Image = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+
+        return background
+
+    return image.convert('RGB')
+
+
+def has_transparency(image: Image) -> bool:
+
+    return (
+        image.mode in ('RGBA', 'LA', 'PA') or
+        'transparency' in image.info
+    )
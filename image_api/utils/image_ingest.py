@@ -0,0 +1,54 @@
+from typing import Optional
+
+from django.core.files import File
+from PIL import Image
+
+from image_api.utils.content_hash import content_hash
+from image_api.utils.decode_budget import (
+    DecodeBudget,
+    check_decode_budget,
+    open_image,
+)
+from image_api.utils.image_resizer import draft_image
+
+
+class ImageIngest(object):
+    """An image file which is read once to validate it and to find its
+    dimensions and content hash.
+
+    If a decode budget is given, images that would exceed it when decoded for
+    renditions up to the target size raise ImageTooLargeError
+    """
+
+    def __init__(
+        self,
+        file: File,
+        budget: Optional[DecodeBudget] = None,
+        target_size: Optional[int] = None
+    ):
+
+        self.file: File = file
+        self.content_hash: str = content_hash(file)
+
+        file.seek(0)
+
+        # Opening the image only parses the header. Verifying checks the data
+        # without decoding it, but leaves the image unusable afterwards
+        image: Image = open_image(file)
+
+        self.width: int = image.width
+        self.height: int = image.height
+        self.format: str = image.format
+
+        if budget is not None:
+
+            # Renditions are decoded at the smallest scale that covers the
+            # largest of them, so the budget applies to that scale
+            if target_size is not None:
+                draft_image(image, target_size)
+
+            check_decode_budget(image, budget)
+
+        image.verify()
+
+        file.seek(0)
@@ -1,13 +1,37 @@
+from collections import defaultdict
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
 from PIL import Image
 from io import FileIO
-from typing import Tuple
+
+from image_api.utils.decode_budget import (
+    DecodeBudget,
+    check_decode_budget,
+    open_image,
+)
 
 
 class ImageResizer(object):
+    """Resizes an image file. If a decode budget is given, images which
+    would exceed it once decoded raise ImageTooLargeError before any pixel
+    data is loaded
+    """
 
-    def __init__(self, image_file: FileIO):
+    def __init__(
+        self,
+        image_file: FileIO,
+        budget: Optional[DecodeBudget] = None
+    ):
 
-        self._image: Image = Image.open(image_file)
+        self._image: Image = open_image(image_file)
+        self._budget: Optional[DecodeBudget] = budget
 
     def __enter__(self):
         return self
@@ -15,6 +39,26 @@ class ImageResizer(object):
     def __exit__(self, *args):
         self._image.close()
 
+    def draft(self, target_size: int) -> None:
+        """Configures the decoder to produce the smallest image that still
+        covers the target box size. Only JPEG sources support reduced scale
+        decoding, and this must be called before the pixel data is loaded
+        """
+
+        draft_image(self._image, target_size)
+
+    def check_budget(self) -> None:
+
+        if self._budget is not None:
+            check_decode_budget(self._image, self._budget)
+
+    def full_size_image(self) -> Image:
+        """Decodes the image at full size, for uses that need every pixel"""
+
+        self.check_budget()
+
+        return working_image(self._image)
+
     def shrink_image_to_box_size(
         self,
         new_size: int,
@@ -23,8 +67,11 @@ class ImageResizer(object):
         save_format: str = 'JPEG'
     ) -> None:
 
+        self.check_budget()
+
+        # Resizing never modifies the original image in place
         resized_image: Image = shrink_image_largest_dimension(
-            self._image.copy(),  # We resize a copy of the original image
+            self._image,
             new_size
         )
 
@@ -34,36 +81,133 @@ class ImageResizer(object):
             quality=compression_quality
         )
 
+    def shrink_image_to_box_sizes(
+        self,
+        targets: Iterable[Tuple[int, FileIO]],
+        compression_quality: int = 85,
+        save_format: str = 'JPEG'
+    ) -> None:
+        """Writes one rendition per (box size, file) pair. The source is
+        decoded at the smallest scale covering the largest target, and each
+        smaller rendition is resized from the one above it rather than from
+        the full size original
+        """
+
+        files: Dict[int, List[FileIO]] = defaultdict(list)
+
+        for new_size, fout in targets:
+            files[new_size].append(fout)
+
+        for new_size, image in self.iter_box_sizes(files):
+            for fout in files[new_size]:
+                image.save(
+                    fout,
+                    format=save_format,
+                    quality=compression_quality
+                )
+
+    def iter_box_sizes(
+        self,
+        sizes: Iterable[int]
+    ) -> Iterator[Tuple[int, Image]]:
+        """Yields (box size, resized image) pairs, largest first. The source
+        is decoded at the smallest scale covering the largest size, and each
+        image is resized from the previous one
+        """
+
+        ordered_sizes: List[int] = sorted(set(sizes), reverse=True)
 
-def shrink_image_largest_dimension(
-    image: Image,
+        if not ordered_sizes:
+            return
+
+        self.draft(ordered_sizes[0])
+        self.check_budget()
+
+        image: Image = working_image(self._image)
+
+        for new_size in ordered_sizes:
+
+            image = shrink_image_largest_dimension(image, new_size)
+
+            yield new_size, image
+
+
+def draft_image(image: Image, target_size: int) -> None:
+    """Configures the image's decoder to produce the smallest image that
+    still covers the target box size, updating its size to match. Has no
+    effect on formats other than JPEG
+    """
+
+    target_dimensions: Optional[Tuple[int, int]] = box_dimensions(
+        image.size,
+        target_size
+    )
+
+    if target_dimensions is not None:
+        image.draft(image.mode, target_dimensions)
+
+
+def working_image(image: Image) -> Image:
+    """Converts images in modes which can't be resampled well to the
+    nearest mode which can
+    """
+
+    if image.mode in ('I;16', 'I;16B', 'I;16L', 'I'):
+        # Scale 16 bit greyscale down to 8 bits
+        return image.convert('I').point(
+            lambda value: value * (1 / 256)
+        ).convert('L')
+
+    if image.mode == '1':
+        return image.convert('L')
+
+    if image.mode == 'P':
+        # Palette images can only be resized with nearest neighbour sampling
+        return image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    return image
+
+
+def box_dimensions(
+    size: Tuple[int, int],
     target_size: int
-) -> Image:
-    """Preserves aspect ratio"""
+) -> Optional[Tuple[int, int]]:
+    """Returns the (width, height) that fits the given size in a square box
+    of the target size, preserving aspect ratio. Returns None if the size
+    fits in the box already
+    """
 
-    largest_dimension: int = max(image.height, image.width)
+    width, height = size
+    largest_dimension: int = max(height, width)
 
     if target_size >= largest_dimension:
-        return image  # The image is small enough already
+        return None  # The image is small enough already
 
     scale_factor: float = target_size / largest_dimension
 
     # Compute the resized image dimensions
-    if largest_dimension == image.height:
+    if largest_dimension == height:
 
         # Set the height to the target size, compute the new width
-        target_dimensions: Tuple[int, int] = (
-            round(image.width * scale_factor),
-            target_size
-        )
+        return round(width * scale_factor), target_size
 
-    else:
+    # Set the width to the target size, compute the new height
+    return target_size, round(height * scale_factor)
 
-        # Set the width to the target size, compute the new height
-        target_dimensions: Tuple[int, int] = (
-            target_size,
-            round(image.height * scale_factor)
-        )
+
+def shrink_image_largest_dimension(
+    image: Image,
+    target_size: int
+) -> Image:
+    """Preserves aspect ratio"""
+
+    target_dimensions: Optional[Tuple[int, int]] = box_dimensions(
+        image.size,
+        target_size
+    )
+
+    if target_dimensions is None:
+        return image  # The image is small enough already
 
     return image.resize(
         target_dimensions,
@@ -0,0 +1,14 @@
+from resource import (
+    getrusage,
+    RUSAGE_SELF,
+)
+from sys import platform
+
+
+def peak_rss_mb() -> float:
+    """The peak memory use of the whole process, including the interpreter"""
+
+    peak_rss: int = getrusage(RUSAGE_SELF).ru_maxrss
+
+    # Linux reports kilobytes, macOS bytes
+    return peak_rss / (1024 ** 2 if platform == 'darwin' else 1024)
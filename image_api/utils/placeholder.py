@@ -0,0 +1,171 @@
+from math import (
+    floor,
+    pi,
+)
+from typing import (
+    NamedTuple,
+    Tuple,
+)
+
+import numpy
+from PIL import Image
+
+from image_api.utils.image_encoder import convert_for_format
+from image_api.utils.image_resizer import shrink_image_largest_dimension
+
+
+BASE83_CHARACTERS: str = (
+    '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;'
+    '=?@[]^_{|}~'
+)
+
+# The placeholder only holds a few cosine components, so it's computed from a
+# very small copy of the image
+PLACEHOLDER_SAMPLE_SIZE_PX: int = 32
+
+# Number of horizontal and vertical BlurHash components along the longest side
+PLACEHOLDER_COMPONENTS: Tuple[int, int] = (4, 3)
+
+
+class Placeholder(NamedTuple):
+
+    blurhash: str
+
+    # Hex RGB colour, e.g. "#a0522d"
+    dominant_color: str
+
+
+def make_placeholder(image: Image) -> Placeholder:
+
+    sample: Image = convert_for_format(
+        shrink_image_largest_dimension(image, PLACEHOLDER_SAMPLE_SIZE_PX),
+        'JPEG'
+    ).convert('RGB')
+
+    pixels: numpy.ndarray = numpy.asarray(sample, dtype=numpy.float64)
+
+    if sample.width >= sample.height:
+        components_x, components_y = PLACEHOLDER_COMPONENTS
+    else:
+        components_y, components_x = PLACEHOLDER_COMPONENTS
+
+    return Placeholder(
+        blurhash=blurhash(pixels, components_x, components_y),
+        dominant_color=dominant_color(pixels)
+    )
+
+
+def dominant_color(pixels: numpy.ndarray) -> str:
+    """Returns the mean colour of the most common 4 bit per channel colour
+    bucket of an (height, width, 3) array of RGB values
+    """
+
+    rgb: numpy.ndarray = pixels.reshape(-1, 3)
+    quantised: numpy.ndarray = rgb.astype(numpy.uint16) >> 4
+
+    buckets: numpy.ndarray = (
+        (quantised[:, 0] << 8) | (quantised[:, 1] << 4) | quantised[:, 2]
+    )
+
+    most_common: int = numpy.bincount(buckets, minlength=4096).argmax()
+    red, green, blue = rgb[buckets == most_common].mean(axis=0).round()
+
+    return f'#{int(red):02x}{int(green):02x}{int(blue):02x}'
+
+
+def blurhash(
+    pixels: numpy.ndarray,
+    components_x: int,
+    components_y: int
+) -> str:
+    """Encodes an (height, width, 3) array of sRGB values as a BlurHash, see
+    https://github.com/woltapp/blurhash/blob/master/Algorithm.md
+    """
+
+    height, width, _channels = pixels.shape
+    linear: numpy.ndarray = srgb_to_linear(pixels)
+
+    # The cosine basis functions for each component, along each axis
+    basis_x: numpy.ndarray = numpy.cos(
+        pi * numpy.arange(components_x)[:, None] * numpy.arange(width) / width
+    )
+    basis_y: numpy.ndarray = numpy.cos(
+        pi * numpy.arange(components_y)[:, None] * numpy.arange(height) / height
+    )
+
+    factors: numpy.ndarray = numpy.einsum(
+        'yj,xi,jic->yxc',
+        basis_y,
+        basis_x,
+        linear
+    ) / (width * height)
+
+    # All but the DC component are scaled by two
+    factors *= 2
+    factors[0, 0] /= 2
+
+    factors = factors.reshape(-1, 3)
+    dc: numpy.ndarray = factors[0]
+    ac: numpy.ndarray = factors[1:]
+
+    size_flag: int = (components_x - 1) + (components_y - 1) * 9
+    result: str = encode_base83(size_flag, 1)
+
+    if len(ac):
+        quantised_max: int = int(
+            max(0, min(82, floor(numpy.abs(ac).max() * 166 - 0.5)))
+        )
+        maximum_value: float = (quantised_max + 1) / 166
+    else:
+        quantised_max: int = 0
+        maximum_value: float = 1
+
+    result += encode_base83(quantised_max, 1)
+
+    red, green, blue = linear_to_srgb(dc)
+    result += encode_base83((red << 16) + (green << 8) + blue, 4)
+
+    quantised_ac: numpy.ndarray = numpy.clip(
+        numpy.floor(
+            numpy.sign(ac) * numpy.abs(ac / maximum_value) ** 0.5 * 9 + 9.5
+        ),
+        0,
+        18
+    ).astype(int)
+
+    for red, green, blue in quantised_ac:
+        result += encode_base83(red * 19 * 19 + green * 19 + blue, 2)
+
+    return result
+
+
+def srgb_to_linear(values: numpy.ndarray) -> numpy.ndarray:
+
+    values = values / 255
+
+    return numpy.where(
+        values <= 0.04045,
+        values / 12.92,
+        ((values + 0.055) / 1.055) ** 2.4
+    )
+
+
+def linear_to_srgb(values: numpy.ndarray) -> Tuple[int, ...]:
+
+    values = numpy.clip(values, 0, 1)
+
+    srgb: numpy.ndarray = numpy.where(
+        values <= 0.0031308,
+        values * 12.92,
+        1.055 * values ** (1 / 2.4) - 0.055
+    )
+
+    return tuple(int(value) for value in numpy.trunc(srgb * 255 + 0.5))
+
+
+def encode_base83(value: int, length: int) -> str:
+
+    return ''.join(
+        BASE83_CHARACTERS[(int(value) // 83 ** (length - i - 1)) % 83]
+        for i in range(length)
+    )
@@ -0,0 +1,50 @@
+import re
+from typing import (
+    Callable,
+    Optional,
+    Pattern,
+)
+
+
+# Stand in for the key while the template URL is built, and then check it
+TEMPLATE_KEY: str = 'url-template-key'
+CHECK_KEY: str = 'url-template-check'
+
+# Keys which no URL builder would need to escape
+SAFE_KEY: Pattern = re.compile(r'[A-Za-z0-9_./-]+\Z')
+
+
+class URLTemplate(object):
+    """Builds URLs which differ only by a key, such as a file name or a
+    primary key, by inserting the key into one URL built the slow way, e.g.
+    by a storage backend or by reversing a route.
+
+    The template is checked against a second URL built the slow way. URLs
+    which don't fit it, such as signed URLs, and keys which might need
+    escaping are still built the slow way
+    """
+
+    def __init__(self, build_url: Callable[[str], Optional[str]]):
+
+        self.build_url: Callable[[str], Optional[str]] = build_url
+
+        self.prefix: Optional[str] = None
+        self.suffix: Optional[str] = None
+
+        template_url: Optional[str] = build_url(TEMPLATE_KEY)
+
+        if template_url is None or template_url.count(TEMPLATE_KEY) != 1:
+            return
+
+        prefix, suffix = template_url.split(TEMPLATE_KEY)
+
+        if build_url(CHECK_KEY) == prefix + CHECK_KEY + suffix:
+            self.prefix = prefix
+            self.suffix = suffix
+
+    def __call__(self, key: str) -> Optional[str]:
+
+        if self.prefix is None or not SAFE_KEY.match(key):
+            return self.build_url(key)
+
+        return self.prefix + key + self.suffix
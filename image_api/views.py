@@ -1,27 +1,387 @@
-from rest_framework.viewsets import ReadOnlyModelViewSet
+from collections import OrderedDict
+from itertools import islice
+from time import (
+    monotonic,
+    sleep,
+)
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
+from django.conf import settings
+from django.core.cache import BaseCache
+from django.db.models import (
+    Prefetch,
+    Q,
+    QuerySet,
+)
+from django.http import (
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from rest_framework.decorators import action
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException,
+    ValidationError,
+)
+from rest_framework.pagination import (
+    BasePagination,
+    PageNumberPagination,
+)
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.viewsets import (
+    GenericViewSet,
+    ReadOnlyModelViewSet,
+)
+
+from gallery_shared.views import (
+    ConditionalGetMixin,
+    SparseFieldsetMixin,
+)
+from image_api.filters import (
+    GalleryItemFilter,
+    GalleryItemSearchFilter,
+    get_search_terms,
+)
 from image_api.models import (
     GalleryItem,
     ItemTag,
+    Rendition,
+)
+from image_api.pagination import GalleryItemCursorPagination
+from image_api.renderers import (
+    NDJSONRenderer,
+    iter_json_array,
+    iter_ndjson,
+)
+from image_api.renditions import (
+    RenditionSpec,
+    format_supported,
+    snap_size,
+)
+from image_api.response_cache import (
+    LOCK_POLL_INTERVAL_SECONDS,
+    ContentVersionCacheMixin,
+    api_cache,
 )
 from image_api.serializers import (
+    GalleryItemListSerializer,
     GalleryItemSerializer,
     ItemTagSerializer,
 )
+from image_api.utils.decode_budget import ImageTooLargeError
+
+
+# On-demand renditions are replaced if the original image changes
+RENDITION_REDIRECT_MAX_AGE_SECONDS: int = 60 * 60
+
+# Exported items are read and serialized this many at a time. SQLite allows
+# up to 999 parameters in a query, such as the IDs their relations are
+# loaded for
+EXPORT_CHUNK_SIZE: int = 500
 
 
-class ItemTagViewSet(ReadOnlyModelViewSet):
+class ItemTagViewSet(
+    ConditionalGetMixin,
+    ContentVersionCacheMixin,
+    ReadOnlyModelViewSet
+):
 
     queryset = ItemTag.objects.all()
     serializer_class = ItemTagSerializer
 
 
-class GalleryViewSet(ReadOnlyModelViewSet):
+class GalleryViewSet(
+    SparseFieldsetMixin,
+    ConditionalGetMixin,
+    ContentVersionCacheMixin,
+    ReadOnlyModelViewSet
+):
 
     class Meta:
         fields = (
             'name',
         )
 
+    # Each relation is joined or prefetched only when its field is
+    # serialized, so nothing unrequested is loaded. Lists are of .values()
+    # rows instead, which GalleryItemListSerializer loads relations for
+    SELECT_RELATED_FIELDS: Dict[str, str] = {
+        'large_image': 'large_image',
+        'thumbnail_image': 'thumbnail_image',
+        'tile_source': 'tile_pyramid',
+    }
+    PREFETCH_FIELDS: Dict[str, Union[str, Prefetch]] = {
+        'tags': 'tags',
+        'renditions': Prefetch(
+            'renditions',
+            queryset=Rendition.objects.select_related('image')
+        ),
+    }
+
+    # Read by the pagination whichever fields are serialized
+    ORDERING_FIELDS: Tuple[str, ...] = (
+        'id',
+        'title',
+        'created_date',
+    )
+
     queryset = GalleryItem.objects.all()
     serializer_class = GalleryItemSerializer
+    pagination_class = GalleryItemCursorPagination
+    filter_backends = (
+        GalleryItemFilter,
+        GalleryItemSearchFilter,
+    )
+
+    def get_queryset(self) -> QuerySet:
+
+        field_names: Tuple[str, ...] = self.get_field_names()
+
+        if self.action in ('list', 'export'):
+            # GalleryItemListSerializer lists the items from rows
+            return super(GalleryViewSet, self).get_queryset().values(
+                *OrderedDict.fromkeys((
+                    *self.ORDERING_FIELDS,
+                    *GalleryItemListSerializer.get_values_fields(field_names)
+                ))
+            )
+
+        select_related: List[str] = [
+            lookup for field_name, lookup in self.SELECT_RELATED_FIELDS.items()
+            if field_name in field_names
+        ]
+        model_field_names: Set[str] = {
+            field.name for field in GalleryItem._meta.concrete_fields
+        }
+
+        queryset: QuerySet = super(GalleryViewSet, self).get_queryset().only(
+            *self.ORDERING_FIELDS,
+            *(name for name in field_names if name in model_field_names),
+            *select_related
+        ).prefetch_related(*(
+            lookup for field_name, lookup in self.PREFETCH_FIELDS.items()
+            if field_name in field_names
+        ))
+
+        # Without any fields, select_related() would join every relation
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+
+        return queryset
+
+    @action(
+        detail=False,
+        renderer_classes=(NDJSONRenderer, JSONRenderer)
+    )
+    def export(self, request: Request) -> StreamingHttpResponse:
+        """Streams every gallery item, unpaginated, as newline delimited JSON
+        or with format=json as a JSON array. Items have every field unless
+        fields are requested, and the list filters apply.
+
+        Items are read and serialized a chunk at a time, so memory use
+        doesn't grow with the number of items
+        """
+
+        queryset: QuerySet = self.filter_queryset(self.get_queryset())
+
+        # Search results are ordered by relevance already
+        if not get_search_terms(request):
+            queryset = queryset.order_by(*GalleryItemCursorPagination.ordering)
+
+        items: Iterator[OrderedDict] = iter_representations(
+            self.get_serializer(many=True),
+            queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+
+        return StreamingHttpResponse(
+            iter_ndjson(items) if request.accepted_renderer.format == 'ndjson'
+            else iter_json_array(items),
+            content_type=request.accepted_renderer.media_type
+        )
+
+    @property
+    def paginator(self) -> BasePagination:
+
+        # Search results are ordered by relevance, which a keyset can't
+        # follow, so they're paginated by page number instead
+        if not hasattr(self, '_paginator'):
+            self._paginator = (
+                PageNumberPagination() if get_search_terms(self.request)
+                else self.pagination_class()
+            )
+
+        return self._paginator
+
+
+def iter_representations(
+    serializer: GalleryItemListSerializer,
+    rows: Iterator[Dict[str, Any]]
+) -> Iterator[OrderedDict]:
+    """Serializes the rows a chunk at a time, which loads the relations of
+    each chunk's items together
+    """
+
+    while True:
+
+        chunk: List[Dict[str, Any]] = list(islice(rows, EXPORT_CHUNK_SIZE))
+
+        if not chunk:
+            return
+
+        yield from serializer.to_representation(chunk)
+
+
+class ImageTooLarge(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'The image is too large to generate renditions of'
+    default_code = 'image_too_large'
+
+
+class ImageRenditionViewSet(GenericViewSet):
+    """Redirects to a rendition of a gallery item's image, e.g.
+    /api/images/<image UUID>/?w=640&fmt=webp. The image UUID can be that of
+    any of the item's images. The rendition is generated the first time it
+    is requested and stored for later requests. While one request generates
+    it, others redirect to the nearest existing rendition instead
+    """
+
+    queryset = GalleryItem.objects.select_related('original_image')
+    lookup_value_regex = (
+        '[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
+    )
+
+    def retrieve(self, request: Request, pk: str = None):
+
+        spec: RenditionSpec = get_requested_spec(request)
+
+        item: GalleryItem = get_object_or_404(
+            self.get_queryset().filter(
+                Q(original_image_id=pk) | Q(renditions__image_id=pk)
+            ).distinct()
+        )
+
+        rendition: Optional[Rendition] = find_rendition(item, spec)
+
+        if rendition is None:
+            try:
+                rendition = generate_rendition_once(item, spec)
+            except ImageTooLargeError as e:
+                raise ImageTooLarge(str(e)) from e
+
+        response = HttpResponseRedirect(rendition.image.file.url)
+
+        if rendition.spec == spec:
+            patch_cache_control(
+                response,
+                public=True,
+                max_age=RENDITION_REDIRECT_MAX_AGE_SECONDS
+            )
+        else:
+            # Only a stand in until the requested rendition exists
+            patch_cache_control(response, no_cache=True)
+
+        return response
+
+
+def find_rendition(
+    item: GalleryItem,
+    spec: RenditionSpec
+) -> Optional[Rendition]:
+
+    return item.renditions.select_related('image').filter(
+        size=spec.size,
+        format=spec.format
+    ).first()
+
+
+def generate_rendition_once(
+    item: GalleryItem,
+    spec: RenditionSpec
+) -> Rendition:
+    """Generates the rendition, unless another request is generating it
+    already. Then this waits for that request to finish, and if it doesn't
+    finish in time, returns the nearest existing rendition instead
+    """
+
+    cache: BaseCache = api_cache()
+    lock_key: str = f'rendition:{item.pk}:{spec.size}:{spec.format}:lock'
+
+    locked: bool = cache.add(
+        lock_key,
+        True,
+        timeout=settings.RENDITION_ON_DEMAND_LOCK_TIMEOUT_SECONDS
+    )
+
+    if not locked:
+
+        deadline: float = (
+            monotonic() + settings.RENDITION_ON_DEMAND_WAIT_SECONDS
+        )
+
+        while monotonic() < deadline and cache.get(lock_key) is not None:
+            sleep(LOCK_POLL_INTERVAL_SECONDS)
+
+        rendition: Optional[Rendition] = (
+            find_rendition(item, spec) or nearest_rendition(item, spec)
+        )
+
+        if rendition is not None:
+            return rendition
+
+    try:
+        return item.get_or_create_rendition(spec)
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+
+def nearest_rendition(
+    item: GalleryItem,
+    spec: RenditionSpec
+) -> Optional[Rendition]:
+    """Returns the smallest of the item's renditions in the format which is
+    at least the size, or failing that the largest one smaller than it
+    """
+
+    renditions: QuerySet = item.renditions.select_related('image').filter(
+        format=spec.format
+    )
+
+    return (
+        renditions.filter(size__gte=spec.size).order_by('size').first() or
+        renditions.order_by('-size').first()
+    )
+
+
+def get_requested_spec(request: Request) -> RenditionSpec:
+
+    try:
+        requested_size: int = int(request.query_params['w'])
+    except (KeyError, ValueError):
+        requested_size: int = 0
+
+    if requested_size <= 0:
+        raise ValidationError({
+            'w': 'A positive integer size in pixels is required'
+        })
+
+    save_format: str = request.query_params.get('fmt', 'jpeg').upper()
+
+    if not format_supported(save_format):
+        raise ValidationError({
+            'fmt': f'Unsupported image format "{save_format.lower()}"'
+        })
+
+    return RenditionSpec(snap_size(requested_size), save_format)
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.1 on 2026-10-18 06:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('links_api', '0003_auto_20190413_1352'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='socialmedialinks',
+            name='updated_time',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
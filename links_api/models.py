@@ -1,5 +1,6 @@
 from django.core.exceptions import ObjectDoesNotExist
 from django.db.models import (
+    DateTimeField,
     URLField,
     Manager,
 )
@@ -19,5 +20,7 @@ class SocialMediaLinks(SingletonModel):
     instagram = URLField(null=True, blank=True)
     linkedin = URLField(null=True, blank=True)
 
+    updated_time = DateTimeField(auto_now=True)
+
     def __str__(self):
         return 'Social media links configuration'
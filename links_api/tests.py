@@ -1,3 +1,45 @@
-from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from gallery_shared.testing import QueryBudgetMixin
+from links_api.models import SocialMediaLinks
+
+
+class ApiQueryBudgetTests(QueryBudgetMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        SocialMediaLinks.objects.create(facebook='https://facebook.com/a')
+
+    def test_social_media_links(self):
+
+        # Conditional GET state and the links
+        with self.assertQueryBudget(2):
+            response = self.client.get(reverse('socialmedialinks-list'))
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_unchanged_social_media_links_not_modified(self):
+
+        url: str = reverse('socialmedialinks-list')
+        etag: str = self.client.get(url)['ETag']
+
+        with self.assertQueryBudget(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_changed_social_media_links_modified(self):
+
+        url: str = reverse('socialmedialinks-list')
+        etag: str = self.client.get(url)['ETag']
+
+        links: SocialMediaLinks = SocialMediaLinks.get_solo()
+        links.instagram = 'https://instagram.com/a'
+        links.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['instagram'], links.instagram)
@@ -3,11 +3,16 @@ from rest_framework.mixins import ListModelMixin
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
+from gallery_shared.views import ConditionalGetMixin
 from links_api.models import SocialMediaLinks
 from links_api.serializers import SocialMediaLinksSerializer
 
 
-class SocialMediaLinksViewSet(ListModelMixin, GenericViewSet):
+class SocialMediaLinksViewSet(
+    ConditionalGetMixin,
+    ListModelMixin,
+    GenericViewSet
+):
 
     queryset = SocialMediaLinks.objects.all()
     serializer_class = SocialMediaLinksSerializer
@@ -21,6 +26,16 @@ class SocialMediaLinksViewSet(ListModelMixin, GenericViewSet):
 
     def list(self, request, *args, **kwargs):
 
+        return self.conditional_response(
+            self.get_queryset(),
+            self.links_response,
+            request,
+            *args,
+            **kwargs
+        )
+
+    def links_response(self, request, *args, **kwargs):
+
         serializer = self.get_serializer(
             instance=self.get_object()
         )